@@ -0,0 +1,242 @@
+import threading
+import time
+
+# IAudioSessionControl::GetState values
+AUDIO_SESSION_STATE_EXPIRED = 2
+
+
+class AudioBackend:
+    """Access to the system's audio endpoints and per-app sessions.
+
+    Sessions are returned as (key, session) pairs, where key identifies a
+    session across calls so the index only has to look at new ones.
+    """
+
+    def init_thread(self):
+        """Prepare the calling thread (e.g. COM initialisation)."""
+
+    def master_volume(self):
+        """Return an object with SetMasterVolumeLevel(db, context), or None."""
+        raise NotImplementedError
+
+    def list_sessions(self):
+        raise NotImplementedError
+
+    def process_name(self, session):
+        raise NotImplementedError
+
+    def volume_interface(self, session):
+        """Return an object with SetMasterVolume(level, context)."""
+        raise NotImplementedError
+
+    def is_expired(self, session):
+        return False
+
+
+class PycawBackend(AudioBackend):
+    """Windows Core Audio through pycaw."""
+
+    def init_thread(self):
+        import comtypes
+        comtypes.CoInitialize()
+
+    def master_volume(self):
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+        from comtypes import CLSCTX_ALL
+
+        devices = AudioUtilities.GetSpeakers()
+        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        return interface.QueryInterface(IAudioEndpointVolume)
+
+    def list_sessions(self):
+        from pycaw.pycaw import AudioUtilities
+
+        sessions = []
+        for session in AudioUtilities.GetAllSessions():
+            try:
+                key = (session.ProcessId, session.InstanceIdentifier)
+            except Exception:
+                continue
+            sessions.append((key, session))
+        return sessions
+
+    def process_name(self, session):
+        return session.Process.name() if session.Process else None
+
+    def volume_interface(self, session):
+        return session.SimpleAudioVolume
+
+    def is_expired(self, session):
+        return session.State == AUDIO_SESSION_STATE_EXPIRED
+
+
+class AudioSessionIndex:
+    """Maps process names to the volume interfaces of their audio sessions.
+
+    The index is rebuilt incrementally on a slow timer (or when a lookup
+    misses): only sessions that appeared since the last refresh have their
+    process name resolved, and expired or vanished sessions are dropped.
+    Volume writes are then a dictionary lookup instead of a GetAllSessions()
+    walk.
+    """
+
+    def __init__(self, backend, refresh_interval=2.0, miss_refresh_interval=0.5):
+        self.backend = backend
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+
+        self._sessions = {}  # key -> (name, volume interface)
+        self._by_name = {}   # name -> {key: volume interface}
+        self._lock = threading.Lock()
+        self._refresh_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._last_refresh = 0.0
+
+        # Statistics
+        self.refreshes = 0
+        self.sessions_added = 0
+        self.sessions_removed = 0
+
+        self._thread = None
+
+    def start(self):
+        """Refresh once, then keep the index fresh from a background thread."""
+        self.refresh()
+        self._thread = threading.Thread(target=self._refresh_thread, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._refresh_event.set()
+
+    def _refresh_thread(self):
+        self.backend.init_thread()
+        while not self._stop_event.is_set():
+            self._refresh_event.wait(self.refresh_interval)
+            self._refresh_event.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Audio session refresh error: {e}")
+
+    def refresh(self):
+        seen = set()
+        for key, session in self.backend.list_sessions():
+            # noinspection PyBroadException
+            try:
+                if self.backend.is_expired(session):
+                    continue
+                seen.add(key)
+                if key in self._sessions:
+                    continue
+
+                name = self.backend.process_name(session)
+                if not name:
+                    continue
+                volume = self.backend.volume_interface(session)
+            except Exception:
+                continue
+
+            with self._lock:
+                self._sessions[key] = (name, volume)
+                self._by_name.setdefault(name, {})[key] = volume
+                self.sessions_added += 1
+
+        with self._lock:
+            for key in [key for key in self._sessions if key not in seen]:
+                self._remove(key)
+            self.refreshes += 1
+            self._last_refresh = time.monotonic()
+
+    def _remove(self, key):
+        name, _ = self._sessions.pop(key)
+        entries = self._by_name.get(name)
+        if entries is not None:
+            entries.pop(key, None)
+            if not entries:
+                del self._by_name[name]
+        self.sessions_removed += 1
+
+    def get(self, name):
+        """Return [(key, volume interface)] for a process name."""
+        with self._lock:
+            entries = self._by_name.get(name)
+            if entries:
+                return list(entries.items())
+            stale = time.monotonic() - self._last_refresh > self.miss_refresh_interval
+
+        # The app may have started since the last refresh
+        if stale:
+            self._refresh_event.set()
+        return []
+
+    def invalidate(self, key):
+        """Drop a session whose interface failed, e.g. because it died."""
+        with self._lock:
+            if key in self._sessions:
+                self._remove(key)
+        self._refresh_event.set()
+
+    def names(self):
+        with self._lock:
+            return list(self._by_name)
+
+
+class FakeSession:
+    def __init__(self, name):
+        self.name = name
+        self.volume = None
+        self.expired = False
+        self.name_lookups = 0
+
+    # SimpleAudioVolume
+    def SetMasterVolume(self, level, context):
+        if self.expired:
+            raise OSError("Session expired")
+        self.volume = level
+
+
+class FakeMasterVolume:
+    def __init__(self):
+        self.level_db = None
+
+    def SetMasterVolumeLevel(self, level_db, context):
+        self.level_db = level_db
+
+
+class FakeAudioBackend(AudioBackend):
+    """In-process backend for exercising the index and VolumeControl on Linux."""
+
+    def __init__(self):
+        self.master = FakeMasterVolume()
+        self.sessions = {}
+        self.list_calls = 0
+        self._next_key = 0
+
+    def add_session(self, name):
+        self._next_key += 1
+        session = FakeSession(name)
+        self.sessions[self._next_key] = session
+        return session
+
+    def expire_session(self, session):
+        session.expired = True
+
+    def master_volume(self):
+        return self.master
+
+    def list_sessions(self):
+        self.list_calls += 1
+        return list(self.sessions.items())
+
+    def process_name(self, session):
+        session.name_lookups += 1
+        return session.name
+
+    def volume_interface(self, session):
+        return session
+
+    def is_expired(self, session):
+        return session.expired
@@ -0,0 +1,108 @@
+"""
+Compare frame payload codecs across a corpus of album art.
+
+For every codec reports bytes on the wire, host encode time and an estimate
+of the time the ESP32 needs to get the frame on screen (wire time at the given
+baud rate plus decode/draw time from the per-pixel costs below).
+
+Run from the repository root:
+    python -m benchmarks.bench_codecs [corpus_dir] [--baud 115200]
+Without a corpus directory a synthetic set of artwork-like images is used.
+"""
+import argparse
+import os
+import statistics
+import time
+import numpy as np
+from PIL import Image, ImageFilter
+
+import frame_codec
+from frame_renderer import FrameRenderer
+
+# Rough ESP32 (240 MHz) costs in microseconds per pixel, override on the
+# command line after measuring on real hardware
+DEVICE_COST_US = {
+    frame_codec.CODEC_JPEG: 1.2,    # TJpgDec decode
+    frame_codec.CODEC_RGB565: 0.0,  # Pixels are already in panel format
+    frame_codec.CODEC_RLE565: 0.08,  # Run expansion into the line buffer
+}
+PANEL_COST_US = 0.45  # SPI push of one RGB565 pixel to the ST7789 (all codecs)
+
+
+def synthetic_corpus(count=12, seed=1):
+    """Artwork-like test images: smooth gradients, flat colour, photo noise."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        size = 300 + 100 * (i % 4)
+        kind = i % 3
+        if kind == 0:
+            x = np.linspace(0, 255, size)
+            base = np.stack([np.add.outer(x, x) / 2, np.add.outer(x, x[::-1]) / 2,
+                             np.full((size, size), rng.integers(0, 255))], axis=-1)
+        elif kind == 1:
+            base = np.zeros((size, size, 3))
+            base[:] = rng.integers(0, 255, 3)
+            base[size // 4:size * 3 // 4, size // 4:size * 3 // 4] = rng.integers(0, 255, 3)
+        else:
+            base = rng.random((size, size, 3)) * 255
+        img = Image.fromarray(base.astype(np.uint8))
+        if kind == 2:
+            img = img.filter(ImageFilter.GaussianBlur(2))
+        images.append((f"synthetic_{i}", img))
+    return images
+
+
+def load_corpus(path):
+    images = []
+    for name in sorted(os.listdir(path)):
+        try:
+            with Image.open(os.path.join(path, name)) as img:
+                images.append((name, img.convert("RGB")))
+        except OSError:
+            continue
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="?", help="Directory of album art images")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--repeat", type=int, default=3, help="Encodes per image and codec")
+    for codec in frame_codec.CODECS:
+        parser.add_argument(f"--{codec}-us-per-pixel", type=float, default=DEVICE_COST_US[codec])
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not corpus:
+        print("No images found")
+        return
+
+    renderer = FrameRenderer()
+    frames = [np.asarray(renderer.render(img, "Benchmark Title", "Artist")) for _, img in corpus]
+
+    print(f"{len(frames)} frames, {args.baud} baud\n")
+    print(f"{'codec':<8} {'bytes p50':>10} {'bytes max':>10} {'encode ms':>10} "
+          f"{'wire ms':>9} {'device ms':>10} {'total ms':>9}")
+
+    for codec in frame_codec.CODECS:
+        sizes, encode_times = [], []
+        for pixels in frames:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                container = frame_codec.encode(pixels, codec)
+                encode_times.append(time.perf_counter() - start)
+            sizes.append(len(frame_codec.unpack(container)[3]))
+
+        pixel_count = frames[0].shape[0] * frames[0].shape[1]
+        us_per_pixel = getattr(args, f"{codec}_us_per_pixel") + PANEL_COST_US
+        device_ms = pixel_count * us_per_pixel / 1000
+        wire_ms = statistics.median(sizes) * 10 / args.baud * 1000
+        encode_ms = statistics.median(encode_times) * 1000
+
+        print(f"{codec:<8} {statistics.median(sizes):>10.0f} {max(sizes):>10} {encode_ms:>10.2f} "
+              f"{wire_ms:>9.0f} {device_ms:>10.0f} {encode_ms + wire_ms + device_ms:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
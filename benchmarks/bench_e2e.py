@@ -0,0 +1,283 @@
+"""
+End-to-end benchmark of the host daemon against the firmware emulator,
+which runs in a child process (esp32_emulator.EmulatorProcess) so only
+host work counts toward the CPU figures. Reports:
+
+- frame transfer throughput: now-playing changes from the media provider
+  until the display confirms the frame (render, encode, transfer, decode),
+- input-to-action latency: from a button or slider reading changing on the
+  emulated ESP32 until the shortcut runs or the volume is set,
+- host CPU seconds per second, idle and in each phase.
+
+Run from the repository root (POSIX only, the emulator needs a pty):
+    python -m benchmarks.bench_e2e [--frames 10] [--presses 50] [--decode-ms 120] [--loss 0]
+
+--firmware legacy emulates firmware without chunked transfers or link
+speed negotiation (FRAME/ACK/DONE exchange at 115200 baud).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import random
+import statistics
+import threading
+import time
+import numpy as np
+import serial.tools.list_ports
+from PIL import Image
+
+import esp32_emulator
+import main as host_main
+import pyserial
+from audio_sessions import FakeAudioBackend, FakeMasterVolume
+from host_daemon import HostDaemon
+from input_events import ButtonEventEngine, ActionExecutor, EVENT_PRESS
+from input_filter import InputFilterBank
+from media_provider import FakeMediaProvider
+
+SWITCHES = 2
+SLIDER_FUNCTIONS = ["MASTER_VOLUME", "app1", "app2"]
+BUTTON_UP, BUTTON_DOWN = 4095, 0
+FIRMWARES = {
+    "current": esp32_emulator.FIRMWARE_CAPS,
+    "legacy": (),
+}
+
+
+class Recorder:
+    """Monotonic times of an action, waitable from the benchmark thread."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.times = []
+
+    def record(self):
+        with self._cond:
+            self.times.append(time.monotonic())
+            self._cond.notify_all()
+
+    def wait_after(self, start, timeout):
+        """First recorded time after start, or None on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                later = [t for t in self.times if t > start]
+                if later:
+                    return later[0]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+
+class RecordingMasterVolume(FakeMasterVolume):
+    def __init__(self, recorder):
+        super().__init__()
+        self.recorder = recorder
+
+    def SetMasterVolumeLevel(self, level_db, context):
+        super().SetMasterVolumeLevel(level_db, context)
+        self.recorder.record()
+
+
+def album_art(seed):
+    """Detailed artwork, so frames compress like real covers do."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (24, 24, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize((600, 600), Image.BICUBIC)
+
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+    return f"p50 {statistics.median(ordered) * 1000:6.1f} ms, p99 {p99 * 1000:6.1f} ms"
+
+
+class Phase:
+    """Wall time and host CPU time of a block of the benchmark."""
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = time.process_time() - self.cpu
+
+    @property
+    def cpu_per_second(self):
+        return self.cpu / self.wall if self.wall else 0.0
+
+
+def run(args):
+    emulator = esp32_emulator.EmulatorProcess(
+        channels=SWITCHES + len(SLIDER_FUNCTIONS), caps=FIRMWARES[args.firmware],
+        decode_time=args.decode_ms / 1000, loss_rate=args.loss, seed=args.seed).start()
+    serial.tools.list_ports.comports = lambda: [esp32_emulator.port_info(emulator)]
+
+    # The same input path as main.py, with recording actions and audio backend
+    button_recorder, volume_recorder, frame_recorder = Recorder(), Recorder(), Recorder()
+    backend = FakeAudioBackend()
+    backend.master = RecordingMasterVolume(volume_recorder)
+    volume_obj, volume_actuator = make_volume(backend)
+    button_events = ButtonEventEngine(SWITCHES)
+    button_actions = {(i, EVENT_PRESS): button_recorder.record for i in range(SWITCHES)}
+    action_executor = ActionExecutor()
+    slider_filters = InputFilterBank(len(SLIDER_FUNCTIONS))
+
+    def handle_frame(frame):
+        host_main.process_received_data(data=frame.values, volume_obj=volume_actuator,
+                                        total_switches_sliders=emulator.channels,
+                                        no_of_switches=SWITCHES, no_of_sliders=len(SLIDER_FUNCTIONS),
+                                        button_events=button_events, button_actions=button_actions,
+                                        action_executor=action_executor,
+                                        slider_functions=SLIDER_FUNCTIONS,
+                                        slider_filters=slider_filters, sample_time=frame.time)
+
+    import media_session
+
+    serial_obj = pyserial.SerialConnection(emulator.channels, port_cache_file=None)
+    serial_obj.warm_up()
+    provider = FakeMediaProvider()
+    media_obj = media_session.Media(serial_obj=serial_obj, provider=provider)
+    daemon = HostDaemon(serial_obj, media_obj, on_telemetry=handle_frame,
+                        on_frame_sent=frame_recorder.record)
+    host = threading.Thread(target=asyncio.run, args=(daemon.run(),), daemon=True)
+    host.start()
+
+    deadline = time.monotonic() + 10
+    while serial_obj.protocol_version is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.5)  # Link speed negotiation follows the connection
+    with serial_obj.link_lock:
+        baudrate = serial_obj.ser.baudrate if serial_obj.ser else None
+    results = {"baudrate": baudrate}
+
+    with Phase() as idle:
+        time.sleep(args.idle)
+    results["idle"] = idle
+
+    # Frames: now-playing changes, one at a time so none is superseded
+    arts = [album_art(seed) for seed in range(args.frames)]
+    before = emulator.stats()
+    frame_times, missed_frames = [], 0
+    with Phase() as frames:
+        for i, art in enumerate(arts):
+            start = time.monotonic()
+            provider.set_now_playing(f"Title {i}", "Artist", f"Album {i}", art)
+            shown = frame_recorder.wait_after(start, timeout=10)
+            if shown is None:
+                missed_frames += 1
+            else:
+                frame_times.append(shown - start)
+    after = emulator.stats()
+    results["frames"] = (frames, frame_times, missed_frames,
+                         after["bytes_received"] - before["bytes_received"])
+
+    # Random pauses between inputs, so they do not fall into step with telemetry
+    rng = random.Random(args.seed)
+
+    def pause():
+        time.sleep(0.05 + rng.random() * 0.02)
+
+    # Buttons: press, wait for the shortcut, release past the debounce time
+    press_times, missed_presses = [], 0
+    with Phase() as presses:
+        for i in range(args.presses):
+            start = time.monotonic()
+            emulator.set_input(i % SWITCHES, BUTTON_DOWN)
+            done = button_recorder.wait_after(start, timeout=1)
+            if done is None:
+                missed_presses += 1
+            else:
+                press_times.append(done - start)
+            pause()
+            emulator.set_input(i % SWITCHES, BUTTON_UP)
+            pause()
+    results["presses"] = (presses, press_times, missed_presses)
+
+    # Slider: master volume knob swinging between two positions
+    slider_times, missed_moves = [], 0
+    with Phase() as moves:
+        for i in range(args.presses):
+            start = time.monotonic()
+            emulator.set_input(SWITCHES, 1000 if i % 2 else 3000)
+            done = volume_recorder.wait_after(start, timeout=1)
+            if done is None:
+                missed_moves += 1
+            else:
+                slider_times.append(done - start)
+            pause()
+    results["sliders"] = (moves, slider_times, missed_moves)
+
+    results["emulator"] = emulator.stats()
+    results["host"] = {"telemetry": serial_obj.telemetry_seq,
+                       "dropped": serial_obj.dropped_telemetry,
+                       "retransmitted": serial_obj.retransmitted_chunks}
+
+    daemon.stop()
+    host.join(timeout=5)
+    action_executor.stop()
+    volume_actuator.stop()
+    volume_obj.stop()
+    serial_obj.stop()
+    emulator.stop()
+    return results
+
+
+def make_volume(backend):
+    import volume_potentiometer
+
+    volume_obj = volume_potentiometer.VolumeControl(backend=backend)
+    return volume_obj, volume_potentiometer.VolumeActuator(volume_obj)
+
+
+def report(args, results):
+    print(f"firmware {args.firmware}, {results['baudrate']} baud, decode {args.decode_ms:.0f} ms, "
+          f"loss {args.loss:g}")
+
+    idle = results["idle"]
+    print(f"  idle            host CPU {idle.cpu_per_second * 1000:6.1f} ms/s")
+
+    phase, times, missed, payload = results["frames"]
+    shown = len(times)
+    print(f"  frames          {shown}/{shown + missed} shown, "
+          f"{shown / phase.wall:5.2f} frames/s, {payload / phase.wall / 1024:6.1f} KB/s, "
+          f"{percentiles(times)}, host CPU {phase.cpu_per_second * 1000:6.1f} ms/s")
+
+    for name, key in (("button -> action", "presses"), ("slider -> volume", "sliders")):
+        phase, times, missed = results[key]
+        print(f"  {name:<15} {percentiles(times)}, missed {missed}, "
+              f"host CPU {phase.cpu_per_second * 1000:6.1f} ms/s")
+
+    print(f"  telemetry {results['host']['telemetry']} frames, {results['host']['dropped']} dropped, "
+          f"{results['host']['retransmitted']} chunks retransmitted, "
+          f"{results['emulator']['bytes_lost']} bytes lost")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end host benchmark against the emulator")
+    parser.add_argument("--firmware", choices=sorted(FIRMWARES), default="current")
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--presses", type=int, default=50, help="Button presses and slider moves")
+    parser.add_argument("--idle", type=float, default=3.0, help="Idle phase length (s)")
+    parser.add_argument("--decode-ms", type=float, default=120,
+                        help="JPEG decode and draw time of a full frame on the ESP32")
+    parser.add_argument("--loss", type=float, default=0.0, help="Probability of losing a byte")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    # The host prints progress for every frame, keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run(args)
+    report(args, results)
+
+
+if __name__ == "__main__":
+    main()
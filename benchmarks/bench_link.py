@@ -0,0 +1,89 @@
+"""
+Image transfer throughput over the serial link at the fixed 115200 baud
+versus a negotiated link speed, against the pty firmware emulator.
+
+Run from the repository root (POSIX only, the emulator needs a pty):
+    python -m benchmarks.bench_link [--frames 5] [--size 30000] [--max-reliable 460800]
+
+--max-reliable makes the emulated bridge corrupt data above that rate, so
+negotiation has to fall back to the fastest rate that passes the loopback test.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+import serial.tools.list_ports
+
+import esp32_emulator
+import pyserial
+
+
+def wait_for_negotiation(serial_obj):
+    """Block until the link speed negotiation started on connecting is over."""
+    time.sleep(0.2)
+    with serial_obj.link_lock:
+        return serial_obj.ser.baudrate
+
+
+async def measure(args, emulator, baud_rates):
+    """Connect through the asyncio transport, then send frames the way the
+    daemon's send stage does. Returns (negotiated baud, frames sent, seconds)."""
+    loop = asyncio.get_running_loop()
+    serial.tools.list_ports.comports = lambda: [esp32_emulator.port_info(emulator)]
+    serial_obj = pyserial.SerialConnection(emulator.channels, port_cache_file=None,
+                                           baud_rates=baud_rates)
+    transport = pyserial.AsyncSerialTransport(serial_obj)
+    tasks = [asyncio.create_task(transport.run_connection()),
+             asyncio.create_task(transport.run_reader())]
+    try:
+        deadline = time.monotonic() + 10
+        while not (serial_obj.connected and serial_obj.protocol_version) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        negotiated = await loop.run_in_executor(None, wait_for_negotiation, serial_obj)
+
+        frames = [os.urandom(args.size) for _ in range(args.frames)]
+        start = time.perf_counter()
+        sent = 0
+        for frame in frames:
+            if await loop.run_in_executor(None, serial_obj.transmit_frame, frame):
+                sent += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        transport.close()
+        serial_obj.stop()
+    return negotiated, sent, elapsed
+
+
+def run(name, args, baud_rates, max_reliable_baud=None):
+    emulator = esp32_emulator.Esp32Emulator(max_reliable_baud=max_reliable_baud,
+                                            caps=("CHUNK", "BAUD")).start()
+    try:
+        negotiated, sent, elapsed = asyncio.run(measure(args, emulator, baud_rates))
+    finally:
+        emulator.stop()
+    print(f"{name:<28} {negotiated:>8} baud  {sent}/{args.frames} frames  "
+          f"{elapsed / args.frames * 1000:8.0f} ms/frame  "
+          f"{args.size * sent / elapsed / 1024:7.1f} KB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial link throughput benchmark")
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--size", type=int, default=30000, help="Frame payload bytes")
+    parser.add_argument("--max-reliable", type=int, default=460800,
+                        help="Fastest rate the emulated bridge handles without errors")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    run("fixed 115200", args, baud_rates=[115200])
+    run("negotiated", args, baud_rates=None)
+    run(f"negotiated, bridge <= {args.max_reliable}", args, baud_rates=None,
+        max_reliable_baud=args.max_reliable)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Track skip latency with and without prefetching the neighbouring queue
+items, against the firmware emulator: time from a skip on the media source
+until the display confirms the new frame.
+
+Run from the repository root (POSIX only, the emulator needs a pty):
+    python -m benchmarks.bench_prefetch [--tracks 12] [--dwell 1.0] [--rapid 0.1]
+
+--dwell is the time spent on each track before skipping (prefetching
+happens meanwhile), --rapid the interval of a burst of fast skips, which
+shows the wasted work when prefetched frames are skipped past.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import threading
+import time
+import serial.tools.list_ports
+
+import esp32_emulator
+import media_session
+import pyserial
+from benchmarks.bench_e2e import album_art, percentiles
+from host_daemon import HostDaemon
+from media_provider import FakeMediaProvider, NowPlaying
+
+
+def run(args, prefetch_depth):
+    emulator = esp32_emulator.EmulatorProcess(channels=5, decode_time=args.decode_ms / 1000).start()
+    serial.tools.list_ports.comports = lambda: [esp32_emulator.port_info(emulator)]
+
+    serial_obj = pyserial.SerialConnection(5, port_cache_file=None)
+    serial_obj.warm_up()
+    provider = FakeMediaProvider()
+    media_obj = media_session.Media(serial_obj=serial_obj, provider=provider,
+                                    prefetch_depth=prefetch_depth)
+    daemon = HostDaemon(serial_obj, media_obj, on_telemetry=lambda frame: None)
+    host = threading.Thread(target=asyncio.run, args=(daemon.run(),), daemon=True)
+    host.start()
+
+    deadline = time.monotonic() + 10
+    while serial_obj.protocol_version is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.5)  # Link speed negotiation
+
+    tracks = [NowPlaying(f"Track {i}", f"Artist {i % 3}", f"Album {i}", album_art(i))
+              for i in range(args.tracks + args.rapid_skips + 1)]
+    provider.set_queue(upcoming=tracks[1:])
+    provider.set_now_playing(*tracks[0])
+
+    def wait_for_new_frame(previous_digest, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            digest = serial_obj.last_frame_digest
+            if digest is not None and digest != previous_digest:
+                return time.monotonic()
+            time.sleep(0.001)
+        return None
+
+    wait_for_new_frame(None)
+    skip_times = []
+    for _ in range(args.tracks):
+        time.sleep(args.dwell)
+        previous_digest = serial_obj.last_frame_digest
+        start = time.monotonic()
+        provider.skip_next()
+        shown = wait_for_new_frame(previous_digest)
+        if shown is not None:
+            skip_times.append(shown - start)
+
+    # A burst of skips faster than frames can be prefetched or sent
+    for _ in range(args.rapid_skips):
+        time.sleep(args.rapid)
+        provider.skip_next()
+    time.sleep(args.dwell)
+
+    stats = serial_obj.prefetch_stats()
+    daemon.stop()
+    host.join(timeout=5)
+    serial_obj.stop()
+    emulator.stop()
+    return skip_times, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track skip latency with artwork prefetch")
+    parser.add_argument("--tracks", type=int, default=12, help="Skips measured")
+    parser.add_argument("--dwell", type=float, default=1.0, help="Seconds on each track")
+    parser.add_argument("--rapid", type=float, default=0.1, help="Interval of the fast skip burst")
+    parser.add_argument("--rapid-skips", type=int, default=6)
+    parser.add_argument("--decode-ms", type=float, default=120)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    results = []
+    for name, depth in (("no prefetch", 0), ("prefetch", 1)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            skip_times, stats = run(args, depth)
+        results.append((name, skip_times, stats))
+
+    for name, skip_times, stats in results:
+        print(f"{name:<12} skip -> shown {percentiles(skip_times)} ({len(skip_times)} skips)")
+        if stats["rendered"]:
+            print(f"{'':<12} prefetched {stats['rendered']}, hit rate {stats['hit_rate']:.0%}, "
+                  f"wasted {stats['wasted']} ({stats['wasted_ms']:.0f} ms of rendering)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Progressive frames against the firmware emulator: time from a now-playing
+change until the first pixels of the new frame are on screen (its preview,
+or the frame itself without one) and until the full quality frame is, with
+and without previews, at 115200 baud and at the negotiated link speed.
+
+The skip burst changes track again shortly after each change, which
+abandons the full quality pass of the skipped frame.
+
+Run from the repository root (POSIX only, the emulator needs a pty):
+    python -m benchmarks.bench_progressive [--frames 8] [--decode-ms 120]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import threading
+import time
+import serial.tools.list_ports
+
+import esp32_emulator
+import media_session
+import pyserial
+from benchmarks.bench_e2e import album_art, percentiles
+from host_daemon import HostDaemon
+from media_provider import FakeMediaProvider
+
+LINKS = {
+    "115200": tuple(cap for cap in esp32_emulator.FIRMWARE_CAPS if cap != "BAUD"),
+    "negotiated": esp32_emulator.FIRMWARE_CAPS,
+}
+
+
+def run(args, caps, progressive):
+    emulator = esp32_emulator.EmulatorProcess(channels=5, caps=caps,
+                                              decode_time=args.decode_ms / 1000).start()
+    serial.tools.list_ports.comports = lambda: [esp32_emulator.port_info(emulator)]
+
+    serial_obj = pyserial.SerialConnection(5, port_cache_file=None,
+                                           progressive=progressive)
+    serial_obj.warm_up()
+    provider = FakeMediaProvider()
+    media_obj = media_session.Media(serial_obj=serial_obj, provider=provider)
+    daemon = HostDaemon(serial_obj, media_obj, on_telemetry=lambda frame: None)
+    host = threading.Thread(target=asyncio.run, args=(daemon.run(),), daemon=True)
+    host.start()
+
+    deadline = time.monotonic() + 10
+    while serial_obj.protocol_version is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.5)  # Link speed negotiation
+    with serial_obj.link_lock:
+        baudrate = serial_obj.ser.baudrate if serial_obj.ser else None
+
+    def wait_for_frame(start, digest, timeout=10):
+        """(first pixels, full frame) times of the frame with digest after
+        start, None where missed."""
+        first_pixels = full = None
+        deadline = start + timeout
+        while full is None and time.monotonic() < deadline:
+            now = time.monotonic()
+            if serial_obj.last_frame_digest == digest:
+                full = now
+            if first_pixels is None and (full is not None or serial_obj.last_preview_digest == digest):
+                first_pixels = now
+            time.sleep(0.001)
+        return (None if first_pixels is None else first_pixels - start,
+                None if full is None else full - start)
+
+    def change_track(i):
+        """Start a track, returns the start time and the digest of its frame."""
+        track = (f"Title {i}", f"Artist {i}", f"Album {i}", album_art(i))
+        # Same frame the daemon renders, without warming its render cache
+        digest = reference.frame_digest(reference.render_frame(track[3], track[0], track[1]))
+        start = time.monotonic()
+        provider.set_now_playing(*track)
+        return start, digest
+
+    reference = pyserial.SerialConnection(5, port_cache_file=None)
+    first_times, full_times = [], []
+    for i in range(args.frames):
+        start, digest = change_track(i)
+        first_pixels, full = wait_for_frame(start, digest)
+        if first_pixels is not None:
+            first_times.append(first_pixels)
+        if full is not None:
+            full_times.append(full)
+
+    # Skip burst: the next track arrives while the previous one is on the wire
+    burst_times = []
+    for i in range(args.frames, args.frames + args.bursts):
+        change_track(i)
+        time.sleep(args.skip_interval)
+        start, digest = change_track(i + 1000)
+        first_pixels, _ = wait_for_frame(start, digest)
+        if first_pixels is not None:
+            burst_times.append(first_pixels)
+
+    results = {"baudrate": baudrate, "first": first_times, "full": full_times,
+               "burst": burst_times, "previews": serial_obj.previews_sent,
+               "cancelled": serial_obj.cancelled_transfers}
+    daemon.stop()
+    host.join(timeout=5)
+    serial_obj.stop()
+    emulator.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Progressive frame benchmark against the emulator")
+    parser.add_argument("--frames", type=int, default=8, help="Track changes measured")
+    parser.add_argument("--bursts", type=int, default=4, help="Skips during a transfer")
+    parser.add_argument("--skip-interval", type=float, default=0.1,
+                        help="Seconds between the two track changes of a skip")
+    parser.add_argument("--decode-ms", type=float, default=120,
+                        help="JPEG decode and draw time of a full frame on the ESP32")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    for link, caps in LINKS.items():
+        for progressive in (False, True):
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = run(args, caps, progressive)
+            mode = "progressive" if progressive else "full only"
+            print(f"{mode:<11} {results['baudrate']:>7} baud  "
+                  f"first pixels {percentiles(results['first'])}  "
+                  f"full frame {percentiles(results['full'])}")
+            print(f"{'':<25}skip burst first pixels {percentiles(results['burst'])}, "
+                  f"{results['previews']} previews, {results['cancelled']} full passes abandoned")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Per-frame render time and peak memory of FrameRenderer against the original
+thumbnail_to_jpg implementation, on thumbnails of increasing resolution.
+
+Run from the repository root:
+    python -m benchmarks.bench_render [--sizes 300 1000 3000] [--repeat 10]
+
+Peak memory is the growth in peak RSS of a fresh child process per case
+(Unix only; PIL allocates outside tracemalloc's view).
+"""
+import argparse
+import multiprocessing
+import statistics
+import time
+import numpy as np
+from PIL import Image, ImageFilter, ImageDraw, ImageFont, ImageEnhance
+
+from frame_renderer import FrameRenderer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def legacy_thumbnail_to_jpg(image, text, subtext):
+    """The original SerialConnection.thumbnail_to_jpg, kept as the baseline."""
+    # BLUR
+    blur = image
+    blur = blur.filter(ImageFilter.GaussianBlur(radius=5))
+    blur = blur.resize((320, 240))
+    enhancer = ImageEnhance.Brightness(blur)
+    blur = enhancer.enhance(0.5)
+
+    # IMAGE
+    imge = image.resize((140, 140))
+
+    # Create a rounded mask
+    rad = 10  # radius for the rounded corners
+    circle = Image.new('L', (rad * 2, rad * 2), 0)
+    draw = ImageDraw.Draw(circle)
+    draw.ellipse((0, 0, rad * 2 - 1, rad * 2 - 1), fill=255)
+
+    # Create an alpha mask for the image with rounded corners
+    alpha = Image.new('L', imge.size, 255)  # Start with a fully transparent alpha channel
+    w, h = imge.size
+
+    # Paste the circular mask into the four corners
+    alpha.paste(circle.crop((0, 0, rad, rad)), (0, 0))  # Top-left corner
+    alpha.paste(circle.crop((0, rad, rad, rad * 2)), (0, h - rad))  # Bottom-left corner
+    alpha.paste(circle.crop((rad, 0, rad * 2, rad)), (w - rad, 0))  # Top-right corner
+    alpha.paste(circle.crop((rad, rad, rad * 2, rad * 2)), (w - rad, h - rad))  # Bottom-right corner
+
+    imge.putalpha(alpha)  # Apply the alpha mask to the image
+
+    # Position the image onto the blurred background
+    position = (90, 35)
+    blur.paste(imge, position, imge)  # Use the image's alpha channel as a mask
+
+    # FONTS
+    i1 = ImageDraw.Draw(blur)
+    font = ImageFont.truetype('liberation-serif/LiberationSerif-Regular.ttf', 24)
+
+    # Get the bounding box of the text to center it
+    text = text
+    bbox = i1.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+
+    # Calculate the position to center the text
+    x = (blur.width - text_width) // 2
+    y = 176  # Position for the text (can adjust as needed)
+    i1.text((x, y), text, font=font, fill=(255, 255, 255))
+
+    # AUTHOR, SUBTEXT
+    text = subtext
+    font = ImageFont.truetype('liberation-serif/LiberationSerif-Regular.ttf',
+                              15)
+    bbox = i1.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    x = (blur.width - text_width) // 2
+    y = 205  # Position for the text (can adjust as needed)
+    i1.text((x, y), text, font=font, fill=(255, 255, 255))
+
+
+    return blur
+
+
+def make_thumbnail(size, seed=1):
+    rng = np.random.default_rng(seed)
+    small = Image.fromarray((rng.random((32, 32, 3)) * 255).astype(np.uint8))
+    return small.resize((size, size), Image.BICUBIC)
+
+
+def peak_rss_kb():
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_case(implementation, size, repeat, results):
+    thumbnail = make_thumbnail(size)
+    if implementation == "legacy":
+        render = legacy_thumbnail_to_jpg
+    else:
+        render = FrameRenderer().render
+
+    baseline = peak_rss_kb()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(thumbnail, "Benchmark Title", "Benchmark Artist")
+        times.append(time.perf_counter() - start)
+    results.put((statistics.median(times), peak_rss_kb() - baseline))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FrameRenderer vs legacy thumbnail_to_jpg")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 1000, 3000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'thumbnail':>10} {'legacy ms':>10} {'renderer ms':>12} {'speedup':>8} "
+          f"{'legacy peak MB':>15} {'renderer peak MB':>17}")
+
+    for size in args.sizes:
+        row = {}
+        for implementation in ("legacy", "renderer"):
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run_case,
+                                              args=(implementation, size, args.repeat, results))
+            process.start()
+            row[implementation] = results.get()
+            process.join()
+
+        (legacy_time, legacy_peak), (new_time, new_peak) = row["legacy"], row["renderer"]
+        print(f"{size:>5}x{size:<4} {legacy_time * 1000:>10.1f} {new_time * 1000:>12.1f} "
+              f"{legacy_time / new_time:>7.1f}x {legacy_peak / 1024:>15.1f} {new_peak / 1024:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
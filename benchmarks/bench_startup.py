@@ -0,0 +1,201 @@
+"""
+Cold start cost of the host daemon: module import time in a fresh
+interpreter, and time to first input / first frame for the original
+sequential start-up (fixed sleeps between subsystems) versus
+StartupOrchestrator running the same subsystems concurrently.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [--runs 5] [--port-ms 300] [--audio-ms 250]
+
+Hardware dependent steps use fakes with configurable latencies: the serial
+port open and handshake, audio (COM) initialisation, the keyboard hook and
+the media provider start. Rendering, encoding and the daemon itself are the
+real code. Imports of pynput, pycaw and winrt are not measured unless they
+are installed.
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# What main.py used to import before any work could start
+EAGER_IMPORTS = ["main", "numpy", "PIL.Image", "frame_renderer", "frame_diff", "media_session",
+                 "volume_potentiometer"]
+OPTIONAL_EAGER_IMPORTS = ["pynput", "winrt.windows.media.control", "pycaw.pycaw"]
+
+
+def import_time(modules):
+    """Seconds to import modules in a fresh interpreter."""
+    code = ("import time\nstart = time.perf_counter()\n"
+            + "".join(f"import {module}\n" for module in modules)
+            + "print(time.perf_counter() - start)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+def installed(module):
+    result = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True)
+    return result.returncode == 0
+
+
+class FakePort:
+    is_open = True
+    in_waiting = 0
+
+    def __init__(self, channels):
+        self.line = ("|".join(["2000"] * channels) + "\r\n").encode()
+
+    def read(self, size):
+        time.sleep(0.005)  # ~200 telemetry frames per second
+        return self.line
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+def make_serial(args, channels):
+    import pyserial
+
+    class BenchSerialConnection(pyserial.SerialConnection):
+        def _start_connection(self):
+            time.sleep(args.port_ms / 1000)
+            self.ser = FakePort(channels)
+            self.connected = True
+
+        def transmit_frame(self, image_data):
+            time.sleep(args.send_ms / 1000)
+            return True
+
+    return BenchSerialConnection(channels)
+
+
+def make_volume(args):
+    import volume_potentiometer
+    from audio_sessions import FakeAudioBackend
+
+    class SlowAudioBackend(FakeAudioBackend):
+        def init_thread(self):
+            time.sleep(args.audio_ms / 1000)
+
+    return volume_potentiometer.VolumeControl(backend=SlowAudioBackend())
+
+
+def make_media(args, serial_obj):
+    import media_session
+    from media_provider import FakeMediaProvider
+    from PIL import Image
+
+    class SlowProvider(FakeMediaProvider):
+        async def start(self, on_change):
+            await asyncio.sleep(args.media_ms / 1000)
+            await super().start(on_change)
+
+    provider = SlowProvider()
+    provider.set_now_playing("Title", "Artist", "Album", Image.new("RGB", (600, 600), (200, 40, 40)))
+    return media_session.Media(serial_obj=serial_obj, provider=provider)
+
+
+def legacy_start(args):
+    """The original order: each subsystem after the previous one, with sleeps."""
+    start = time.perf_counter()
+    first_frame = []
+
+    serial_obj = make_serial(args, 3)
+    serial_obj._start_connection()
+    serial_obj.warm_up()  # The renderer used to be built in the constructor
+    time.sleep(args.sleep)
+    volume_obj = make_volume(args)
+    time.sleep(args.sleep)
+
+    # Media thread: provider start, then render and send
+    def send(payload):
+        serial_obj.transmit_frame(payload)
+        first_frame.append(time.perf_counter() - start)
+
+    serial_obj.submit_image = lambda image, text, subtext: send(serial_obj.render_frame(image, text, subtext))
+    media_obj = make_media(args, serial_obj)
+    threading.Thread(target=asyncio.run, args=(media_obj.run(),), daemon=True).start()
+    time.sleep(args.sleep)
+    time.sleep(args.key_ms / 1000)  # The keyboard hook started on import
+    first_input = time.perf_counter() - start  # The main loop's first sample
+
+    while not first_frame:
+        time.sleep(0.001)
+    media_obj.stop()
+    volume_obj.stop()
+    return first_input, first_frame[0]
+
+
+async def orchestrated_start(args):
+    from host_daemon import HostDaemon
+    from startup import StartupOrchestrator
+
+    startup = StartupOrchestrator()
+    serial_obj = make_serial(args, 3)
+    startup.add("volume", lambda: make_volume(args))
+    startup.add("buttons", lambda: time.sleep(args.key_ms / 1000))
+    startup.add("renderer", serial_obj.warm_up)
+    startup.add("input", lambda: None, after=("volume", "buttons"))
+
+    daemon = None
+
+    def check_done():
+        if startup.first_input_ms is not None and startup.first_frame_ms is not None:
+            daemon.stop()
+
+    def on_input(frame):
+        startup.mark_first_input()
+        check_done()
+
+    def on_frame_sent():
+        startup.mark_first_frame()
+        check_done()
+
+    media_obj = make_media(args, serial_obj)
+    daemon = HostDaemon(serial_obj, media_obj, on_telemetry=on_input,
+                        input_ready=startup.ready_event("input"), on_frame_sent=on_frame_sent)
+    startup_task = asyncio.create_task(startup.run())
+    await daemon.run()
+    await startup_task
+    if "volume" in startup.results:
+        startup.results["volume"].stop()
+    return startup.first_input_ms / 1000, startup.first_frame_ms / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host start-up benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--sleep", type=float, default=1.0, help="Legacy sleep between subsystems (s)")
+    parser.add_argument("--port-ms", type=float, default=300)
+    parser.add_argument("--audio-ms", type=float, default=250)
+    parser.add_argument("--key-ms", type=float, default=50)
+    parser.add_argument("--media-ms", type=float, default=200)
+    parser.add_argument("--send-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    eager = EAGER_IMPORTS + [module for module in OPTIONAL_EAGER_IMPORTS if installed(module)]
+    lazy_times = [import_time(["main"]) for _ in range(args.runs)]
+    eager_times = [import_time(eager) for _ in range(args.runs)]
+    print(f"import main:         lazy {statistics.median(lazy_times) * 1000:7.1f} ms, "
+          f"eager {statistics.median(eager_times) * 1000:7.1f} ms")
+
+    legacy = [legacy_start(args) for _ in range(args.runs)]
+    orchestrated = [asyncio.run(orchestrated_start(args)) for _ in range(args.runs)]
+
+    for name, results in (("sequential + sleeps", legacy), ("orchestrated", orchestrated)):
+        first_input = statistics.median(r[0] for r in results) * 1000
+        first_frame = statistics.median(r[1] for r in results) * 1000
+        print(f"{name:<20} first input {first_input:7.1f} ms, first frame {first_frame:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-track latency and Python-side allocation of thumbnail ingestion, comparing
+the original load_thumbnail copy chain with ThumbnailLoader, using a fake
+in-memory thumbnail stream.
+
+Run from the repository root:
+    python -m benchmarks.bench_thumbnail [--sizes 300 1200 3000] [--tracks 20]
+
+Allocation is the tracemalloc peak per track: the Python buffers and copies
+made on the way to PIL (PIL's own decode memory is not included).
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+from thumbnail_loader import BufferPool, ByteBuffer, FakeThumbnailStream, ThumbnailLoader
+
+
+async def legacy_load(thumb_stream_ref):
+    """The original load_thumbnail, with bytearrays standing in for WinRT buffers."""
+    thumb_read_buffer = ByteBuffer(5000000)
+    readable_stream = await thumb_stream_ref.open_read_async()
+    await readable_stream.read_async(thumb_read_buffer, thumb_read_buffer.capacity, 0)
+
+    # DataReader.read_bytes returns a list of ints
+    byte_buffer = list(thumb_read_buffer[:thumb_read_buffer.length])
+    binary = io.BytesIO(bytearray(byte_buffer))
+    img = Image.open(binary)
+    img.convert("RGB")  # Result discarded, as in the original
+    img.load()
+    binary.close()
+    readable_stream.close()
+    return img
+
+
+def make_jpeg(size, seed):
+    rng = np.random.default_rng(seed)
+    small = Image.fromarray((rng.random((24, 24, 3)) * 255).astype(np.uint8))
+    image_buffer = io.BytesIO()
+    small.resize((size, size), Image.BICUBIC).save(image_buffer, format="JPEG", quality=90)
+    return image_buffer.getvalue()
+
+
+async def measure(load, streams):
+    times, peaks = [], []
+    for stream in streams:
+        tracemalloc.start()
+        start = time.perf_counter()
+        await load(stream)
+        times.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return statistics.median(times), statistics.median(peaks)
+
+
+async def run(args):
+    print(f"{'thumbnail':>10} {'jpeg KB':>8} {'legacy ms':>10} {'loader ms':>10} "
+          f"{'legacy alloc KB':>16} {'loader alloc KB':>16}")
+
+    for size in args.sizes:
+        streams = [FakeThumbnailStream(make_jpeg(size, seed)) for seed in range(args.tracks)]
+        pool = BufferPool(ByteBuffer)
+        loader = ThumbnailLoader(pool)
+
+        legacy_time, legacy_peak = await measure(legacy_load, streams)
+        await loader.load(streams[0])  # Warm the pool, as after the first track
+        loader_time, loader_peak = await measure(loader.load, streams)
+
+        print(f"{size:>5}x{size:<4} {streams[0].size / 1024:>8.0f} {legacy_time * 1000:>10.1f} "
+              f"{loader_time * 1000:>10.1f} {legacy_peak / 1024:>16.0f} {loader_peak / 1024:>16.0f}")
+        print(f"{'':>10} pool: {pool.allocations} allocations, {pool.reuses} reuses")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thumbnail ingestion benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 1200, 3000])
+    parser.add_argument("--tracks", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,606 @@
+"""
+Host-side stand-in for the ESP32 firmware on a pseudo terminal, for
+benchmarks and experiments without the board (POSIX only).
+
+The emulator answers the same serial protocol as ver_8_tft_btn_display.ino
+and throttles both directions to the negotiated baud rate, so transfer
+times on the pty match what the wire would allow. JPEG decode time on the
+ESP32 and bytes lost on the wire can be simulated as well.
+
+    emulator = Esp32Emulator()
+    emulator.start()
+    ser = serial.Serial(emulator.device)
+    ...
+    emulator.stop()
+
+EmulatorProcess runs it in a child process instead, so its work does not
+count toward the host's CPU time.
+"""
+import math
+import multiprocessing
+import os
+import random
+import re
+import select
+import threading
+import time
+import serial_protocol
+
+FIRMWARE_CAPS = ("CHUNK", "RECT", "RGB565", "RLE565", "BAUD", "SCALE")
+SUPPORTED_BAUDS = (115200, 230400, 460800, 921600, 1500000, 2000000)
+TFT_HEIGHT = 320
+SCREEN_PIXELS = 320 * 240
+MAX_CHUNK_SIZE = 1024
+MAX_IMAGE_SIZE = 90000
+MAX_STREAM_SIZE = SCREEN_PIXELS * 2
+IMAGE_RECEIVE_TIMEOUT = 2.0
+SERIAL_RX_BUFFER_SIZE = 8192
+STREAM_TIMEOUT = 1.0  # Arduino Stream default, the sketch does not change it
+MAX_COMMAND_LENGTH = 512  # LOOP lines are the longest
+COMMAND_TIMEOUT = 1.0
+COMMAND_STARTS = b"PBLXF"
+
+
+class WireClock:
+    """Paces bytes to a baud rate (10 bits per byte on the wire)."""
+
+    def __init__(self, baudrate):
+        self.baudrate = baudrate
+        self._free_at = 0.0
+
+    def send(self, count):
+        """Block until count more bytes would have crossed the wire."""
+        now = time.monotonic()
+        self._free_at = max(self._free_at, now) + count * 10 / self.baudrate
+        delay = self._free_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ByteLoss:
+    """Drops each byte with probability rate, as a noisy line would."""
+
+    def __init__(self, rate, rng):
+        self.rate = rate
+        self.rng = rng
+        self.lost = 0
+        self._until_next = self._gap()
+
+    def _gap(self):
+        if not self.rate:
+            return math.inf
+        # Bytes until the next loss are geometrically distributed
+        return int(math.log(1.0 - self.rng.random()) / math.log(1.0 - self.rate))
+
+    def apply(self, data):
+        if self._until_next >= len(data):
+            self._until_next -= len(data)
+            return data
+        kept = bytearray()
+        start = 0
+        while start + self._until_next < len(data):
+            drop = start + self._until_next
+            kept += data[start:drop]
+            self.lost += 1
+            start = drop + 1
+            self._until_next = self._gap()
+        kept += data[start:]
+        self._until_next -= len(data) - start
+        return bytes(kept)
+
+
+class SerialInput:
+    """Receive side of the ESP32's HardwareSerial: a bounded buffer read
+    through the Arduino Stream calls the sketch uses, with their timeout.
+
+    Bytes that arrive while the buffer is full are dropped, as the UART
+    driver does. read_bytes() gives up once timeout passes without a new
+    byte, like Stream::readBytes().
+    """
+
+    def __init__(self, size=SERIAL_RX_BUFFER_SIZE, timeout=STREAM_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.overflowed = 0
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def feed(self, data):
+        with self._cond:
+            room = self.size - len(self._buffer)
+            self._buffer += data[:room]
+            self.overflowed += max(0, len(data) - room)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def wait(self, more_than, timeout):
+        """Sleep until more than more_than bytes are buffered, or timeout passes."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._buffer) > more_than or self._closed, timeout)
+
+    def available(self):
+        return len(self._buffer)
+
+    def peek(self):
+        with self._cond:
+            return self._buffer[0] if self._buffer else -1
+
+    def read(self):
+        with self._cond:
+            if not self._buffer:
+                return -1
+            value = self._buffer[0]
+            del self._buffer[:1]
+            return value
+
+    def read_bytes(self, count):
+        data = bytearray()
+        while len(data) < count:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._buffer or self._closed, self.timeout) \
+                        or not self._buffer:
+                    break
+                take = min(count - len(data), len(self._buffer))
+                data += self._buffer[:take]
+                del self._buffer[:take]
+        return bytes(data)
+
+
+def to_int(text, bits=32):
+    """Arduino String::toInt() (atol), stored in an unsigned integer of the given width."""
+    digits = re.match(r"\s*[-+]?\d*", text).group().strip()
+    value = int(digits) if digits.lstrip("+-") else 0
+    return value & ((1 << bits) - 1)
+
+
+class Esp32Emulator:
+    """Emulated firmware behind the slave end of a pty.
+
+    The firmware side is a port of ver_8_tft_btn_display.ino: loop() and the
+    functions it calls run on their own thread and read the received bytes
+    with the same Stream calls, timeouts and state, so a byte lost on the
+    wire puts the emulator out of step exactly where it would the ESP32.
+    Keep the two in step when either changes.
+
+    telemetry_interval: seconds between telemetry frames (None disables them).
+    max_reliable_baud: rates above it corrupt data, as a USB bridge or cable
+    that cannot keep up would, so the loopback test fails there.
+    decode_time: seconds to decode and draw a full screen JPEG, scaled down
+    for smaller regions and previews (which cost the decode of their own
+    size, the enlarged panel writes are not modelled). The firmware handles
+    no input meanwhile.
+    loss_rate: probability of each byte being lost, in either direction.
+    caps without CHUNK make the host fall back to the legacy FRAME exchange.
+    """
+
+    def __init__(self, channels=5, telemetry_interval=0.02, baudrate=serial_protocol.BASE_BAUD_RATE,
+                 max_reliable_baud=None, caps=FIRMWARE_CAPS, decode_time=0.0, loss_rate=0.0,
+                 seed=None):
+        self.channels = channels
+        self.telemetry_interval = telemetry_interval
+        self.max_reliable_baud = max_reliable_baud
+        self.caps = caps
+        self.decode_time = decode_time
+
+        rng = random.Random(seed)
+        self.rx_loss = ByteLoss(loss_rate, rng)
+        self.tx_loss = ByteLoss(loss_rate, rng)
+
+        self.baudrate = baudrate
+        self.rx_clock = WireClock(baudrate)
+        self.tx_clock = WireClock(baudrate)
+        self.binary_telemetry = False
+        self.slider_values = [2048] * channels
+
+        self.master_fd, self.slave_fd = os.openpty()
+        self.device = os.ttyname(self.slave_fd)
+
+        self.serial = SerialInput()
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.previous_baud = 0
+        self.baud_switch_time = 0.0
+
+        # Display and transfer state, named after the sketch's globals
+        self.current_frame_digest = ""
+        self.image_buffer = bytearray(MAX_IMAGE_SIZE)
+        self.rx_digest = ""
+        self.rx_size = 0
+        self.rx_chunk_size = 0
+        self.rx_total_chunks = 0
+        self.rx_received_chunks = 0
+        self.rx_active = False
+        self.rx_chunk_map = set()
+        self.rx_format = ("jpeg", 0, 0, 1)  # Codec, width, height, scale
+        self.rx_frame_digest = ""
+        self.frames_received = 0
+        self.bytes_received = 0
+
+        self._threads = [threading.Thread(target=self._read_loop, daemon=True),
+                         threading.Thread(target=self._firmware_loop, daemon=True)]
+        if telemetry_interval:
+            self._threads.append(threading.Thread(target=self._telemetry_loop, daemon=True))
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self.serial.close()
+        for fd in (self.master_fd, self.slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def set_input(self, channel, value):
+        """Set the raw ADC reading of a slider or button, sent with the next telemetry."""
+        self.slider_values[channel] = value
+
+    def stats(self):
+        return {
+            "frames_received": self.frames_received,
+            "bytes_received": self.bytes_received,
+            "bytes_lost": self.rx_loss.lost + self.tx_loss.lost + self.serial.overflowed,
+        }
+
+    # Output
+
+    def _corrupt(self, data):
+        if self.max_reliable_baud and self.baudrate > self.max_reliable_baud and data:
+            data = bytearray(data)
+            data[len(data) // 2] ^= 0x55
+        return bytes(data)
+
+    def _send(self, data):
+        with self._write_lock:
+            self.tx_clock.send(len(data))
+            try:
+                os.write(self.master_fd, self.tx_loss.apply(self._corrupt(data)))
+            except OSError:
+                pass
+
+    def reply(self, line):
+        self._send(line.encode() + b"\r\n")
+
+    def _telemetry_loop(self):
+        while not self._stop_event.wait(self.telemetry_interval):
+            if self.binary_telemetry:
+                self._send(serial_protocol.encode_telemetry(self.slider_values))
+            else:
+                self.reply("|".join(str(value) for value in self.slider_values))
+
+    def _set_baud(self, rate):
+        with self._write_lock:
+            self.baudrate = rate
+            self.rx_clock.baudrate = rate
+            self.tx_clock.baudrate = rate
+
+    # Input: the wire into the UART buffer
+
+    def _read_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                readable, _, _ = select.select([self.master_fd], [], [], 0.05)
+                if not readable:
+                    continue
+                data = os.read(self.master_fd, 4096)
+            except (OSError, ValueError):
+                return
+            if not data:
+                continue
+            self.rx_clock.send(len(data))
+            self.serial.feed(self.rx_loss.apply(self._corrupt(data)))
+
+    # The sketch
+
+    def _firmware_loop(self):
+        # loop()
+        while not self._stop_event.is_set():
+            available = self.serial.available()
+            self._process_incoming_serial()
+
+            # The host never confirmed the new link speed, go back to the old one
+            if self.previous_baud and time.monotonic() - self.baud_switch_time \
+                    > serial_protocol.BAUD_COMMIT_TIMEOUT:
+                self._set_baud(self.previous_baud)
+                self.previous_baud = 0
+
+            # The sketch only idles when nothing is waiting; waiting for new
+            # bytes when nothing was taken is the same without the spinning
+            if not self.serial.available() or self.serial.available() == available:
+                self.serial.wait(self.serial.available(), 0.001)
+
+    @staticmethod
+    def _is_message_start(value):
+        # First byte of a chunk or of a command line from the host
+        return value == serial_protocol.CHUNK_SYNC or value in COMMAND_STARTS
+
+    def _read_command(self):
+        """readCommand(): a printable line without its newline, "" if the
+        read ends at any other byte (left unread), a pause or the length cap."""
+        serial = self.serial
+        command = bytearray()
+        last_byte_time = time.monotonic()
+        while len(command) < MAX_COMMAND_LENGTH:
+            if not serial.available():
+                if time.monotonic() - last_byte_time > COMMAND_TIMEOUT or self._stop_event.is_set():
+                    return ""
+                serial.wait(0, 0.001)
+                continue
+            value = serial.peek()
+            if value == ord("\n"):
+                serial.read()
+                return command.decode("ascii")
+            if value < 0x20 or value > 0x7E:
+                return ""
+            command.append(serial.read())
+            last_byte_time = time.monotonic()
+        return ""
+
+    def _process_incoming_serial(self):
+        serial = self.serial
+        if not serial.available():
+            return
+
+        # Anything else is the rest of a chunk whose start was lost on the
+        # wire, or line noise: skip to the next chunk header or command
+        if not self._is_message_start(serial.peek()):
+            while serial.available() and not self._is_message_start(serial.peek()):
+                serial.read()
+            return
+
+        if serial.peek() == serial_protocol.CHUNK_SYNC:
+            self._receive_chunk()
+            return
+
+        command = self._read_command()
+        baud = "BAUD" in self.caps  # Negotiation only with the BAUD capability
+        if command == "PING":
+            self.reply(f"ALIVE {self.current_frame_digest}")
+        elif command.startswith("PROTO "):
+            # "PROTO <version>" selects the telemetry format, 0 = text
+            self.binary_telemetry = to_int(command[6:]) == serial_protocol.PROTOCOL_VERSION
+            self.reply(f"PROTO {1 if self.binary_telemetry else 0} {' '.join(self.caps)}")
+        elif command == "PROBE":
+            self.reply(f"HELLO {serial_protocol.FIRMWARE_NAME} emulator {' '.join(self.caps)}")
+        elif command == "BAUDS" and baud:
+            self.reply("BAUDS " + " ".join(str(rate) for rate in SUPPORTED_BAUDS))
+        elif command == "BAUD COMMIT" and baud:
+            self.previous_baud = 0
+            self.reply("BAUD COMMIT OK")
+        elif command.startswith("BAUD ") and baud:
+            rate = to_int(command[5:])
+            if rate not in SUPPORTED_BAUDS:
+                self.reply("Error: Unsupported baud rate")
+                return
+            self.reply(f"BAUD {rate} OK")
+            self.previous_baud = self.baudrate
+            self._set_baud(rate)
+            self.baud_switch_time = time.monotonic()
+        elif command.startswith("LOOP "):
+            self.reply(command)
+        elif command.startswith("XFER "):
+            self._start_chunked_transfer(command)
+        elif command.startswith("FRAME "):
+            self._handle_image_transfer(command[6:])
+
+    def _handle_image_transfer(self, digest):
+        size_bytes = self.serial.read_bytes(4)
+        if len(size_bytes) != 4:
+            return
+        image_size = int.from_bytes(size_bytes, "little")
+        if image_size > MAX_IMAGE_SIZE:
+            self.reply("Error: Image too large!")
+            return
+
+        # The buffer is about to be overwritten, a chunked transfer cannot resume
+        self.rx_active = False
+        self.reply("ACK")
+        if self._receive_image_data(image_size):
+            self.bytes_received += image_size
+            self._decode()
+            self.current_frame_digest = digest
+            self.frames_received += 1
+            self.reply("DONE")
+
+    def _receive_image_data(self, image_size):
+        received = 0
+        last_byte_time = time.monotonic()
+        while received < image_size:
+            if self._stop_event.is_set():
+                return False
+            if self.serial.available():
+                data = self.serial.read_bytes(min(self.serial.available(), image_size - received))
+                self.image_buffer[received:received + len(data)] = data
+                received += len(data)
+                last_byte_time = time.monotonic()
+            elif time.monotonic() - last_byte_time > IMAGE_RECEIVE_TIMEOUT:
+                self.reply("Error: Image receive timeout")
+                return False
+            else:
+                self.serial.wait(0, 0.001)
+        return True
+
+    def _start_chunked_transfer(self, command):
+        # XFER <digest> <size> <chunk size> [<x> <y> <frame digest> [<codec> <w> <h> [<scale>]]]
+        fields = command.split(" ")[:11]
+        count = len(fields)
+        if count < 4:
+            self.reply("Error: Bad XFER")
+            return
+
+        digest = fields[1]
+        size = to_int(fields[2])
+        chunk_size = to_int(fields[3], 16)
+        frame_digest = fields[6] if count > 6 else digest
+        codec = fields[7] if count > 7 and fields[7] in ("rgb565", "rle565") else "jpeg"
+        width = to_int(fields[8], 16) if count > 8 else 0
+        height = to_int(fields[9], 16) if count > 9 else 0
+        scale = to_int(fields[10], 8) if count > 10 else 1
+
+        max_size = MAX_STREAM_SIZE if codec == "rgb565" else MAX_IMAGE_SIZE
+        if size == 0 or size > max_size:
+            self.reply("Error: Image too large!")
+            return
+        if codec != "jpeg" and (width == 0 or width > TFT_HEIGHT or height == 0 or height > TFT_HEIGHT):
+            self.reply("Error: Bad image dimensions")
+            return
+        if codec == "rgb565" and (size != width * height * 2 or chunk_size % 2):
+            self.reply("Error: Bad raw image size")
+            return
+        if scale not in (1, 2, 4, 8) or (scale != 1 and codec != "jpeg"):
+            self.reply("Error: Bad scale")
+            return
+        if chunk_size < 64 or chunk_size > MAX_CHUNK_SIZE:
+            self.reply("Error: Bad chunk size")
+            return
+
+        resume = self.rx_active and digest == self.rx_digest and size == self.rx_size \
+            and chunk_size == self.rx_chunk_size
+        if not resume:
+            self.rx_digest = digest
+            self.rx_size = size
+            self.rx_chunk_size = chunk_size
+            self.rx_total_chunks = (size + chunk_size - 1) // chunk_size
+            self.rx_received_chunks = 0
+            self.rx_chunk_map = set()
+            self.rx_active = True
+        self.rx_format = (codec, width, height, scale)
+        self.rx_frame_digest = "" if frame_digest == "-" else frame_digest
+
+        # Resume from the first chunk we do not have yet
+        first_missing = 0
+        while first_missing < self.rx_total_chunks and first_missing in self.rx_chunk_map:
+            first_missing += 1
+        self.reply(f"ACK {first_missing * self.rx_chunk_size}")
+
+    def _plausible_chunk_header(self, header):
+        _, seq, length, _ = serial_protocol.CHUNK_HEADER.unpack(header)
+        if seq >= self.rx_total_chunks:
+            return False
+        offset = seq * self.rx_chunk_size
+        return length == (self.rx_size - offset if seq == self.rx_total_chunks - 1
+                          else self.rx_chunk_size)
+
+    def _receive_chunk(self):
+        header_size = serial_protocol.CHUNK_HEADER.size
+        header = self.serial.read_bytes(header_size)
+        if len(header) != header_size:
+            return
+
+        # An implausible header is dropped without a reply, the search goes
+        # on from the next sync byte inside it
+        while not self._plausible_chunk_header(header):
+            next_sync = header.find(bytes([serial_protocol.CHUNK_SYNC]), 1)
+            if next_sync < 0:
+                return
+            more = self.serial.read_bytes(next_sync)
+            if len(more) != next_sync:
+                return
+            header = header[next_sync:] + more
+        _, seq, length, expected_crc = serial_protocol.CHUNK_HEADER.unpack(header)
+
+        payload = self.serial.read_bytes(length)
+        if len(payload) != length:
+            self.reply(f"CNAK {seq}")
+            return
+
+        crc = serial_protocol.crc16(payload, serial_protocol.crc16(header[1:5]))
+        if crc != expected_crc:
+            self.reply(f"CNAK {seq}")
+            return
+
+        offset = seq * self.rx_chunk_size
+
+        # Duplicate of a chunk we already have (lost CACK): just confirm again
+        if self.rx_active and seq not in self.rx_chunk_map:
+            if self.rx_format[0] != "rgb565":
+                self.image_buffer[offset:offset + length] = payload
+            self.rx_chunk_map.add(seq)
+            self.rx_received_chunks += 1
+            self.bytes_received += length
+        self.reply(f"CACK {seq}")
+
+        if self.rx_active and self.rx_received_chunks == self.rx_total_chunks:
+            self.rx_active = False
+            self._decode(*self.rx_format)
+            self.current_frame_digest = self.rx_frame_digest
+            self.frames_received += 1
+            self.reply("DONE")
+
+    def _decode(self, codec="jpeg", width=0, height=0, scale=1):
+        # The RGB565 codecs are drawn without decoding
+        if codec != "jpeg" or not self.decode_time:
+            return
+        area = width * height if width and height else SCREEN_PIXELS // (scale * scale)
+        time.sleep(self.decode_time * min(1.0, area / SCREEN_PIXELS))
+
+
+def _serve(conn, options):
+    emulator = Esp32Emulator(**options).start()
+    conn.send(emulator.device)
+    try:
+        while True:
+            command, *args = conn.recv()
+            if command == "set_input":
+                emulator.set_input(*args)
+            elif command == "stats":
+                conn.send(emulator.stats())
+            elif command == "stop":
+                break
+    except EOFError:
+        pass
+    finally:
+        emulator.stop()
+
+
+class EmulatorProcess:
+    """Esp32Emulator in a child process, controlled through a pipe.
+
+    Takes the same options as Esp32Emulator. The pty device is available
+    as .device once start() returns.
+    """
+
+    def __init__(self, **options):
+        self.channels = options.get("channels", 5)
+        self.device = None
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, args=(child_conn, options),
+                                                daemon=True)
+
+    def start(self):
+        self._process.start()
+        self.device = self._conn.recv()
+        return self
+
+    def set_input(self, channel, value):
+        self._conn.send(("set_input", channel, value))
+
+    def stats(self):
+        self._conn.send(("stats",))
+        return self._conn.recv()
+
+    def stop(self):
+        try:
+            self._conn.send(("stop",))
+        except OSError:
+            pass
+        self._process.join(timeout=2)
+
+
+def port_info(emulator):
+    """ListPortInfo describing the emulator as a CP210x bridge, for port discovery."""
+    from serial.tools.list_ports_common import ListPortInfo
+
+    info = ListPortInfo(emulator.device)
+    info.vid, info.pid, info.serial_number = 0x10C4, 0xEA60, "EMULATOR"
+    info.hwid = "USB VID:PID=10C4:EA60 SER=EMULATOR"
+    return info
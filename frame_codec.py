@@ -0,0 +1,184 @@
+import io
+import struct
+
+# NumPy and PIL are imported inside the functions that need them, so the
+# codec names and unpack() can be used without loading either at startup.
+
+# Payload codecs understood by the firmware (the XFER codec field)
+CODEC_JPEG = "jpeg"      # Baseline JPEG, decoded on the ESP32 by TJpgDec
+CODEC_RGB565 = "rgb565"  # Raw little-endian RGB565, streamed straight to the panel
+CODEC_RLE565 = "rle565"  # PackBits style run-length encoded RGB565
+CODECS = (CODEC_JPEG, CODEC_RGB565, CODEC_RLE565)
+
+# Encoded frames are kept (and cached) as self-describing containers. JPEG is
+# stored as is, the RGB565 codecs get a small host-side header with the codec
+# and dimensions, which is stripped before the payload goes on the wire.
+_CONTAINER = struct.Struct("<4sHH")
+_MAGIC = {CODEC_RGB565: b"R565", CODEC_RLE565: b"RLE5"}
+_CODEC_BY_MAGIC = {magic: codec for codec, magic in _MAGIC.items()}
+
+# The firmware buffers JPEG and RLE payloads in a fixed 90 KB buffer, raw
+# RGB565 is drawn as it arrives and needs no buffer.
+MAX_BUFFERED_PAYLOAD = 90000
+
+# RLE packet header: 0..127 -> (h + 1) literal pixels follow,
+# 128..255 -> the next pixel repeats (h - 126) times
+_MAX_LITERAL = 128
+_MAX_REPEAT = 129
+
+
+def to_rgb565(pixels):
+    """Convert an RGB uint8 array (h x w x 3) to a uint16 RGB565 array."""
+    import numpy as np
+
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    r = pixels[..., 0].astype(np.uint16)
+    g = pixels[..., 1].astype(np.uint16)
+    b = pixels[..., 2].astype(np.uint16)
+    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+def from_rgb565(rgb565):
+    """Expand a uint16 RGB565 array back to RGB uint8 (h x w x 3)."""
+    import numpy as np
+
+    rgb565 = rgb565.astype(np.uint16)
+    pixels = np.empty(rgb565.shape + (3,), dtype=np.uint8)
+    r = (rgb565 >> 11) & 0x1F
+    g = (rgb565 >> 5) & 0x3F
+    b = rgb565 & 0x1F
+    pixels[..., 0] = (r << 3) | (r >> 2)
+    pixels[..., 1] = (g << 2) | (g >> 4)
+    pixels[..., 2] = (b << 3) | (b >> 2)
+    return pixels
+
+
+def rle_encode(rgb565):
+    """PackBits style RLE of a uint16 RGB565 array.
+
+    Run boundaries are found with NumPy; the Python loop only walks runs,
+    never individual pixels of a run.
+    """
+    import numpy as np
+
+    flat = np.ascontiguousarray(rgb565, dtype="<u2").ravel()
+    raw = flat.tobytes()
+    count = flat.size
+    if count == 0:
+        return b""
+
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.append(starts, count))
+
+    out = bytearray()
+    literal_start = None  # Pixel index where the pending literal run begins
+
+    def flush_literals(end):
+        start = literal_start
+        while start < end:
+            n = min(_MAX_LITERAL, end - start)
+            out.append(n - 1)
+            out.extend(raw[start * 2:(start + n) * 2])
+            start += n
+
+    for start, length in zip(starts.tolist(), lengths.tolist()):
+        if length == 1:
+            if literal_start is None:
+                literal_start = start
+            continue
+
+        if literal_start is not None:
+            flush_literals(start)
+            literal_start = None
+
+        value = raw[start * 2:start * 2 + 2]
+        while length >= 2:
+            n = min(_MAX_REPEAT, length)
+            out.append(n + 126)
+            out += value
+            length -= n
+        if length == 1:
+            out.append(0)
+            out += value
+
+    if literal_start is not None:
+        flush_literals(count)
+
+    return bytes(out)
+
+
+def rle_decode(data, count):
+    """Decode rle_encode() output back into a uint16 array of count pixels."""
+    import numpy as np
+
+    out = np.empty(count, dtype=np.uint16)
+    values = memoryview(data)
+    pos = 0
+    index = 0
+    while pos < len(values) and index < count:
+        header = values[pos]
+        pos += 1
+        if header < 128:
+            n = header + 1
+            out[index:index + n] = np.frombuffer(values[pos:pos + n * 2], dtype="<u2")
+            pos += n * 2
+        else:
+            n = header - 126
+            out[index:index + n] = values[pos] | (values[pos + 1] << 8)
+            pos += 2
+        index += n
+    return out
+
+
+def encode(pixels, codec, quality=85):
+    """Encode an RGB array (h x w x 3) into a frame container.
+
+    RLE frames too large for the firmware's buffer fall back to JPEG.
+    """
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.asarray(pixels)
+    height, width = pixels.shape[:2]
+
+    if codec in (CODEC_RGB565, CODEC_RLE565):
+        rgb565 = to_rgb565(pixels)
+        if codec == CODEC_RGB565:
+            payload = rgb565.astype("<u2").tobytes()
+        else:
+            payload = rle_encode(rgb565)
+        if codec == CODEC_RGB565 or len(payload) <= MAX_BUFFERED_PAYLOAD:
+            return _CONTAINER.pack(_MAGIC[codec], width, height) + payload
+
+    image_buffer = io.BytesIO()
+    Image.fromarray(pixels).save(image_buffer, format="JPEG", quality=quality)
+    return image_buffer.getvalue()
+
+
+def unpack(container):
+    """Split a frame container into (codec, width, height, payload).
+
+    width and height are 0 for JPEG, which carries its own dimensions.
+    """
+    magic = bytes(container[:4])
+    codec = _CODEC_BY_MAGIC.get(magic)
+    if codec is None:
+        return CODEC_JPEG, 0, 0, container
+    _, width, height = _CONTAINER.unpack_from(container)
+    return codec, width, height, memoryview(container)[_CONTAINER.size:]
+
+
+def decode(container):
+    """Decode a frame container into an RGB uint8 array (h x w x 3)."""
+    import numpy as np
+    from PIL import Image
+
+    codec, width, height, payload = unpack(container)
+    if codec == CODEC_JPEG:
+        with Image.open(io.BytesIO(container)) as img:
+            return np.asarray(img.convert("RGB"))
+    if codec == CODEC_RGB565:
+        rgb565 = np.frombuffer(payload, dtype="<u2")
+    else:
+        rgb565 = rle_decode(payload, width * height)
+    return from_rgb565(rgb565.reshape(height, width))
@@ -0,0 +1,84 @@
+import numpy as np
+import frame_codec
+
+TILE_SIZE = 16  # Matches the JPEG MCU size for 4:2:0 chroma subsampling
+
+# Per-pixel channel difference below which a tile counts as unchanged. Frames
+# are compared after decoding, so identical JPEG content still differs by a few
+# levels around block edges.
+DIFF_THRESHOLD = 24
+
+# Send the full frame once this fraction of the screen is dirty anyway
+MAX_DIRTY_FRACTION = 0.5
+
+
+def decode_frame(image_data):
+    """Decode a frame container into an RGB uint8 array (height x width x 3)."""
+    return frame_codec.decode(image_data)
+
+
+def dirty_tiles(old, new, tile=TILE_SIZE, threshold=DIFF_THRESHOLD):
+    """Boolean (rows x cols) grid of tiles whose contents changed."""
+    height, width = new.shape[:2]
+    rows, cols = height // tile, width // tile
+    diff = np.abs(old[:rows * tile, :cols * tile].astype(np.int16)
+                  - new[:rows * tile, :cols * tile].astype(np.int16))
+    # Max difference per tile over its pixels and channels
+    per_tile = diff.reshape(rows, tile, cols, tile, -1).max(axis=(1, 3, 4))
+    return per_tile > threshold
+
+
+def merge_tiles(grid, tile=TILE_SIZE):
+    """Merge dirty tiles into rectangles (x, y, w, h) in pixels.
+
+    Horizontal runs of dirty tiles are found per row, and a run is merged with
+    the rectangle above it when both cover exactly the same columns.
+    """
+    rects = []
+    open_rects = {}  # (col_start, col_end) -> index into rects, for the previous row
+
+    for row in range(grid.shape[0]):
+        current = {}
+        col = 0
+        cols = grid.shape[1]
+        while col < cols:
+            if not grid[row, col]:
+                col += 1
+                continue
+            start = col
+            while col < cols and grid[row, col]:
+                col += 1
+            span = (start, col)
+
+            if span in open_rects:
+                index = open_rects[span]
+                x, y, w, h = rects[index]
+                rects[index] = (x, y, w, h + tile)
+            else:
+                index = len(rects)
+                rects.append((start * tile, row * tile, (col - start) * tile, tile))
+            current[span] = index
+        open_rects = current
+
+    return rects
+
+
+def diff_rects(old, new, tile=TILE_SIZE, threshold=DIFF_THRESHOLD,
+               max_dirty_fraction=MAX_DIRTY_FRACTION):
+    """Rectangles to repaint to turn old into new.
+
+    Returns [] when nothing changed and None when a full repaint is cheaper.
+    """
+    if old is None or old.shape != new.shape:
+        return None
+
+    grid = dirty_tiles(old, new, tile, threshold)
+    if grid.mean() > max_dirty_fraction:
+        return None
+    return merge_tiles(grid, tile)
+
+
+def encode_rect(pixels, rect, codec=frame_codec.CODEC_JPEG, quality=85):
+    """Encode one rectangle of an RGB array into a frame container."""
+    x, y, w, h = rect
+    return frame_codec.encode(np.ascontiguousarray(pixels[y:y + h, x:x + w]), codec, quality)
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import threading
+
+
+class LatestSlot:
+    """Depth-1 hand-off between threads where the newest item wins.
+
+    Putting into a full slot replaces the waiting item, so a slow consumer
+    only ever sees the most recent request instead of a growing backlog.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._full = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """Store item, returning True if it replaced an item nobody had taken yet."""
+        with self._cond:
+            replaced = self._full
+            self._item = item
+            self._full = True
+            self._cond.notify()
+            return replaced
+
+    def get(self, timeout=None):
+        """Block until an item is available. Returns None on timeout or close."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._full or self._closed, timeout):
+                return None
+            if not self._full:
+                return None
+            item = self._item
+            self._item = None
+            self._full = False
+            return item
+
+    def pending(self):
+        with self._cond:
+            return self._full
+
+    def peek(self):
+        """The waiting item without taking it, None if the slot is empty."""
+        with self._cond:
+            return self._item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class FramePrefetcher:
+    """Renders frames ahead of time on a background thread, for requests that
+    are likely to come next (e.g. the neighbouring tracks of a play queue).
+
+    render(request) renders into a cache and returns the cache key, or None.
+    prefetch(requests) replaces any set still waiting, and a set being worked
+    on is abandoned between requests once a newer one arrives. Keys an earlier
+    set rendered that the next set no longer asks for are passed to
+    discard(keys), so the owner can count them as wasted work.
+    """
+
+    def __init__(self, render, discard=None, name="prefetch"):
+        self.logger = logging.getLogger(__name__)
+        self._render = render
+        self._discard = discard
+        self._slot = LatestSlot()
+        self._stop_event = threading.Event()
+
+        # Metrics
+        self.sets = 0
+        self.superseded = 0  # Sets abandoned for a newer one
+
+        self._thread = threading.Thread(target=self._prefetch_loop, name=name, daemon=True)
+        self._thread.start()
+
+    def prefetch(self, requests):
+        """Queue a set of requests, nearest first, without blocking."""
+        self._slot.put(list(requests))
+
+    def _prefetch_loop(self):
+        previous = set()
+        while not self._stop_event.is_set():
+            requests = self._slot.get(timeout=1)
+            if requests is None:
+                continue
+            self.sets += 1
+
+            keys = set()
+            superseded = False
+            for request in requests:
+                if self._slot.pending() or self._stop_event.is_set():
+                    superseded = True
+                    break
+                try:
+                    key = self._render(request)
+                except Exception as e:
+                    self.logger.error(f"Frame prefetch error: {e}")
+                    continue
+                if key is not None:
+                    keys.add(key)
+
+            if superseded:
+                # The newer set decides what is still wanted
+                self.superseded += 1
+                previous |= keys
+                continue
+            stale = previous - keys
+            if stale and self._discard is not None:
+                self._discard(stale)
+            previous = keys
+
+    def stats(self):
+        return {"sets": self.sets, "superseded": self.superseded}
+
+    def stop(self):
+        self._stop_event.set()
+        self._slot.close()
+        self._thread.join(timeout=2)
+
+
+class AsyncLatestSlot:
+    """LatestSlot for a single event loop: put() never blocks, get() is awaited."""
+
+    def __init__(self):
+        self._item = None
+        self._full = False
+        self._event = asyncio.Event()
+
+    def put(self, item):
+        replaced = self._full
+        self._item = item
+        self._full = True
+        self._event.set()
+        return replaced
+
+    async def get(self):
+        await self._event.wait()
+        self._event.clear()
+        item = self._item
+        self._item = None
+        self._full = False
+        return item
+
+    def pending(self):
+        return self._full
+
+    def peek(self):
+        return self._item
+
+
+class AsyncFramePipeline:
+    """Two-stage render -> send pipeline for the asyncio daemon.
+
+    render(request) turns a frame request into a payload, send(payload) pushes
+    it to the device and returns True when the device confirmed it, None if it
+    gave up because newer_pending(payload) turned True meanwhile. Each stage
+    is a coroutine driven by run() with a newest-wins slot in front of it, and
+    the blocking render and send calls are offloaded to executors, so rapid
+    track skips drop stale frames instead of queueing them. submit() is safe
+    to call from any thread.
+    """
+
+    def __init__(self, loop, render, send, render_executor=None, send_executor=None,
+                 on_sent=None):
+        self.logger = logging.getLogger(__name__)
+        self._loop = loop
+        self._render = render
+        self._send = send
+        self._on_sent = on_sent  # Called on the loop after each confirmed frame
+        self._render_executor = render_executor
+        self._send_executor = send_executor
+
+        self._render_slot = AsyncLatestSlot()
+        self._send_slot = AsyncLatestSlot()
+
+        # Metrics, only touched on the loop thread
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+
+    def submit(self, request):
+        self._loop.call_soon_threadsafe(self._submit, request)
+
+    def _submit(self, request):
+        self.submitted += 1
+        if self._render_slot.put(request):
+            self.coalesced += 1
+
+    async def run(self):
+        """Run both stages until cancelled."""
+        await asyncio.gather(self._render_stage(), self._send_stage())
+
+    async def _render_stage(self):
+        while True:
+            request = await self._render_slot.get()
+            try:
+                payload = await self._loop.run_in_executor(
+                    self._render_executor, self._render, request)
+            except Exception as e:
+                self.logger.error(f"Frame render error: {e}")
+                continue
+
+            if payload is None:
+                continue
+
+            # A newer request arrived while rendering, this frame is already stale
+            if self._render_slot.pending():
+                self.dropped += 1
+                continue
+
+            if self._send_slot.put(payload):
+                self.dropped += 1
+
+    def newer_pending(self, payload):
+        """True if a different frame than payload is waiting to be sent. Safe
+        to call from the send executor, it only reads the slot."""
+        waiting = self._send_slot.peek()
+        return waiting is not None and waiting != payload
+
+    async def _send_stage(self):
+        while True:
+            payload = await self._send_slot.get()
+            try:
+                ok = await self._loop.run_in_executor(self._send_executor, self._send, payload)
+            except Exception as e:
+                self.logger.error(f"Frame send error: {e}")
+                ok = False
+
+            if ok:
+                self.sent += 1
+                if self._on_sent is not None:
+                    self._on_sent()
+            elif ok is None:
+                self.dropped += 1
+            else:
+                self.failed += 1
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
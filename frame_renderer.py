@@ -0,0 +1,73 @@
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+FONT_PATH = 'liberation-serif/LiberationSerif-Regular.ttf'
+
+
+class FrameRenderer:
+    """Composes the 320x240 now-playing frame from a thumbnail and two lines of text.
+
+    Everything that does not depend on the track (fonts, the rounded corner
+    mask, the brightness lookup table) is built once in the constructor. The
+    background is downscaled before it is blurred, so render cost no longer
+    grows with the thumbnail resolution.
+    """
+
+    WIDTH = 320
+    HEIGHT = 240
+    ART_SIZE = 140
+    ART_POSITION = (90, 35)
+    CORNER_RADIUS = 10
+    BLUR_RADIUS = 5  # In source pixels of a screen sized thumbnail
+    BRIGHTNESS = 0.5
+    TITLE_FONT_SIZE = 24
+    TITLE_Y = 176
+    SUBTITLE_FONT_SIZE = 15
+    SUBTITLE_Y = 205
+
+    def __init__(self, font_path=FONT_PATH):
+        self.title_font = ImageFont.truetype(font_path, self.TITLE_FONT_SIZE)
+        self.subtitle_font = ImageFont.truetype(font_path, self.SUBTITLE_FONT_SIZE)
+        self.art_mask = self._rounded_mask(self.ART_SIZE, self.CORNER_RADIUS)
+
+        # Dimming as one lookup per channel instead of ImageEnhance.Brightness
+        self.dim_lut = [int(value * self.BRIGHTNESS) for value in range(256)] * 3
+
+    @staticmethod
+    def _rounded_mask(size, rad):
+        """Alpha mask with rounded corners for a size x size square."""
+        circle = Image.new('L', (rad * 2, rad * 2), 0)
+        draw = ImageDraw.Draw(circle)
+        draw.ellipse((0, 0, rad * 2 - 1, rad * 2 - 1), fill=255)
+
+        alpha = Image.new('L', (size, size), 255)
+        alpha.paste(circle.crop((0, 0, rad, rad)), (0, 0))  # Top-left corner
+        alpha.paste(circle.crop((0, rad, rad, rad * 2)), (0, size - rad))  # Bottom-left corner
+        alpha.paste(circle.crop((rad, 0, rad * 2, rad)), (size - rad, 0))  # Top-right corner
+        alpha.paste(circle.crop((rad, rad, rad * 2, rad * 2)), (size - rad, size - rad))  # Bottom-right corner
+        return alpha
+
+    def render(self, image, text, subtext):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        # BACKGROUND: downscale first, then blur with the radius scaled to match
+        background = image.resize((self.WIDTH, self.HEIGHT), reducing_gap=2.0)
+        scale = (self.WIDTH / image.width + self.HEIGHT / image.height) / 2
+        background = background.filter(ImageFilter.GaussianBlur(radius=self.BLUR_RADIUS * scale))
+        background = background.point(self.dim_lut)
+
+        # ARTWORK with rounded corners
+        art = image.resize((self.ART_SIZE, self.ART_SIZE), reducing_gap=2.0)
+        background.paste(art, self.ART_POSITION, self.art_mask)
+
+        # TITLE and ARTIST, centred
+        draw = ImageDraw.Draw(background)
+        self._draw_centred(draw, text, self.title_font, self.TITLE_Y)
+        self._draw_centred(draw, subtext, self.subtitle_font, self.SUBTITLE_Y)
+
+        return background
+
+    def _draw_centred(self, draw, text, font, y):
+        bbox = draw.textbbox((0, 0), text, font=font)
+        x = (self.WIDTH - (bbox[2] - bbox[0])) // 2
+        draw.text((x, y), text, font=font, fill=(255, 255, 255))
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from frame_pipeline import AsyncFramePipeline
+from pyserial import AsyncSerialTransport
+
+
+class Supervisor:
+    """Runs named coroutines as tasks on the current loop.
+
+    A task that raises is logged and restarted with exponential backoff, a
+    task that returns is left finished. shutdown() cancels every task and
+    waits for them, so cleanup in their finally blocks runs before the
+    loop closes.
+    """
+
+    def __init__(self, restart_delay=0.5, max_restart_delay=30.0):
+        self.logger = logging.getLogger(__name__)
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.tasks = {}
+        self.restarts = {}
+
+    def spawn(self, name, factory):
+        """Run factory() (a coroutine function) as a supervised task."""
+        self.restarts[name] = 0
+        self.tasks[name] = asyncio.create_task(self._supervise(name, factory), name=name)
+
+    async def _supervise(self, name, factory):
+        loop = asyncio.get_running_loop()
+        delay = self.restart_delay
+        while True:
+            started = loop.time()
+            try:
+                await factory()
+                self.logger.info(f"Task {name} finished")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.restarts[name] += 1
+                # A task that ran for a while before failing starts over with a short delay
+                if loop.time() - started > self.max_restart_delay:
+                    delay = self.restart_delay
+                self.logger.error(f"Task {name} failed: {e!r}, restarting in {delay:.1f} s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_restart_delay)
+
+    async def shutdown(self, timeout=5):
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        if not tasks:
+            return
+
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            self.logger.warning(f"Task {task.get_name()} did not stop within {timeout} s")
+
+
+class HostDaemon:
+    """The host side on a single event loop.
+
+    Serial connection management and reading, the media session, frame
+    rendering and sending, and input dispatch all run as supervised tasks.
+    Blocking work (port I/O, rendering, the image transfer protocol) is
+    offloaded to executors. on_telemetry(frame) is called on the loop for
+    every telemetry frame, in order, and must not block. If input_ready (an
+    asyncio.Event) is given, frames are held back until it is set, so the
+    port can be read while the input side is still initialising.
+    on_frame_sent() is called on the loop whenever the display confirms a
+    frame.
+    """
+
+    def __init__(self, serial_obj, media_obj, on_telemetry, input_ready=None,
+                 on_frame_sent=None):
+        self.logger = logging.getLogger(__name__)
+        self.serial_obj = serial_obj
+        self.media_obj = media_obj
+        self.on_telemetry = on_telemetry
+        self.input_ready = input_ready
+        self.on_frame_sent = on_frame_sent
+
+        self.supervisor = Supervisor()
+        self.transport = None
+        self._loop = None
+        self._stop_event = None
+
+    async def run(self):
+        """Run until stop() is called or the task is cancelled (e.g. Ctrl+C)."""
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+
+        render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        send_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="send")
+
+        self.transport = AsyncSerialTransport(self.serial_obj)
+        pipeline = AsyncFramePipeline(self._loop,
+                                      render=lambda request: self.serial_obj.render_frame(*request),
+                                      send=self.serial_obj.transmit_frame,
+                                      render_executor=render_executor,
+                                      send_executor=send_executor,
+                                      on_sent=self.on_frame_sent)
+        self.serial_obj.frame_pipeline = pipeline
+
+        self.supervisor.spawn("serial-connection", self.transport.run_connection)
+        self.supervisor.spawn("serial-reader", self.transport.run_reader)
+        self.supervisor.spawn("frames", pipeline.run)
+        self.supervisor.spawn("media", self.media_obj.run)
+        self.supervisor.spawn("input", self._dispatch_input)
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            self.media_obj.stop()
+            await self.supervisor.shutdown()
+            self.transport.close()
+            render_executor.shutdown(wait=False, cancel_futures=True)
+            send_executor.shutdown(wait=False, cancel_futures=True)
+            self.logger.info(f"Frame pipeline: {pipeline.stats()}, "
+                             f"task restarts: {self.supervisor.restarts}")
+
+    async def _dispatch_input(self):
+        if self.input_ready is not None:
+            await self.input_ready.wait()
+        while True:
+            frame = await self.transport.telemetry.get()
+            self.on_telemetry(frame)
+
+    def stop(self):
+        """Ask run() to shut down, callable from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
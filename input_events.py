@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+EVENT_PRESS = "press"
+EVENT_RELEASE = "release"
+EVENT_LONG_PRESS = "long_press"
+EVENT_REPEAT = "repeat"
+
+ButtonEvent = namedtuple("ButtonEvent", ["button", "kind", "time"])
+
+ACTION_LATENCY = metrics.histogram("button_action_latency_seconds",
+                                   "Button event to the start of its action")
+ACTIONS_DROPPED = metrics.counter("button_actions_dropped_total",
+                                  "Button actions dropped because too many were pending")
+ACTIONS_FAILED = metrics.counter("button_actions_failed_total", "Button actions that raised")
+
+
+class _ButtonState:
+    __slots__ = ("pressed", "changed_at", "long_fired", "next_repeat")
+
+    def __init__(self):
+        self.pressed = False
+        self.changed_at = float("-inf")
+        self.long_fired = False
+        self.next_repeat = None
+
+
+class ButtonEventEngine:
+    """Turns raw button samples into debounced press/release/long-press/repeat events.
+
+    A button counts as pressed once its reading drops below press_threshold
+    and as released once it rises above release_threshold, the gap between
+    them giving hysteresis. Debouncing locks the state for debounce seconds
+    after each change. That way the first edge is reported immediately and
+    contact bounce after it is ignored.
+
+    Buttons in long_press_buttons (those with a long-press action) report
+    press on release instead, and only if they were let go before the
+    long-press time, so a long press never runs the short-press action too.
+    """
+
+    def __init__(self, buttons, press_threshold=100, release_threshold=4000, debounce=0.03,
+                 long_press=0.6, repeat_delay=0.5, repeat_interval=0.15, repeat_buttons=(),
+                 long_press_buttons=()):
+        self.press_threshold = press_threshold
+        self.release_threshold = release_threshold
+        self.debounce = debounce
+        self.long_press = long_press
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = repeat_interval
+        self.repeat_buttons = set(repeat_buttons)
+        self.long_press_buttons = set(long_press_buttons)
+        self._states = [_ButtonState() for _ in range(buttons)]
+
+    def update(self, button, raw, now=None):
+        """Feed one sample, returns the list of events it produced."""
+        if now is None:
+            now = time.monotonic()
+        state = self._states[button]
+        events = []
+
+        if now - state.changed_at >= self.debounce:
+            if not state.pressed and raw < self.press_threshold:
+                state.pressed = True
+                state.changed_at = now
+                state.long_fired = False
+                state.next_repeat = now + self.repeat_delay if button in self.repeat_buttons else None
+                if button not in self.long_press_buttons:
+                    events.append(ButtonEvent(button, EVENT_PRESS, now))
+                return events
+            if state.pressed and raw > self.release_threshold:
+                state.pressed = False
+                state.changed_at = now
+                # A short tap of a button with a long-press action
+                if button in self.long_press_buttons and not state.long_fired:
+                    events.append(ButtonEvent(button, EVENT_PRESS, now))
+                events.append(ButtonEvent(button, EVENT_RELEASE, now))
+                return events
+
+        if state.pressed:
+            if not state.long_fired and now - state.changed_at >= self.long_press:
+                state.long_fired = True
+                events.append(ButtonEvent(button, EVENT_LONG_PRESS, now))
+            if state.next_repeat is not None and now >= state.next_repeat:
+                state.next_repeat = now + self.repeat_interval
+                events.append(ButtonEvent(button, EVENT_REPEAT, now))
+
+        return events
+
+
+class ActionExecutor:
+    """Runs button actions off the sampling thread so slow shortcuts never
+    delay sample processing.
+
+    One worker by default: actions then run in the order of their events
+    and the modifiers held by one shortcut cannot leak into the next.
+
+    At most max_pending actions may be queued or running; further submissions
+    are dropped and counted. Latency from the input event to the start of
+    its action is recorded.
+    """
+
+    def __init__(self, workers=1, max_pending=8):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="action")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, action, event_time=None):
+        if event_time is None:
+            event_time = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.dropped += 1
+            ACTIONS_DROPPED.inc()
+            return False
+        self._executor.submit(self._run, action, event_time)
+        return True
+
+    def _run(self, action, event_time):
+        try:
+            ACTION_LATENCY.record(time.monotonic() - event_time)
+            action()
+            with self._lock:
+                self.executed += 1
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Button action {action!r} failed: {e}")
+            ACTIONS_FAILED.inc()
+            with self._lock:
+                self.failed += 1
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = {"executed": self.executed, "dropped": self.dropped, "failed": self.failed}
+        # Latency is process-wide, there is one executor per host
+        stats["latency_p50_ms"] = ACTION_LATENCY.percentile(0.5) * 1000
+        stats["latency_p99_ms"] = ACTION_LATENCY.percentile(0.99) * 1000
+        return stats
+
+    def stop(self):
+        self._executor.shutdown(wait=False)
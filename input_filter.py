@@ -0,0 +1,101 @@
+from collections import deque
+
+ADC_MAX = 4095  # ESP32 analogRead is 12 bit
+
+
+def build_level_lut(in_min=5, in_max=4090, out_min=0, out_max=100, adc_max=ADC_MAX):
+    """Lookup table from every raw ADC reading to a volume level.
+
+    Same mapping as int(numpy.interp(value, [in_min, in_max], [out_min, out_max])),
+    computed once instead of per sample and without importing NumPy.
+    """
+    slope = (out_max - out_min) / (in_max - in_min)
+    levels = []
+    for value in range(adc_max + 1):
+        if value <= in_min:
+            levels.append(int(out_min))
+        elif value >= in_max:
+            levels.append(int(out_max))
+        else:
+            levels.append(int(slope * (value - in_min) + out_min))
+    return levels
+
+
+LEVEL_LUT = build_level_lut()
+
+
+class ChannelFilter:
+    """Turns noisy raw ADC samples of one slider into level changes.
+
+    Samples are optionally smoothed (EMA or running median), then held by a
+    deadband: the output only moves once the input has travelled more than
+    `deadband` raw counts from where it last settled, so ADC noise cannot
+    flap between adjacent levels. update() returns the new level, or None
+    when nothing changed.
+    """
+
+    def __init__(self, deadband=24, smoothing=None, alpha=0.3, window=5, lut=LEVEL_LUT):
+        self.deadband = deadband
+        self.smoothing = smoothing
+        self.alpha = alpha
+        self.lut = lut
+        self.min_level = lut[0]
+        self.max_level = lut[-1]
+
+        self._window = deque(maxlen=window)
+        self._ema = None
+        self._anchor = None  # Raw value the current level was taken from
+        self.level = None
+
+    def _smooth(self, raw):
+        if self.smoothing == "ema":
+            self._ema = raw if self._ema is None else self._ema + self.alpha * (raw - self._ema)
+            return int(round(self._ema))
+        if self.smoothing == "median":
+            self._window.append(raw)
+            return sorted(self._window)[len(self._window) // 2]
+        return raw
+
+    def update(self, raw):
+        value = self._smooth(raw)
+        if value < 0:
+            value = 0
+        elif value >= len(self.lut):
+            value = len(self.lut) - 1
+
+        if self._anchor is not None and abs(value - self._anchor) <= self.deadband:
+            # Inside the deadband, unless the knob just reached an end stop
+            level = self.lut[value]
+            if level == self.level or level not in (self.min_level, self.max_level):
+                return None
+
+        self._anchor = value
+        level = self.lut[value]
+        if level == self.level:
+            return None
+        self.level = level
+        return level
+
+
+class InputFilterBank:
+    """One ChannelFilter per slider plus counters of what was filtered out."""
+
+    def __init__(self, channels, **filter_options):
+        self.filters = [ChannelFilter(**filter_options) for _ in range(channels)]
+        self.samples = 0
+        self.emitted = 0
+
+    def update(self, channel, raw):
+        self.samples += 1
+        level = self.filters[channel].update(raw)
+        if level is not None:
+            self.emitted += 1
+        return level
+
+    def stats(self):
+        return {
+            "samples": self.samples,
+            "emitted": self.emitted,
+            "suppressed": self.samples - self.emitted,
+            "reduction": self.samples / self.emitted if self.emitted else 0.0,
+        }
@@ -1,3 +1,4 @@
+import logging
 from pynput import keyboard
 
 VALID_KEY_COMMANDS = {"ctrl": keyboard.Key.ctrl, "shift": keyboard.Key.shift,
@@ -12,50 +13,83 @@ VALID_KEY_COMMANDS = {"ctrl": keyboard.Key.ctrl, "shift": keyboard.Key.shift,
 
 # VALID_CHARACTERS = "qwertyuiopasdfghjklzxcvbnmQWERTYUIOPASDFGHJKLZXCVBNM1234567890,./;'[]{}|=-+_)(*&^%$#@!~`\\"
 
+logger = logging.getLogger(__name__)
+
+MEDIA_KEY_NAMES = {keyboard.Key.media_play_pause: "play_pause", keyboard.Key.media_next: "media_next",
+                   keyboard.Key.media_previous: "media_previous",
+                   keyboard.Key.media_volume_mute: "media_volume_mute"}
+
+
 def on_press(key: keyboard.Key):
-    try:
-        if key == keyboard.Key.media_play_pause:
-            print("Play pause pressed")
-        elif key == keyboard.Key.media_next:
-            print("Skip next pressed")
-        elif key == keyboard.Key.media_previous:
-            print("Skip previous pressed")
-        elif key == keyboard.Key.media_volume_mute:
-            print("volume mute pressed")
-
-    except AttributeError:
-        print("Attribute error")
-    except Exception as e:
-        print("Key error: " + str(e))
+    # Runs in the keyboard hook for every key press, keep it cheap
+    name = MEDIA_KEY_NAMES.get(key)
+    if name is not None:
+        logger.debug("media key pressed key=%s", name)
+
+
+# One controller for every shortcut instead of a new one per button press
+_key_controller = None
+
+# Shortcut string -> resolved key sequence
+_parsed_shortcuts = {}
+
+
+def get_key_controller():
+    global _key_controller
+    if _key_controller is None:
+        _key_controller = keyboard.Controller()
+    return _key_controller
+
+
+def parse_key_sequence(key):
+    """Resolve a config shortcut like "ctrl shift esc" into pynput keys, once."""
+    keys = _parsed_shortcuts.get(key)
+    if keys is None:
+        keys = tuple(VALID_KEY_COMMANDS.get(i, i) for i in key.split())
+        _parsed_shortcuts[key] = keys
+    return keys
 
 
 def press_and_release_key(key):
-    key_controller = keyboard.Controller()
+    key_controller = get_key_controller()
 
     for i in key:
-        if i in VALID_KEY_COMMANDS:
-            key_controller.press(VALID_KEY_COMMANDS[i])
-        else:
-            key_controller.press(i)
+        key_controller.press(i)
 
     for i in key:
-        if i in VALID_KEY_COMMANDS:
-            key_controller.release(VALID_KEY_COMMANDS[i])
-        else:
-            key_controller.release(i)
+        key_controller.release(i)
+
+
+class ShortcutAction:
+    """Callable that presses a pre-parsed shortcut, for the action executor."""
+
+    def __init__(self, key):
+        self.key = key
+        self.keys = parse_key_sequence(key)
+
+    def __call__(self):
+        # Errors propagate so the executor can count them
+        press_and_release_key(self.keys)
 
+    def __repr__(self):
+        return f"ShortcutAction({self.key!r})"
 
-def validate_key(key):
-    keys = key.split()
-    print(keys)
 
-    try:
-        press_and_release_key(keys)
+# Started by start_listener() rather than on import, so importing this module
+# (e.g. for ShortcutAction) does not spawn a hook thread
+key_listener = None
 
-    except Exception as e:
-        print(f"Error in shortcut: {e}")
 
+def start_listener():
+    global key_listener
+    if key_listener is None:
+        key_listener = keyboard.Listener(on_press=on_press)
+        key_listener.start()
+    return key_listener
 
 
-key_listener = keyboard.Listener(on_press=on_press)
-key_listener.start()  ### stops in case of exception on the main.py file
+def stop_listener():
+    global key_listener
+    if key_listener is not None:
+        key_listener.stop()  ### stops in case of exception on the main.py file
+        key_listener = None
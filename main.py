@@ -1,45 +1,52 @@
+import asyncio
+import logging
+import metrics
+import profiler
 import pyserial
-import media_session
-import volume_potentiometer
-import keyboard_event
-import time
-from numpy import interp
 import yaml
+from host_daemon import HostDaemon
+from startup import StartupOrchestrator
+from input_filter import InputFilterBank
+from input_events import ButtonEventEngine, ActionExecutor, EVENT_PRESS, EVENT_LONG_PRESS, EVENT_REPEAT
+
+logger = logging.getLogger(__name__)
 
 
 def process_received_data(data, volume_obj, total_switches_sliders
-                          , no_of_switches, no_of_sliders, prev_btn_states,
-                          switch_functions, slider_functions):
+                          , no_of_switches, no_of_sliders, button_events,
+                          button_actions, action_executor, slider_functions, slider_filters,
+                          sample_time=None):
     if data is None or len(data) != total_switches_sliders:
         return
 
     for i in range(no_of_switches):
         try:
-            current_value = int(data[i])
-
-            if prev_btn_states[i] >= 4000 and current_value < 100:
-                print(f"BUTTON PRESSED: {i + 1}")
-                keyboard_event.validate_key(switch_functions[i])
-
-            # Update the previous state
-            prev_btn_states[i] = current_value
+            for event in button_events.update(i, int(data[i]), sample_time):
+                action = button_actions.get((i, event.kind))
+                if action is not None:
+                    # Shortcuts run on the executor, sliders are not held up
+                    action_executor.submit(action, event.time)
         except Exception as e:
-            print(f"Cannot read data, ignoring: {e}")
+            logger.warning(f"Cannot read data, ignoring: {e}")
             break
 
+    if volume_obj is None:
+        return  # Volume control is not available
+
     for i in range(no_of_sliders):
         try:
-            vol_lvl = map_potentiometer_value(data[no_of_switches + i])
-            volume_obj.set_volume(name=slider_functions[i], value=vol_lvl)
+            # Only knob movements beyond the deadband reach the volume API
+            vol_lvl = slider_filters.update(i, int(data[no_of_switches + i]))
+            if vol_lvl is not None:
+                volume_obj.set_volume(name=slider_functions[i], value=vol_lvl,
+                                      sample_time=sample_time)
         except Exception as e:
-            print(f"Cannot set volume error: {e}")
-
-
-def map_potentiometer_value(value):
-    return int(interp(int(value), [5, 4090], [0, 100]))
+            logger.warning(f"Cannot set volume: {e}")
 
 
 def main():
+    startup = StartupOrchestrator()
+
     try:
         with open('config.yaml', 'r') as file:
             file_service = yaml.safe_load(file)
@@ -50,40 +57,196 @@ def main():
             no_of_sliders = len(slider_functions)
             total_switches_sliders = no_of_switches + no_of_sliders
 
-            prev_btn_states = [4095] * no_of_switches
+            # Button thresholds (raw ADC), debounce and hold timings in seconds
+            button_options = file_service.get('button_options', {})
+            # Optional second function per switch, triggered by holding it
+            long_press_functions = file_service.get('switch_long_press_functions', [])
+            # Switch numbers (1 based) whose function repeats while held
+            repeat_switches = file_service.get('switch_repeat', [])
+
+            # Optional directory for the on-disk render cache tier
+            render_cache_dir = file_service.get('render_cache_dir')
+
+            # Where the last working ESP32 port is remembered between runs
+            port_cache_file = file_service.get('port_cache_file', 'port_cache.json')
+
+            # Link speeds to negotiate with the ESP32 (default 921600, 460800, 230400)
+            baud_rates = file_service.get('baud_rates')
+
+            # Slider noise filtering: deadband in raw ADC counts and optional
+            # smoothing (none, ema or median)
+            slider_deadband = file_service.get('slider_deadband', 24)
+            slider_smoothing = file_service.get('slider_smoothing')
+
+            # Maximum volume writes per second and slider
+            volume_max_rate = file_service.get('volume_max_rate', 60)
+
+            # Frame payload codec: jpeg (default), rgb565 or rle565
+            frame_codec = file_service.get('frame_codec', 'jpeg')
+
+            # Send a low resolution preview ahead of each full frame, so the
+            # screen follows track changes quickly on slow links
+            progressive_frames = file_service.get('progressive_frames', True)
+
+            # Queue items on each side of the current track rendered ahead,
+            # when the media source exposes its queue (0 disables)
+            prefetch_depth = file_service.get('prefetch_depth', 1)
+
+            # DEBUG logs every frame transfer and media key, INFO (default)
+            # only connection and track changes
+            log_level = file_service.get('log_level', 'INFO')
+
+            # Metrics: Prometheus text on http://127.0.0.1:<metrics_port>/metrics
+            # and/or a JSON file rewritten every metrics_interval seconds
+            metrics_port = file_service.get('metrics_port')
+            metrics_file = file_service.get('metrics_file')
+            metrics_interval = file_service.get('metrics_interval', 10)
+
+            # Sampling profiler, off unless toggled: profiler_signal enables
+            # SIGUSR1 (Ctrl+Break on Windows), profiler_port a control socket
+            # on 127.0.0.1 ("start [seconds]", "stop", "status")
+            profiler_signal = file_service.get('profiler_signal', False)
+            profiler_port = file_service.get('profiler_port')
+            profiler_dir = file_service.get('profiler_dir', 'profiles')
+            profiler_interval_ms = file_service.get('profiler_interval_ms', 5)
 
     except Exception as e:
         print(f"Error reading config.yaml: {e}")
         return
 
-    serial_obj = pyserial.SerialConnection(total_switches_sliders)
-    time.sleep(1)
-    volume_obj = volume_potentiometer.VolumeControl()
-    time.sleep(1)
-
-    # Pass serial_obj to Media class for direct image sending
-    media_obj = media_session.Media(serial_obj=serial_obj)
-    time.sleep(1)
-
-    print("Everything Initialised")
+    # Connection and reading are driven by the daemon's event loop. PIL,
+    # NumPy, pynput, pycaw and winrt are only imported by the startup steps
+    # (or on first use), which run concurrently.
+    serial_obj = pyserial.SerialConnection(total_switches_sliders,
+                                           render_cache_dir=render_cache_dir,
+                                           codec=frame_codec,
+                                           port_cache_file=port_cache_file,
+                                           baud_rates=baud_rates,
+                                           progressive=progressive_frames)
+    logging.getLogger().setLevel(log_level)
+
+    metrics_exporters = []
+    try:
+        if metrics_port:
+            metrics_exporters.append(metrics.MetricsServer(metrics_port))
+        if metrics_file:
+            metrics_exporters.append(metrics.JsonDumper(metrics_file, metrics_interval))
+    except OSError as e:
+        print(f"Cannot export metrics: {e}")
+
+    sampling_profiler = None
+    profiler_control = None
+    if profiler_signal or profiler_port:
+        sampling_profiler = profiler.SamplingProfiler(interval=profiler_interval_ms / 1000,
+                                                      output_dir=profiler_dir)
+        if profiler_signal:
+            profiler.install_signal_toggle(sampling_profiler)
+        if profiler_port:
+            try:
+                profiler_control = profiler.ProfilerControl(sampling_profiler, profiler_port)
+            except OSError as e:
+                print(f"Cannot open profiler control port {profiler_port}: {e}")
+
+    def init_volume():
+        import volume_potentiometer
+
+        # Returns once the audio interfaces are ready
+        volume_obj = volume_potentiometer.VolumeControl()
+        # Volume COM calls happen on the actuator's worker thread, rate limited
+        volume_actuator = volume_potentiometer.VolumeActuator(volume_obj, max_rate=volume_max_rate)
+        return volume_obj, volume_actuator
+
+    def init_buttons():
+        import keyboard_event
+
+        keyboard_event.start_listener()
+        button_actions = {}
+        for i, function in enumerate(switch_functions):
+            button_actions[(i, EVENT_PRESS)] = keyboard_event.ShortcutAction(function)
+            if i + 1 in repeat_switches:
+                button_actions[(i, EVENT_REPEAT)] = button_actions[(i, EVENT_PRESS)]
+        for i, function in enumerate(long_press_functions[:no_of_switches]):
+            if function:
+                button_actions[(i, EVENT_LONG_PRESS)] = keyboard_event.ShortcutAction(function)
+        return button_actions
+
+    button_events = ButtonEventEngine(no_of_switches,
+                                      repeat_buttons=[n - 1 for n in repeat_switches],
+                                      long_press_buttons=[i for i, function in enumerate(
+                                          long_press_functions[:no_of_switches]) if function],
+                                      **button_options)
+    action_executor = ActionExecutor()
+
+    slider_filters = InputFilterBank(no_of_sliders, deadband=slider_deadband,
+                                     smoothing=slider_smoothing)
+
+    startup.add("volume", init_volume)
+    startup.add("buttons", init_buttons)
+    startup.add("renderer", serial_obj.warm_up)
+    # Input frames are held back until this (empty) step is ready
+    startup.add("input", lambda: None, after=("volume", "buttons"))
+
+    def handle_frame(frame):
+        _, volume_actuator = startup.results.get("volume") or (None, None)
+        process_received_data(data=frame.values, volume_obj=volume_actuator,
+                              total_switches_sliders=total_switches_sliders,
+                              no_of_switches=no_of_switches, no_of_sliders=no_of_sliders,
+                              button_events=button_events,
+                              button_actions=startup.results.get("buttons") or {},
+                              action_executor=action_executor,
+                              slider_functions=slider_functions,
+                              slider_filters=slider_filters,
+                              sample_time=frame.time)
+        startup.mark_first_input()
+
+    async def run_daemon():
+        import media_session
+
+        # Media is created on the loop it runs on
+        media_obj = media_session.Media(serial_obj=serial_obj,
+                                        prefetch_depth=prefetch_depth)
+        daemon = HostDaemon(serial_obj, media_obj, on_telemetry=handle_frame,
+                            input_ready=startup.ready_event("input"),
+                            on_frame_sent=startup.mark_first_frame)
+        startup_task = asyncio.create_task(startup.run())
+        print("Everything Initialised")
+        try:
+            await daemon.run()
+        finally:
+            startup_task.cancel()
 
     try:
-        while True:
-            process_received_data(data=serial_obj.data, volume_obj=volume_obj,
-                                  total_switches_sliders=total_switches_sliders,
-                                  no_of_switches=no_of_switches, no_of_sliders=no_of_sliders,
-                                  prev_btn_states=prev_btn_states, switch_functions=switch_functions,
-                                  slider_functions=slider_functions)
+        asyncio.run(run_daemon())
 
-            time.sleep(0.01)
+    except KeyboardInterrupt:
+        print("Stopping...")
 
     except Exception as e:
         print(f"Exception occurred, stopping: {e}")
 
     finally:
-        media_obj.stop()
+        print(f"Startup: {startup.report()}")
+        print(f"Telemetry frames: {serial_obj.telemetry_seq}, "
+              f"dropped: {serial_obj.dropped_telemetry}")
+        print(f"Slider filtering: {slider_filters.stats()}")
+        print(f"Render cache: {serial_obj.render_cache.stats()}")
+        print(f"Button actions: {action_executor.stats()}")
+        action_executor.stop()
+        if "volume" in startup.results:
+            volume_obj, volume_actuator = startup.results["volume"]
+            print(f"Volume actuator: {volume_actuator.stats()}")
+            volume_actuator.stop()
+            volume_obj.stop()
         serial_obj.stop()
-        keyboard_event.key_listener.stop()
+        for exporter in metrics_exporters:
+            exporter.stop()
+        if profiler_control is not None:
+            profiler_control.stop()
+        if sampling_profiler is not None and sampling_profiler.running:
+            sampling_profiler.stop()
+        if "buttons" in startup.results:
+            import keyboard_event
+            keyboard_event.stop_listener()
 
 
 if __name__ == "__main__":
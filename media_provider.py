@@ -0,0 +1,199 @@
+from collections import namedtuple
+from thumbnail_loader import BufferPool, ThumbnailLoader
+
+# Snapshot of what the current media session is playing. thumbnail is an
+# opaque, provider specific reference passed back to load_thumbnail().
+NowPlaying = namedtuple("NowPlaying", ["title", "artist", "album_title", "thumbnail"])
+
+# Neighbours of the current item in the play queue, as lists of NowPlaying,
+# nearest first
+MediaQueue = namedtuple("MediaQueue", ["previous", "upcoming"])
+
+
+class MediaProvider:
+    """Source of now-playing information for Media.
+
+    Providers that can push notifications call the on_change callback given to
+    start() (from any thread) whenever the current session or its properties
+    change. Media then re-reads get_now_playing() instead of polling it.
+    """
+
+    supports_events = False
+    supports_queue = False
+
+    async def start(self, on_change):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def get_now_playing(self):
+        """Return a NowPlaying for the current session, or None if there is none."""
+        raise NotImplementedError
+
+    async def load_thumbnail(self, thumbnail):
+        """Return the thumbnail as a PIL image, or None."""
+        raise NotImplementedError
+
+    async def get_queue(self):
+        """Return a MediaQueue for the current session, or None if the source
+        does not expose one. Only called when supports_queue is set; queue
+        changes should be reported through on_change like other changes."""
+        return None
+
+
+class WinRTMediaProvider(MediaProvider):
+    """Windows Global System Media Transport Controls provider.
+
+    The session manager is requested once and reused. Current-session and
+    media-properties change notifications drive updates. GSMTC exposes no
+    play queue, so there is nothing to prefetch from it.
+    """
+
+    supports_events = True
+
+    def __init__(self, target_size=(320, 240)):
+        self.session_manager = None
+        self.target_size = target_size  # Decode JPEG art no larger than needed
+        self.thumbnail_loader = None
+        self._on_change = None
+        self._session = None
+        self._session_token = None
+        self._properties_token = None
+
+    async def start(self, on_change):
+        from winrt.windows.media.control import \
+            GlobalSystemMediaTransportControlsSessionManager as MediaManager
+        from winrt.windows.storage.streams import Buffer, InputStreamOptions
+
+        # Read buffers are pooled and sized from the stream length
+        self.thumbnail_loader = ThumbnailLoader(BufferPool(Buffer), self.target_size,
+                                                InputStreamOptions.READ_AHEAD)
+
+        self._on_change = on_change
+        self.session_manager = await MediaManager.request_async()
+        self._session_token = self.session_manager.add_current_session_changed(
+            self._handle_session_changed)
+
+    async def stop(self):
+        self._detach_session()
+        if self.session_manager and self._session_token is not None:
+            self.session_manager.remove_current_session_changed(self._session_token)
+            self._session_token = None
+
+    def _handle_session_changed(self, sender, args):
+        if self._on_change:
+            self._on_change()
+
+    def _handle_properties_changed(self, sender, args):
+        if self._on_change:
+            self._on_change()
+
+    def _detach_session(self):
+        if self._session is not None and self._properties_token is not None:
+            try:
+                self._session.remove_media_properties_changed(self._properties_token)
+            except Exception as e:
+                print(f"Error removing media properties handler: {e}")
+        self._session = None
+        self._properties_token = None
+
+    def _attach_session(self, session):
+        """Follow media property changes of the current session only."""
+        if self._session is not None and session is not None \
+                and self._session.source_app_user_model_id == session.source_app_user_model_id:
+            return
+
+        self._detach_session()
+        if session is not None:
+            self._session = session
+            self._properties_token = session.add_media_properties_changed(
+                self._handle_properties_changed)
+
+    async def get_now_playing(self):
+        current_session = self.session_manager.get_current_session()
+        self._attach_session(current_session)
+
+        if not current_session:
+            return None
+
+        media_properties = await current_session.try_get_media_properties_async()
+        return NowPlaying(media_properties.title, media_properties.artist,
+                          media_properties.album_title, media_properties.thumbnail)
+
+    async def load_thumbnail(self, thumb_stream_ref):
+        """Loads the media thumbnail."""
+        try:
+            return await self.thumbnail_loader.load(thumb_stream_ref)
+        except Exception as e:
+            print(f"Failed to load thumbnail: {str(e)}")
+            return None
+
+
+class FakeMediaProvider(MediaProvider):
+    """In-process provider for driving Media without Windows, e.g. in tests.
+
+    Call set_now_playing() / clear() / set_queue() / skip_next() /
+    skip_previous() from any thread; the thumbnail is passed through as a
+    PIL image (or anything load_thumbnail should return).
+    """
+
+    supports_events = True
+    supports_queue = True
+
+    def __init__(self):
+        self._on_change = None
+        self._now_playing = None
+        self._previous = []
+        self._upcoming = []
+        self.fetch_count = 0
+        self.thumbnail_loads = 0
+
+    async def start(self, on_change):
+        self._on_change = on_change
+
+    def set_now_playing(self, title, artist, album_title="", thumbnail=None):
+        self._now_playing = NowPlaying(title, artist, album_title, thumbnail)
+        if self._on_change:
+            self._on_change()
+
+    def clear(self):
+        self._now_playing = None
+        if self._on_change:
+            self._on_change()
+
+    def set_queue(self, previous=(), upcoming=()):
+        """Set the queue around the current item, NowPlaying lists nearest first."""
+        self._previous = list(previous)
+        self._upcoming = list(upcoming)
+        if self._on_change:
+            self._on_change()
+
+    def skip_next(self):
+        if not self._upcoming:
+            return
+        if self._now_playing is not None:
+            self._previous.insert(0, self._now_playing)
+        self._now_playing = self._upcoming.pop(0)
+        if self._on_change:
+            self._on_change()
+
+    def skip_previous(self):
+        if not self._previous:
+            return
+        if self._now_playing is not None:
+            self._upcoming.insert(0, self._now_playing)
+        self._now_playing = self._previous.pop(0)
+        if self._on_change:
+            self._on_change()
+
+    async def get_now_playing(self):
+        self.fetch_count += 1
+        return self._now_playing
+
+    async def load_thumbnail(self, thumbnail):
+        self.thumbnail_loads += 1
+        return thumbnail
+
+    async def get_queue(self):
+        return MediaQueue(list(self._previous), list(self._upcoming))
@@ -1,139 +1,173 @@
 import threading
 import asyncio
-from winrt.windows.media.control import \
-    GlobalSystemMediaTransportControlsSessionManager as MediaManager
-from winrt.windows.storage.streams import DataReader, Buffer, InputStreamOptions
-from PIL import Image
-from io import BytesIO
+from media_provider import WinRTMediaProvider
+
 
 class Media:
-    def __init__(self, serial_obj=None):
+    def __init__(self, serial_obj=None, provider=None, prefetch_depth=1):
         # Initialize session management
-        self.session_thread = None
-        self.session_timer_interval = 0.5  # Check session every 0.5sec
+        self.session_timer_interval = 0.5  # Poll interval for providers without events
+        self.fallback_poll_interval = 10  # Safety poll when change events are available
         self.current_session_flag = False
         self.title = None
         self.artist = None
+        self.album_title = None
         self.current_media_thumbnail = None
         self.serial_obj = serial_obj  # Reference to SerialConnection
 
+        # Where now-playing information comes from (WinRT unless overridden)
+        self.provider = provider if provider is not None else WinRTMediaProvider()
+
+        # Queue items on each side of the current one whose frames are
+        # rendered ahead, if the provider exposes its queue (0 disables)
+        self.prefetch_depth = prefetch_depth
+
         # Event to handle stopping
         self.stop_event = threading.Event()
 
-        # Async loop for managing media sessions
-        self.session_loop = asyncio.new_event_loop()
+        # Set (from any thread) when the provider reports a change
+        self.changed_event = asyncio.Event()
 
-        # Start session thread
-        self.session_thread = threading.Thread(
-            target=self._async_session_thread, daemon=True)
-        self.session_thread.start()
+        # The loop the session runs on, set by run()
+        self.session_loop = None
+
+    async def run(self):
+        """Run the media session on the current event loop until stopped or cancelled."""
+        self.session_loop = asyncio.get_running_loop()
+        await self._async_session_runner()
 
     def stop(self):
         """Gracefully stop the media session."""
         self.stop_event.set()
 
+        # Wake the runner so it can exit and unsubscribe
+        self._notify_changed()
+
+    def _notify_changed(self):
+        """Provider callback, may be invoked from a foreign (WinRT) thread."""
+        if self.session_loop is None:
+            return
         try:
-            # Stop the asyncio loop
-            # noinspection PyTypeChecker
-            self.session_loop.call_soon_threadsafe(self.session_loop.stop)
+            self.session_loop.call_soon_threadsafe(self.changed_event.set)
+        except RuntimeError:
+            pass  # Loop already closed
+
+    async def _async_session_runner(self):
+        """Async runner to manage media sessions."""
+        try:
+            await self.provider.start(self._notify_changed)
         except Exception as e:
-            print(f"Error stopping event loop: {e}")
+            print(f"Error starting media provider: {e}")
+            return
 
-        # Ensure threads stop properly
-        self.session_thread.join(timeout=2)
+        if self.provider.supports_events:
+            wait_interval = self.fallback_poll_interval
+        else:
+            wait_interval = self.session_timer_interval
 
-    def _async_session_thread(self):
-        """Thread to run the asyncio loop."""
-        asyncio.set_event_loop(self.session_loop)
+        force = False
         try:
-            self.session_loop.run_until_complete(self._async_session_runner())
-        except Exception as e:
-            print(f"Error in async session thread: {e}")
+            while not self.stop_event.is_set():
+                try:
+                    await self._async_session_handler(force=force)
+                except Exception as e:
+                    print(f"Error in async session handler: {e}")
+
+                # Sleep until the provider signals a change or the fallback poll is due
+                try:
+                    await asyncio.wait_for(self.changed_event.wait(), wait_interval)
+                    force = True
+                except asyncio.TimeoutError:
+                    force = False
+                self.changed_event.clear()
         finally:
             try:
-                self.session_loop.close()
+                await self.provider.stop()
             except Exception as e:
-                print(f"Error closing event loop: {e}")
+                print(f"Error stopping media provider: {e}")
 
-    async def _async_session_runner(self):
-        """Async runner to manage media sessions."""
-        while not self.stop_event.is_set():
-            try:
-                await self._async_session_handler()
-                await asyncio.sleep(self.session_timer_interval)
-            except Exception as e:
-                print(f"Error in async session handler: {e}")
-                await asyncio.sleep(0.5)  # Add delay to avoid busy-waiting on errors
-
-    async def load_thumbnail(self, thumb_stream_ref):
-        """Loads and displays the media thumbnail."""
-        try:
-            thumb_read_buffer = Buffer(5000000)  # Allocate buffer for thumbnail
-            readable_stream = await thumb_stream_ref.open_read_async()  # Open thumbnail stream
-
-            # Read the stream data into the buffer
-            await readable_stream.read_async(
-                thumb_read_buffer,
-                thumb_read_buffer.capacity,
-                InputStreamOptions.READ_AHEAD
-            )
-
-            # Convert buffer data into an image
-            buffer_reader = DataReader.from_buffer(thumb_read_buffer)
-            byte_buffer = buffer_reader.read_bytes(thumb_read_buffer.length)
-            binary = BytesIO(bytearray(byte_buffer))
-            img = Image.open(binary)
-            img.convert("RGB")
+    async def load_thumbnail(self, thumbnail):
+        """Loads the media thumbnail through the provider."""
+        img = await self.provider.load_thumbnail(thumbnail)
+        if img is not None:
             self.current_media_thumbnail = img  # Update the current thumbnail
-            # img.save("thumbnail_test.jpg", format="JPEG")
-
-            # Clean up resources
-            binary.close()
-            readable_stream.close()
-            return self.current_media_thumbnail
-        except Exception as e:
-            print(f"Failed to load thumbnail: {str(e)}")
-            return None
-
-    async def _async_session_handler(self):
-        """Handle media session updates."""
+        return img
+
+    async def _prefetch_neighbours(self):
+        """Fetch the artwork of the next and previous queue items and have
+        their frames rendered ahead, so a skip only costs the transfer."""
+        queue = await self.provider.get_queue()
+        if queue is None:
+            return
+
+        # Nearest first, next before previous: next, previous, next + 1, ...
+        items = []
+        for i in range(self.prefetch_depth):
+            items.extend(side[i] for side in (queue.upcoming, queue.previous) if i < len(side))
+
+        requests = []
+        for item in items:
+            if not item.thumbnail:
+                continue
+            image = await self.provider.load_thumbnail(item.thumbnail)
+            if image is not None:
+                # Same text as submit_image() gets, so the render cache keys match
+                requests.append((image, item.title[:25], item.artist[:25]))
+        self.serial_obj.prefetch_frames(requests)
+
+    async def _async_session_handler(self, force=False):
+        """Handle media session updates.
+
+        force re-pushes the frame even if title/artist/album are unchanged, used
+        when the provider reported a property change (e.g. new artwork).
+        """
         try:
-            session_manager = await MediaManager.request_async()
-            current_session = session_manager.get_current_session()
+            now_playing = await self.provider.get_now_playing()
 
-            if not current_session:
+            if not now_playing:
                 if self.current_session_flag:
                     print("No current session available")
                     self.current_session_flag = False
                     self.title = None
                     self.artist = None
+                    self.album_title = None
                 return
 
-            media_properties = await current_session.try_get_media_properties_async()
-
-            # Check for updated media session properties
-            if media_properties.title != self.title:
-                self.title = media_properties.title
-                self.artist = media_properties.artist
+            # Check for updated media session properties. Identical frames are
+            # filtered by digest in the serial sender, so erring on the side of
+            # re-rendering here is cheap.
+            if force or (now_playing.title, now_playing.artist,
+                         now_playing.album_title) != (self.title, self.artist, self.album_title):
+                changed = now_playing.title != self.title
+                self.title = now_playing.title
+                self.artist = now_playing.artist
+                self.album_title = now_playing.album_title
                 self.current_session_flag = True
 
-                print(f"Now Playing: Title: {self.title}, Artist: {self.artist}")
+                if changed:
+                    print(f"Now Playing: Title: {self.title}, Artist: {self.artist}")
 
                 # Send image to ESP32 if serial object is available
-                if self.serial_obj and media_properties.thumbnail:
-                    thumbnail = await self.load_thumbnail(media_properties.thumbnail)
+                if self.serial_obj and now_playing.thumbnail:
+                    thumbnail = await self.load_thumbnail(now_playing.thumbnail)
                     if thumbnail:
-                        # Direct send without using queue
-                        self.serial_obj.send_image_to_esp32(
+                        # Rendering and sending happen on the frame pipeline's
+                        # executors, so this loop keeps running meanwhile
+                        self.serial_obj.submit_image(
                             thumbnail,
                             self.title[:25],
                             self.artist[:25]
                         )
-                elif not media_properties.thumbnail:
+                elif not now_playing.thumbnail and changed:
                     print("No thumbnail available")
 
+                # After the current frame, so it is never held up by the neighbours
+                if self.serial_obj and self.prefetch_depth and self.provider.supports_queue:
+                    await self._prefetch_neighbours()
+
         except Exception as e:
             print(f"Error managing media session: {e}")
             self.current_session_flag = False
             self.title = None
             self.artist = None
+            self.album_title = None
@@ -0,0 +1,309 @@
+"""
+Process-wide metrics for the host daemon: counters, gauges and latency
+histograms, readable as Prometheus text from a local HTTP endpoint or
+dumped to a JSON file periodically.
+
+    FRAMES = metrics.counter("serial_telemetry_frames_total", "Telemetry frames received")
+    FRAMES.inc()
+    with metrics.histogram("frame_render_seconds", "Frame render time").time():
+        ...
+
+Recording is a lock and an addition, cheap enough for per-frame hot paths.
+"""
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    """Value that goes up and down. set_function() makes it read a callable
+    at collection time instead, for state that is already tracked elsewhere."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._value = 0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        self._function = function
+
+    @property
+    def value(self):
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception:
+                return float("nan")
+        return self._value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Latency histogram with HDR-style log-linear buckets.
+
+    Every power of two is split into SUB_BUCKETS linear buckets, so any
+    recorded value is known to within 1/SUB_BUCKETS (about 3%) whatever its
+    magnitude, in constant memory per occupied bucket and constant time per
+    record. Values are in seconds (or any unit, as long as it is consistent).
+    """
+
+    kind = "summary"
+    SUB_BUCKETS = 32
+    QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._buckets = {}  # index -> count
+        self._count = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        if value <= 0:
+            return None
+        mantissa, exponent = math.frexp(value)  # value = mantissa * 2**exponent, 0.5 <= mantissa < 1
+        return exponent * self.SUB_BUCKETS + int((mantissa - 0.5) * 2 * self.SUB_BUCKETS)
+
+    def _bucket_value(self, index):
+        # Midpoint of the bucket
+        exponent, sub = divmod(index, self.SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 0.5) / (2 * self.SUB_BUCKETS), exponent)
+
+    def record(self, value):
+        index = self._index(value)
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self._count += 1
+            self._sum += value
+            if value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+
+    def time(self):
+        """Context manager recording the seconds spent in its block."""
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return self._count
+
+    def percentile(self, q):
+        """Value below which a fraction q of the recordings fall (0 if empty)."""
+        with self._lock:
+            return self._percentiles((q,))[0]
+
+    def _percentiles(self, quantiles):
+        # Caller holds the lock
+        if not self._count:
+            return [0.0] * len(quantiles)
+        ordered = sorted(self._buckets.items(), key=lambda item: -1 if item[0] is None else item[0])
+        results = []
+        for q in quantiles:
+            rank = max(1, math.ceil(q * self._count))
+            seen = 0
+            for index, count in ordered:
+                seen += count
+                if seen >= rank:
+                    value = 0.0 if index is None else self._bucket_value(index)
+                    results.append(min(max(value, self._min), self._max))
+                    break
+        return results
+
+    def snapshot(self):
+        with self._lock:
+            quantiles = self._percentiles(self.QUANTILES)
+            return {
+                "count": self._count,
+                "sum": self._sum,
+                "min": self._min if self._count else 0.0,
+                "max": self._max if self._count else 0.0,
+                "quantiles": dict(zip(self.QUANTILES, quantiles)),
+            }
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.start)
+
+
+class Registry:
+    """Named metrics. Asking for an existing name returns the same metric, so
+    modules can declare what they record at import time."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text=""):
+        return self._get(Histogram, name, help_text)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def snapshot(self):
+        """Current values as a JSON serialisable dict."""
+        return {metric.name: metric.snapshot() for metric in self.metrics()}
+
+    def render_prometheus(self):
+        """Current values in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics():
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            value = metric.snapshot()
+            if isinstance(metric, Histogram):
+                for q, quantile_value in value["quantiles"].items():
+                    lines.append(f'{metric.name}{{quantile="{q}"}} {quantile_value:.6g}')
+                lines.append(f"{metric.name}_sum {value['sum']:.6g}")
+                lines.append(f"{metric.name}_count {value['count']}")
+            else:
+                lines.append(f"{metric.name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class MetricsServer:
+    """Serves the registry on http://host:port/metrics (Prometheus text) and
+    /metrics.json. Binds to localhost by default."""
+
+    def __init__(self, port, host="127.0.0.1", registry=REGISTRY):
+        registry_ = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry_.render_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(registry_.snapshot()).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the log
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class JsonDumper:
+    """Writes the registry snapshot to path every interval seconds. The file
+    is replaced atomically, so readers never see a partial dump."""
+
+    def __init__(self, path, interval=10.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._dump_thread, daemon=True)
+        self._thread.start()
+
+    def _dump_thread(self):
+        while not self._stop_event.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        data = {"time": time.time(), "metrics": self.registry.snapshot()}
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(data, file, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Cannot write metrics to {self.path}: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join(timeout=2)
+        self.dump()
@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import serial_protocol
+
+# USB-serial bridges found on ESP32 boards, (VID, PID), PID None = any
+KNOWN_USB_IDS = {
+    (0x10C4, 0xEA60): "CP210x",
+    (0x1A86, 0x7523): "CH340",
+    (0x1A86, 0x55D4): "CH9102",
+    (0x0403, 0x6001): "FT232R",
+    (0x303A, None): "Espressif USB",
+}
+
+PortFingerprint = namedtuple("PortFingerprint", ["vid", "pid", "serial_number"])
+
+# Result of a successful probe. firmware and version are None for firmware
+# that predates the HELLO reply (it only answered the PING).
+ProbeResult = namedtuple("ProbeResult", ["ser", "port", "firmware", "version", "caps", "baudrate"])
+
+
+def fingerprint(port):
+    """Identity of a USB serial device that survives replugs and COM renumbering."""
+    return PortFingerprint(port.vid, port.pid, port.serial_number)
+
+
+def is_known_device(port):
+    if port.vid is None:
+        return False
+    return (port.vid, port.pid) in KNOWN_USB_IDS or (port.vid, None) in KNOWN_USB_IDS
+
+
+class PortCache:
+    """Fingerprint and device name of the last port that passed the handshake.
+
+    Kept in a small JSON file when path is given, so the next start tries
+    that port first. baudrate is the link speed last negotiated on it, where
+    the firmware may still be if the host restarted without a board reset.
+    """
+
+    def __init__(self, path=None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.fingerprint = None
+        self.device = None
+        self.baudrate = None
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as file:
+                    data = json.load(file)
+                self.fingerprint = PortFingerprint(*data["fingerprint"])
+                self.device = data["device"]
+                self.baudrate = data.get("baudrate")
+            except Exception as e:
+                self.logger.warning(f"Ignoring port cache {path}: {e}")
+
+    def matches(self, port):
+        if self.fingerprint is None or port.vid is None:
+            return False
+        return fingerprint(port) == self.fingerprint
+
+    def save(self, port, baudrate=None):
+        self.fingerprint = fingerprint(port)
+        self.device = port.device
+        self.baudrate = baudrate
+        if not self.path:
+            return
+        try:
+            with open(self.path, "w") as file:
+                json.dump({"fingerprint": list(self.fingerprint), "device": self.device,
+                           "baudrate": self.baudrate}, file)
+        except OSError as e:
+            self.logger.warning(f"Cannot write port cache {self.path}: {e}")
+
+
+def order_candidates(ports, cache):
+    """Ports worth probing, most likely first: the cached device by
+    fingerprint, then by name, then known ESP32 USB bridges, then any other
+    USB serial port."""
+    ranked = []
+    for port in ports:
+        if cache.matches(port):
+            rank = 0
+        elif port.device == cache.device:
+            rank = 1
+        elif is_known_device(port):
+            rank = 2
+        elif "USB" in str(port.hwid):
+            rank = 3
+        else:
+            continue
+        ranked.append((rank, port.device, port))
+    ranked.sort(key=lambda item: item[:2])
+    return [port for _, _, port in ranked]
+
+
+def handshake(ser, timeout):
+    """Send the probe on an open port and wait for HELLO (or a bare ALIVE
+    from older firmware). Returns (firmware, version, caps) or None."""
+    parser = serial_protocol.FrameParser()
+    ser.reset_input_buffer()
+    ser.write(serial_protocol.PROBE_REQUEST)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = ser.read(max(1, ser.in_waiting))
+        if not data:
+            continue
+        for event in parser.feed(data):
+            if event[0] != serial_protocol.EVENT_TEXT:
+                continue
+            hello = serial_protocol.parse_hello(event[1])
+            if hello is not None:
+                return hello
+            if event[1].startswith("ALIVE"):
+                return None, None, set()
+    return None
+
+
+def probe_port(port, open_port, timeout, extra_baud_rates=()):
+    """Open port with open_port(device) and run the handshake, then again at
+    each of extra_baud_rates. Returns a ProbeResult with the port left open,
+    or None with it closed."""
+    ser = open_port(port.device)
+    try:
+        result = handshake(ser, timeout)
+        for baudrate in extra_baud_rates:
+            if result is not None:
+                break
+            ser.baudrate = baudrate
+            result = handshake(ser, timeout)
+    except Exception:
+        ser.close()
+        raise
+    if result is None:
+        ser.close()
+        return None
+    firmware, version, caps = result
+    return ProbeResult(ser, port, firmware, version, caps, ser.baudrate)
+
+
+def probe_ports(candidates, open_port, timeout=0.3, max_workers=4, probe_first=False,
+                first_baud_rates=()):
+    """Find the ESP32 among candidates.
+
+    With probe_first (the first candidate is the cached port, the common
+    case) that port is tried alone before the rest are probed in parallel,
+    falling back to first_baud_rates if it does not answer at the open
+    rate. The first port to answer wins and any other port that answered
+    is closed again.
+    """
+    logger = logging.getLogger(__name__)
+
+    def attempt(port, extra_baud_rates=()):
+        try:
+            return probe_port(port, open_port, timeout, extra_baud_rates)
+        except Exception as e:
+            logger.debug(f"Probe of {port.device} failed: {e}")
+            return None
+
+    if not candidates:
+        return None
+
+    if probe_first:
+        result = attempt(candidates[0], first_baud_rates)
+        if result is not None or len(candidates) == 1:
+            return result
+        candidates = candidates[1:]
+
+    winner = None
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(candidates)))
+    futures = [executor.submit(attempt, port) for port in candidates]
+    try:
+        for future in as_completed(futures):
+            winner = future.result()
+            if winner is not None:
+                break
+    finally:
+        # Do not wait for silent ports to time out
+        executor.shutdown(wait=False)
+
+    def close_loser(future):
+        result = future.result()
+        if result is not None and result is not winner:
+            result.ser.close()
+
+    for future in futures:
+        future.add_done_callback(close_loser)
+    return winner
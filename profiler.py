@@ -0,0 +1,440 @@
+"""
+Opt-in sampling profiler for the running host daemon.
+
+Samples the stacks of every thread (the daemon's event loop, the serial,
+render, send and action executors, the media and audio threads) at a fixed
+interval, attributes each sample to a pipeline stage and writes the window
+as collapsed stacks (for flamegraph.pl / inferno) and as a speedscope
+profile (https://www.speedscope.app).
+
+Each sample is weighted with the CPU time its thread used since the
+previous sample (per-thread CPU clocks on POSIX, GetThreadTimes on
+Windows), so sleeping and blocked threads drop out and the output shows
+where CPU goes. Without thread CPU clocks it falls back to wall time.
+
+Toggled at runtime with install_signal_toggle() (SIGUSR1, or Ctrl+Break
+on Windows) or through ProfilerControl, a line based control socket:
+
+    $ nc 127.0.0.1 7891
+    start 30        sample for 30 s, then write the output
+    stop            stop now and write the output
+    status
+"""
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+# (stage, module file, function or None for any function in the module).
+# The innermost frame of a stack that matches decides its stage, so codec
+# work inside rendering counts as encode rather than render.
+STAGE_RULES = (
+    ("encode", "frame_codec.py", None),
+    ("diff", "frame_diff.py", None),
+    ("render", "frame_renderer.py", None),
+    ("render", "pyserial.py", "render_frame"),
+    ("transfer", "pyserial.py", "transmit_frame"),
+    ("transfer", "pyserial.py", "_transmit_frame"),
+    ("transfer", "pyserial.py", "_transmit_partial"),
+    ("transfer", "pyserial.py", "_transmit_chunked"),
+    ("serial-read", "pyserial.py", "_read_serial_data"),
+    ("telemetry", "pyserial.py", "_handle_message"),
+    ("connection", "pyserial.py", "_start_connection"),
+    ("connection", "pyserial.py", "_check_connection"),
+    ("connection", "pyserial.py", "negotiate_baud"),
+    ("connection", "port_discovery.py", None),
+    ("input", "main.py", "process_received_data"),
+    ("input", "input_filter.py", None),
+    ("input", "input_events.py", "update"),
+    ("actions", "input_events.py", "_run"),
+    ("actions", "keyboard_event.py", None),
+    ("volume", "volume_potentiometer.py", None),
+    ("audio-sessions", "audio_sessions.py", None),
+    ("thumbnail", "thumbnail_loader.py", None),
+    ("media", "media_session.py", None),
+    ("media", "media_provider.py", None),
+    ("metrics", "metrics.py", None),
+)
+
+# Innermost Python frames of a thread that is blocked rather than working.
+# Sampling by wall time leaves these samples out. Sampling by CPU time
+# keeps them, as the CPU was used by work that finished between samples,
+# and files them under "unattributed" unless a stage rule matches.
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),  # concurrent.futures worker waiting for work
+    ("serialposix.py", "read"),
+    ("serialwin32.py", "read"),
+    ("socketserver.py", "serve_forever"),
+    ("windows_events.py", "_poll"),
+}
+
+
+class ThreadCpuClock:
+    """CPU seconds used by a thread so far, or None where the platform has no
+    per-thread clock (or the thread is gone)."""
+
+    THREAD_QUERY_LIMITED_INFORMATION = 0x0800
+
+    def __init__(self):
+        self._handles = {}  # Windows: native thread id -> handle
+        if sys.platform == "win32":
+            self._kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            self.available = True
+        else:
+            self.available = hasattr(time, "pthread_getcpuclockid")
+
+    def read(self, ident, native_id):
+        if sys.platform == "win32":
+            return self._read_windows(native_id)
+        try:
+            return time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (AttributeError, OSError):
+            return None
+
+    def _read_windows(self, native_id):
+        if native_id is None:
+            return None
+        handle = self._handles.get(native_id)
+        if handle is None:
+            handle = self._kernel32.OpenThread(self.THREAD_QUERY_LIMITED_INFORMATION, False, native_id)
+            if not handle:
+                return None
+            self._handles[native_id] = handle
+        creation, exit_, kernel, user = (wintypes.FILETIME() for _ in range(4))
+        if not self._kernel32.GetThreadTimes(handle, ctypes.byref(creation), ctypes.byref(exit_),
+                                             ctypes.byref(kernel), ctypes.byref(user)):
+            return None
+        # FILETIMEs count 100 ns units
+        return sum((t.dwHighDateTime << 32 | t.dwLowDateTime) for t in (kernel, user)) / 1e7
+
+    def close(self):
+        for handle in self._handles.values():
+            self._kernel32.CloseHandle(handle)
+        self._handles = {}
+
+
+class SamplingProfiler:
+    """Samples all threads every interval seconds while running.
+
+    Stacks are aggregated as they are sampled, so memory is bounded by the
+    number of distinct stacks rather than the window length. With
+    cpu_time (the default where supported) every sample weighs the CPU
+    time its thread used since the previous one. Otherwise it weighs the
+    wall time since the previous sample, and samples of blocked threads
+    are attributed to the "idle" stage and left out unless include_idle
+    is set.
+    """
+
+    def __init__(self, interval=0.005, output_dir="profiles", include_idle=False, cpu_time=True):
+        self.logger = logging.getLogger(__name__)
+        self.interval = interval
+        self.output_dir = output_dir
+        self.include_idle = include_idle
+        self.cpu_clock = ThreadCpuClock()
+        self.cpu_time = cpu_time and self.cpu_clock.available
+
+        self._lock = threading.Lock()
+        self._stacks_lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        # Window state
+        self._stacks = Counter()  # (thread name, stage, frame indices root first) -> seconds
+        self._last_cpu = {}  # thread ident -> CPU seconds at the previous sample
+        self._last_sample = None
+        self._frame_index = {}  # code object -> index into _frames
+        self._frames = []  # (name, file, line)
+        self._stage_cache = {}  # code object -> stage or None
+        self.started_at = None
+        self.duration = 0.0
+        self.sample_count = 0
+        self.last_output = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=None):
+        """Start a window, which ends after duration seconds or at stop().
+        Returns False if one is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            with self._stacks_lock:
+                self._stacks = Counter()
+                self._frame_index = {}
+                self._frames = []
+                self.sample_count = 0
+            self._last_cpu = {}
+            self._last_sample = None
+            self.started_at = time.time()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._sample_thread, args=(duration,),
+                                            name="profiler", daemon=True)
+            self._thread.start()
+        self.logger.info(f"Profiling started ({self.interval * 1000:.0f} ms interval, "
+                         f"{'CPU' if self.cpu_time else 'wall'} time"
+                         + (f", {duration:g} s)" if duration else ")"))
+        return True
+
+    def stop(self, wait=True):
+        """End the window. The output is written by the sampling thread, so
+        this is safe to call from a signal handler with wait=False."""
+        self._stop_event.set()
+        thread = self._thread
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join()
+        return self.last_output
+
+    def toggle(self):
+        if self.running:
+            self.stop(wait=False)
+        else:
+            self.start()
+
+    def _sample_thread(self, duration):
+        start = time.perf_counter()
+        deadline = start + duration if duration else None
+        next_sample = start
+        try:
+            while not self._stop_event.is_set():
+                self._sample()
+                next_sample += self.interval
+                now = time.perf_counter()
+                if deadline is not None and now >= deadline:
+                    break
+                if next_sample < now:
+                    next_sample = now  # Overran (e.g. a GIL holder), do not burst
+                self._stop_event.wait(next_sample - now)
+        finally:
+            self.duration = time.perf_counter() - start
+            if sys.platform == "win32":
+                self.cpu_clock.close()
+            try:
+                self.last_output = self.write()
+                self.logger.info(f"Profile written to {self.last_output[0]} and "
+                                 f"{self.last_output[1]}, stages: {self.stage_summary()}")
+            except OSError as e:
+                self.logger.error(f"Cannot write profile: {e}")
+
+    def _sample(self):
+        own = threading.get_ident()
+        threads = {thread.ident: thread for thread in threading.enumerate()}
+        now = time.perf_counter()
+        wall = now - self._last_sample if self._last_sample is not None else self.interval
+        self._last_sample = now
+
+        samples = Counter()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            thread = threads.get(ident)
+            if self.cpu_time:
+                cpu = self.cpu_clock.read(ident, getattr(thread, "native_id", None))
+                previous = self._last_cpu.get(ident)
+                if cpu is None:
+                    continue
+                self._last_cpu[ident] = cpu
+                # A thread's first sample only sets its baseline
+                weight = cpu - previous if previous is not None else 0.0
+                if weight <= 0:
+                    continue
+            else:
+                weight = wall
+
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if not codes:
+                continue
+
+            stage = self._stage(codes)
+            if stage == "idle" and not self.include_idle:
+                continue
+            stack = tuple(self._index(code) for code in reversed(codes))
+            samples[(thread.name if thread else str(ident), stage, stack)] += weight
+
+        with self._stacks_lock:
+            self._stacks.update(samples)
+            self.sample_count += 1
+
+    def _snapshot(self):
+        with self._stacks_lock:
+            return sorted(self._stacks.items()), list(self._frames)
+
+    def _stage(self, codes):
+        leaf = codes[0]
+        idle = (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_FRAMES
+        if idle and not self.cpu_time:
+            return "idle"
+        for code in codes:
+            stage = self._stage_cache.get(code, False)
+            if stage is False:
+                stage = self._stage_cache[code] = self._match_stage(code)
+            if stage is not None:
+                return stage
+        return "unattributed" if idle else "other"
+
+    @staticmethod
+    def _match_stage(code):
+        filename = os.path.basename(code.co_filename)
+        for stage, module, function in STAGE_RULES:
+            if filename == module and (function is None or function == code.co_name):
+                return stage
+        return None
+
+    def _index(self, code):
+        index = self._frame_index.get(code)
+        if index is None:
+            index = self._frame_index[code] = len(self._frames)
+            self._frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        return index
+
+    @staticmethod
+    def _label(frame):
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def stage_summary(self):
+        """Share of the sampled time per stage, in percent."""
+        totals = Counter()
+        stacks, _ = self._snapshot()
+        for (_, stage, _), seconds in stacks:
+            totals[stage] += seconds
+        total = sum(totals.values())
+        return {stage: round(seconds * 100 / total, 1) for stage, seconds in totals.most_common()} \
+            if total else {}
+
+    def total_seconds(self):
+        """CPU (or wall) seconds sampled in the window."""
+        stacks, _ = self._snapshot()
+        return sum(seconds for _, seconds in stacks)
+
+    def collapsed(self):
+        """Stacks in the collapsed format, one "stage;thread;outer;...;inner weight" per
+        line, weights in microseconds."""
+        stacks, frames = self._snapshot()
+        lines = []
+        for (thread, stage, stack), seconds in stacks:
+            labels = ";".join(self._label(frames[index]).replace(";", ",") for index in stack)
+            lines.append(f"{stage};{thread};{labels} {max(1, round(seconds * 1e6))}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self):
+        """The window as a speedscope file, one sampled profile per thread."""
+        stacks, code_frames = self._snapshot()
+        frames = [{"name": name, "file": filename, "line": line}
+                  for name, filename, line in code_frames]
+        stage_frames = {}
+
+        def stage_frame(stage):
+            # Stages become the root frame, so the flame graph groups by them
+            if stage not in stage_frames:
+                stage_frames[stage] = len(frames)
+                frames.append({"name": f"[{stage}]"})
+            return stage_frames[stage]
+
+        profiles = {}
+        for (thread, stage, stack), seconds in stacks:
+            profile = profiles.setdefault(thread, {
+                "type": "sampled", "name": thread, "unit": "seconds",
+                "startValue": 0, "endValue": self.duration, "samples": [], "weights": []})
+            profile["samples"].append([stage_frame(stage)] + list(stack))
+            profile["weights"].append(seconds)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"host daemon {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))}",
+            "exporter": "esp32-media-display profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+    def write(self):
+        """Write the current window, returns (collapsed path, speedscope path)."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        base = os.path.join(self.output_dir, f"profile-{stamp}")
+        collapsed_path = f"{base}.collapsed"
+        speedscope_path = f"{base}.speedscope.json"
+        with open(collapsed_path, "w") as file:
+            file.write(self.collapsed())
+        with open(speedscope_path, "w") as file:
+            json.dump(self.speedscope(), file)
+        return collapsed_path, speedscope_path
+
+
+def install_signal_toggle(profiler):
+    """Toggle profiler on SIGUSR1 (SIGBREAK, i.e. Ctrl+Break, on Windows).
+    Must be called from the main thread. Returns the signal, or None."""
+    signum = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+    if signum is None:
+        return None
+    signal.signal(signum, lambda *_: profiler.toggle())
+    return signum
+
+
+class ProfilerControl:
+    """Line based control socket for a profiler, on localhost only.
+
+    Commands: "start [seconds]", "stop", "status". Each gets a one line reply.
+    """
+
+    def __init__(self, profiler, port, host="127.0.0.1"):
+        self.profiler = profiler
+        control = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    reply = control.command(line.decode("utf-8", errors="ignore").strip())
+                    self.wfile.write(reply.encode() + b"\n")
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="profiler-control",
+                                        daemon=True)
+        self._thread.start()
+
+    def command(self, line):
+        parts = line.split()
+        if not parts:
+            return "ERROR empty command"
+        if parts[0] == "start":
+            try:
+                duration = float(parts[1]) if len(parts) > 1 else None
+            except ValueError:
+                return f"ERROR bad duration: {parts[1]}"
+            return "OK started" if self.profiler.start(duration) else "ERROR already running"
+        if parts[0] == "stop":
+            if not self.profiler.running:
+                return "ERROR not running"
+            collapsed_path, speedscope_path = self.profiler.stop() or (None, None)
+            return f"OK {collapsed_path} {speedscope_path}"
+        if parts[0] == "status":
+            profiler = self.profiler
+            state = "running" if profiler.running else "stopped"
+            return (f"OK {state} samples={profiler.sample_count} "
+                    f"seconds={profiler.total_seconds():.3f} "
+                    f"stages={json.dumps(profiler.stage_summary())}")
+        return f"ERROR unknown command: {parts[0]}"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
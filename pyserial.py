@@ -1,14 +1,114 @@
 import time
 import serial
-import serial.tools.list_ports_windows
+import serial.tools.list_ports
 import logging
 import threading
-from PIL import Image, ImageFilter, ImageDraw, ImageFont, ImageEnhance
+import queue
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import io
 import struct
+import hashlib
+import os
+from render_cache import RenderCache, thumbnail_digest
+from frame_pipeline import FramePrefetcher
+import serial_protocol
+import frame_codec
+import metrics
+import port_discovery
+from collections import namedtuple
+
+# PIL, NumPy and the renderer are imported on first use (or by warm_up()),
+# so opening the port and reading telemetry does not wait for them.
+
+# One telemetry sample as delivered to consumers. seq increases by one per
+# frame received, so a gap means frames were dropped on the way.
+TelemetryFrame = namedtuple("TelemetryFrame", ["seq", "values", "time"])
+
+TELEMETRY_FRAMES = metrics.counter("serial_telemetry_frames_total", "Telemetry frames received")
+TELEMETRY_DROPPED = metrics.counter("serial_telemetry_dropped_total",
+                                    "Telemetry frames dropped because the consumer fell behind")
+PARSE_ERRORS = metrics.counter("serial_parse_errors_total",
+                               "Corrupt binary frames and malformed text lines")
+RECONNECTS = metrics.counter("serial_reconnects_total", "Connections dropped and re-established")
+LINK_BAUD = metrics.gauge("serial_link_baud", "Current link speed")
+RENDER_SECONDS = metrics.histogram("frame_render_seconds", "Render and encode time on a cache miss")
+RENDER_CACHE_HITS = metrics.counter("frame_render_cache_hits_total", "Frames served from the render cache")
+RENDER_CACHE_MISSES = metrics.counter("frame_render_cache_misses_total",
+                                      "Frames rendered because the render cache did not have them")
+ENCODED_BYTES = metrics.histogram("frame_encoded_bytes", "Encoded frame payload size")
+TRANSFER_SECONDS = metrics.histogram("frame_transfer_seconds", "Frame transfer time until DONE")
+TRANSFER_FAILURES = metrics.counter("frame_transfer_failures_total", "Frame transfers that failed")
+TRANSFER_SKIPPED = metrics.counter("frame_transfer_skipped_total", "Frames already on display")
+RETRANSMITTED_CHUNKS = metrics.counter("frame_retransmitted_chunks_total", "Chunks sent again")
+PREVIEW_SECONDS = metrics.histogram("frame_preview_seconds",
+                                    "Time from the start of a transfer until its preview is shown")
+TRANSFER_CANCELLED = metrics.counter("frame_transfer_cancelled_total",
+                                     "Full quality passes abandoned for a newer frame")
+PREFETCH_RENDERS = metrics.counter("frame_prefetch_renders_total",
+                                   "Frames rendered ahead for neighbouring queue items")
+PREFETCH_HITS = metrics.counter("frame_prefetch_hits_total", "Prefetched frames that were shown")
+PREFETCH_WASTED = metrics.counter("frame_prefetch_wasted_total",
+                                  "Prefetched frames dropped from the queue without being shown")
+PREFETCH_WASTED_SECONDS = metrics.counter("frame_prefetch_wasted_seconds_total",
+                                          "Render time spent on wasted prefetches")
+REPLY_WAIT_SECONDS = {
+    "ACK": metrics.histogram("serial_ack_wait_seconds", "Wait for a transfer ACK"),
+    "DONE": metrics.histogram("serial_done_wait_seconds", "Wait for DONE after the last byte"),
+}
+
 
 class SerialConnection:
-    def __init__(self, total_no_of_switches_sliders):
+    # Anything that changes the rendered output must be part of this tuple
+    # (together with the payload codec), otherwise stale frames would be
+    # served from the render cache.
+    RENDER_SETTINGS = ("v2", 320, 240, 85)
+
+    # Firmware capability needed for each non-JPEG payload codec
+    CODEC_CAPS = {frame_codec.CODEC_RGB565: "RGB565", frame_codec.CODEC_RLE565: "RLE565"}
+
+    # Appended to a frame digest for a screen that a partial update brought
+    # close to that frame (see _transmit_partial)
+    PARTIAL_SUFFIX = "~"
+
+    # Progressive frames: a JPEG preview at 1/PREVIEW_SCALE size, drawn
+    # enlarged, goes ahead of every full frame. Frames less than
+    # PREVIEW_MIN_RATIO times the preview size are sent without one.
+    PREVIEW_SCALE = 4
+    PREVIEW_QUALITY = 50
+    PREVIEW_MIN_RATIO = 4
+
+    # Renderer behind thumbnail_to_jpg, created on first use
+    _shared_renderer = None
+
+    # Text replies routed to the image sender rather than treated as telemetry
+    # (BAUD and LOOP replies belong to link speed negotiation, which holds the link too)
+    TRANSFER_REPLIES = ("ACK", "DONE", "Error", "CACK", "CNAK", "BAUD", "LOOP")
+
+    # Liveness: telemetry arrives every 20 ms, so silence for HEARTBEAT_TIMEOUT
+    # means the link is gone. A PING is only sent after PING_INTERVAL of silence.
+    HEARTBEAT_TIMEOUT = 1.0
+    PING_INTERVAL = 0.25
+    CHECK_INTERVAL = 0.1
+
+    # Reconnect backoff, doubling from the minimum up to the maximum
+    RECONNECT_MIN_DELAY = 0.05
+    RECONNECT_MAX_DELAY = 0.5
+    PROBE_TIMEOUT = 0.3
+
+    # Link speeds tried after connecting, fastest first
+    DEFAULT_BAUD_RATES = (921600, 460800, 230400)
+    # Failed transfers in a row before stepping down to a slower rate
+    LINK_ERROR_LIMIT = 3
+
+    # A lost XFER line or ACK is retried this often, after XFER_ACK_TIMEOUT
+    # each. The ESP32 answers a repeated XFER by resuming the same transfer.
+    XFER_ATTEMPTS = 3
+    XFER_ACK_TIMEOUT = 0.5
+
+    def __init__(self, total_no_of_switches_sliders, render_cache_dir=None,
+                 codec=frame_codec.CODEC_JPEG, port_cache_file=None,
+                 baud_rates=None, progressive=True):
 
         # Configure logging
         logging.basicConfig(
@@ -19,286 +119,960 @@ class SerialConnection:
 
         # Serial connection parameters
         self.COM_PORT = None
-        self.BAUD_RATE = 115200
+        self.port_info = None  # ListPortInfo of the connected port
+        self.BAUD_RATE = serial_protocol.BASE_BAUD_RATE
+
+        # Higher link speeds to negotiate, and the ones that failed on this port
+        self.baud_rates = sorted(baud_rates or self.DEFAULT_BAUD_RATES, reverse=True)
+        self.failed_baud_rates = set()
+        self.link_errors = 0
         self.ser = None
-        self.data = []
         self.connected = False
         self.total_no_of_switches_sliders = total_no_of_switches_sliders
 
-        # Synchronization events and queues
-        self.connection_event = threading.Event()
-        self.stop_event = threading.Event()
+        # Port discovery: the last good port is remembered and probed first
+        self.port_cache = port_discovery.PortCache(port_cache_file)
+        self.firmware = None
+        self.firmware_version = None
+        self.last_rx_time = None  # Monotonic time anything was last received
+        self.reconnect_delay = self.RECONNECT_MIN_DELAY
+        self.reconnects = 0
+        self._port_warning_logged = False
 
-        # Existing threads (connection and read threads)
-        self.serial_connection_thread = threading.Thread(
-            target=self._start_and_check_conn_thread,
-            daemon=True
-        )
-        self.serial_read_thread = threading.Thread(
-            target=self._read_data_thread,
-            daemon=True
-        )
+        # Telemetry wire format: binary frames once the firmware accepts
+        # PROTO 1, the pipe-delimited text lines otherwise
+        self.protocol_version = 0
+        self.firmware_caps = set()
+        self.parser = serial_protocol.FrameParser()
 
-        # Start all threads
-        self.serial_connection_thread.start()
-        self.serial_read_thread.start()
+        # Digest of the last frame the ESP32 confirmed with DONE (or reported
+        # in its ALIVE reply). None means the display contents are unknown.
+        self.last_frame_digest = None
+        self.skipped_frames = 0
+        self.retransmitted_chunks = 0
 
-    def _start_and_check_conn_thread(self):
-        """Continuously manage serial connection."""
-        while not self.stop_event.is_set():
-            try:
-                if not self.connected:
-                    self._start_connection()
-                else:
-                    self._check_connection()
+        # What the screen shows, as decoded pixels, used to send only dirty
+        # regions. After a partial update this is the earlier screen with the
+        # regions sent pasted in, not the new frame, so changes too small to
+        # send build up until they are. last_frame_pixels_digest is the digest
+        # the ESP32 reports for those contents.
+        self.last_frame_pixels = None
+        self.last_frame_pixels_digest = None
+        self.partial_updates = 0
 
-            except Exception as e:
-                self.logger.error(f"Connection management error: {e}")
-                self.connected = False
+        # Low resolution previews ahead of full frames (firmware capability
+        # SCALE). last_preview_digest is the full frame whose preview was
+        # shown last; the full pass is abandoned once a newer frame waits.
+        self.progressive = progressive
+        self.previews_sent = 0
+        self.cancelled_transfers = 0
+        self.last_preview_digest = None
+        self._sending_payload = None
+        self._transfer_start = 0.0
+
+        # Payload codec for frames: jpeg, rgb565 or rle565
+        if codec not in frame_codec.CODECS:
+            raise ValueError(f"Unknown frame codec: {codec}")
+        self.codec = codec
+
+        # Fonts, masks and lookup tables are built once and reused per frame
+        self._renderer = None
+        self._renderer_lock = threading.Lock()
+
+        # Finished frame payloads, keyed by thumbnail hash, text and render settings
+        self.render_cache = RenderCache(max_entries=32, disk_dir=render_cache_dir)
+
+        # Frames of upcoming/previous queue items, rendered ahead into the
+        # render cache. _prefetched maps the cache keys not shown yet to
+        # their render time, for the hit and wasted work counts.
+        self.prefetcher = None  # Created by the first prefetch_frames()
+        self._prefetched = {}
+        self._prefetch_lock = threading.Lock()
+        self.prefetch_renders = 0
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0  # Frames rendered on demand while prefetching was in use
+        self.prefetch_wasted = 0
+        self.prefetch_wasted_time = 0.0
+
+        # The owner (the asyncio daemon, see AsyncSerialTransport) drives the
+        # connection and reading and installs the render/send pipeline
+        # submit_image() hands frames to
+        self.frame_pipeline = None
+        self.stop_event = threading.Event()
+
+        # The reader is the only reader of the port. It demultiplexes incoming
+        # messages by type: telemetry goes to the callbacks, ALIVE and PROTO
+        # replies update what the firmware reported, and image transfer
+        # replies (ACK, DONE, errors) go to transfer_replies for the sender.
+        self.transfer_replies = queue.Queue()
+
+        # Every telemetry frame is passed to the callbacks exactly once
+        self.telemetry_callbacks = []
+        self.telemetry_seq = 0
+        self.dropped_telemetry = 0
+        # Writers (pings, image transfers) share the port through this lock
+        self.write_lock = threading.Lock()
+        # Held for a whole exchange (image transfer, link speed change) and
+        # whenever the connection state (port, parser, connected, link errors,
+        # frame digest) changes, which happens on several threads
+        self.link_lock = threading.Lock()
 
-            time.sleep(5)
+    def connection_delay(self):
+        """Seconds until the connection manager should run again."""
+        if self.connected:
+            return self.CHECK_INTERVAL
+        delay = self.reconnect_delay
+        self.reconnect_delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+        return delay
+
+    def _open_port(self, device):
+        # DTR/RTS are dropped before opening so the probe does not reset the board
+        ser = serial.Serial()
+        ser.port = device
+        ser.baudrate = self.BAUD_RATE
+        ser.bytesize = serial.EIGHTBITS
+        ser.parity = serial.PARITY_NONE
+        ser.stopbits = serial.STOPBITS_ONE
+        ser.timeout = 0.05
+        ser.dtr = False
+        ser.rts = False
+        ser.open()
+        return ser
 
     # noinspection PyUnresolvedReferences
     def _start_connection(self):
         """Find and establish connection with ESP32."""
-        if self.ser and self.ser.is_open:
-            self.ser.close()
+        with self.link_lock:
+            if self.ser and self.ser.is_open:
+                self.ser.close()
 
-        ports = self._find_esp32_port()
-        if not ports:
-            self.logger.warning("No ESP32 ports found")
-            return
+        candidates = port_discovery.order_candidates(serial.tools.list_ports.comports(),
+                                                     self.port_cache)
+        result = None
+        if candidates:
+            cached_baud = self.port_cache.baudrate
+            result = port_discovery.probe_ports(
+                candidates, self._open_port, timeout=self.PROBE_TIMEOUT,
+                probe_first=self.port_cache.matches(candidates[0]),
+                first_baud_rates=(cached_baud,) if cached_baud and cached_baud != self.BAUD_RATE else ())
 
-        for port in ports:
-            try:
-                self.ser = serial.Serial(
-                    port=port,
-                    baudrate=self.BAUD_RATE,
-                    bytesize=serial.EIGHTBITS,
-                    parity=serial.PARITY_NONE,
-                    stopbits=serial.STOPBITS_ONE,
-                    timeout=1
-                )
-                self.ser.setRTS(False)
-                self.ser.setDTR(False)
-                self.COM_PORT = port
-                self.connected = True
-                self.connection_event.set()
-                self.logger.info(f"Connected to ESP32 on {self.COM_PORT}")
-                return
-            except (serial.SerialException, OSError) as e:
-                self.logger.error(f"Failed to connect to {port}: {e}")
+        if result is None:
+            # Retried every few hundred ms, only report the first failure
+            if not self._port_warning_logged:
+                self.logger.warning("No ESP32 ports found" if not candidates
+                                    else f"No ESP32 answered on {[p.device for p in candidates]}")
+                self._port_warning_logged = True
+            return False
+
+        result.ser.timeout = 1  # Reads block until data arrives
+        with self.link_lock:
+            self.ser = result.ser
+            if result.port.device != self.COM_PORT:
+                self.failed_baud_rates = set()  # Another board or adapter
+            self.COM_PORT = result.port.device
+            self.port_info = result.port
+            self.link_errors = 0
+            self.firmware = result.firmware
+            self.firmware_version = result.version
+            self.last_frame_digest = None
+            self.last_frame_pixels = None
+            self.protocol_version = 0
+            self.firmware_caps = result.caps
+            self.parser = serial_protocol.FrameParser()
+            self.last_rx_time = time.monotonic()
+            self.connected = True
+        self.port_cache.save(result.port, result.baudrate)
+        self.reconnect_delay = self.RECONNECT_MIN_DELAY
+        self._port_warning_logged = False
+        LINK_BAUD.set(result.baudrate)
+        self.logger.info(f"Connected to ESP32 on {self.COM_PORT} at {result.baudrate} baud "
+                         f"(firmware: {self.firmware or 'unknown'} {self.firmware_version or ''}, "
+                         f"capabilities: {sorted(self.firmware_caps)})")
+
+        # Request binary telemetry (old firmware ignores this and keeps
+        # sending text) and ask which frame it is showing right away
+        self._write(f"PROTO {serial_protocol.PROTOCOL_VERSION}\n".encode())
+        self._write(b'PING\n')
+        return True
 
     def _check_connection(self):
-        """Verify active serial connection."""
+        """Verify the link from heartbeat timestamps, pinging only when idle."""
         if not self.ser or not self.ser.is_open:
-            self.connected = False
+            with self.link_lock:
+                self.connected = False
             return
 
-        try:
-            # Send a ping and check response
-            self.ser.reset_input_buffer()
-            self.ser.write(b'PING\n')
+        silence = time.monotonic() - self.last_rx_time
+        if silence > self.HEARTBEAT_TIMEOUT:
+            self.logger.warning(f"No data from ESP32 for {silence:.1f} s, reconnecting")
+            self._drop_connection()
+            return
 
-        except Exception as e:
-            self.logger.error(f"Connection verification failed: {e}")
-            self.connected = False
+        if self.link_errors >= self.LINK_ERROR_LIMIT and self.ser.baudrate != self.BAUD_RATE:
+            self._step_down_baud()
+            return
 
-    def _read_data_thread(self):
-        """Read serial data continuously."""
-        while not self.stop_event.is_set():
+        if silence > self.PING_INTERVAL:
             try:
-                # Wait for connection to be established
-                self.connection_event.wait(timeout=5)
+                # The read thread refreshes last_rx_time on the ALIVE response
+                self._write(b'PING\n')
+            except Exception as e:
+                self.logger.error(f"Connection verification failed: {e}")
+                self._drop_connection()
 
-                if self.connected and self.ser and self.ser.is_open:
-                    data = self._read_serial_data()
-                    if data and data[0] == "ALIVE":
-                        self.connected = True
-                    elif data and len(data) == self.total_no_of_switches_sliders:
-                        self.data = data
-                        ### PROCESSING RECEIVED DATA FOR BUTTONS AND SWITCHES
-                        ### IS DONE IN MAIN.PY FILE
+    def negotiate_baud(self):
+        """Move the link to the fastest rate both ends support that passes the
+        loopback test. Stays at the current rate if none does."""
+        if "BAUD" not in self.firmware_caps or not self.connected:
+            return False
 
-                    else:
-                        self.data = []
+        with self.link_lock:
+            self._drain_transfer_replies()
+            self._write(b"BAUDS\n")
+            reply = self._wait_transfer_reply("BAUDS", timeout=0.5)
+            if not reply:
+                return False
+            supported = {int(rate) for rate in reply.split()[1:] if rate.isdigit()}
 
-                time.sleep(0.01)
+            current = self.ser.baudrate
+            for rate in self.baud_rates:
+                if rate <= current or rate not in supported or rate in self.failed_baud_rates:
+                    continue
+                if self._switch_baud(rate):
+                    return True
+                self.failed_baud_rates.add(rate)
+        return False
 
-            except Exception as e:
-                self.logger.error(f"Data reading error: {e}")
-                self.connected = False
-                time.sleep(1)
+    def _step_down_baud(self):
+        """Transfers keep failing at this rate, fall back to the next slower one."""
+        with self.link_lock:
+            current = self.ser.baudrate
+            self.failed_baud_rates.add(current)
+            self.logger.warning(f"{self.link_errors} failed transfers at {current} baud, slowing down")
+            self.link_errors = 0
+            self._drain_transfer_replies()
+            for rate in self.baud_rates + [self.BAUD_RATE]:
+                if rate < current and rate not in self.failed_baud_rates and self._switch_baud(rate):
+                    return
+        self._drop_connection()
+
+    def _switch_baud(self, rate):
+        """Switch both ends to rate and verify it with a loopback test. On any
+        failure the host goes back to the old rate once the firmware has.
+        The caller holds link_lock."""
+        old_rate = self.ser.baudrate
+        self._write(f"BAUD {rate}\n".encode())
+        if not self._wait_transfer_reply(f"BAUD {rate} OK", timeout=0.5):
+            return False
+
+        switch_time = time.monotonic()
+        self.ser.baudrate = rate
+        test = os.urandom(serial_protocol.LOOP_TEST_BYTES).hex()
+        self._write(f"LOOP {test}\n".encode())
+        reply = self._wait_transfer_reply("LOOP", timeout=0.5)
+        if reply == f"LOOP {test}":
+            self._write(b"BAUD COMMIT\n")
+            if self._wait_transfer_reply("BAUD COMMIT OK", timeout=0.5):
+                self.port_cache.save(self.port_info, rate)
+                LINK_BAUD.set(rate)
+                self.logger.info(f"Link speed {old_rate} -> {rate} baud")
+                return True
+
+        # Let the firmware time out and restore the old rate, then follow it
+        self.logger.warning(f"Loopback test failed at {rate} baud, staying at {old_rate}")
+        remaining = switch_time + serial_protocol.BAUD_COMMIT_TIMEOUT + 0.05 - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        self.ser.baudrate = old_rate
+        LINK_BAUD.set(old_rate)
+        self.parser = serial_protocol.FrameParser()
+        self.last_rx_time = time.monotonic()
+        return False
+
+    def _drain_transfer_replies(self):
+        # Forget replies left over from an earlier, abandoned exchange
+        while not self.transfer_replies.empty():
+            self.transfer_replies.get_nowait()
+
+    def _drop_connection(self):
+        """Close the port so the connection manager reconnects. Called on the
+        read and io executors, never with link_lock held."""
+        with self.link_lock:
+            self.connected = False
+            self.reconnects += 1
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+        RECONNECTS.inc()
+        self.reconnect_delay = self.RECONNECT_MIN_DELAY
 
     def _read_serial_data(self):
-        """Read and parse serial data."""
+        """Block until data arrives (or the port timeout passes), then parse
+        everything received into messages.
+
+        Text lines come back as a list of '|' separated fields, binary
+        telemetry frames as a tuple of ints.
+        """
+        messages = []
         try:
-            if self.ser.in_waiting:
-                raw_data = self.ser.readline()
-                data = raw_data.decode('utf-8', errors='ignore').strip()
-                data = data.split('|')
+            # read() blocks for the first byte, then takes whatever else is waiting
+            data = self.ser.read(max(1, self.ser.in_waiting))
+            if data:
+                self.last_rx_time = time.monotonic()
+                crc_errors = self.parser.crc_errors
+                for event in self.parser.feed(data):
+                    if event[0] == serial_protocol.EVENT_TEXT:
+                        messages.append(event[1].split('|'))
+                    elif event[1] == serial_protocol.TYPE_TELEMETRY:
+                        messages.append(self.parser.decode_telemetry(event[2]))
+                if self.parser.crc_errors != crc_errors:
+                    PARSE_ERRORS.inc(self.parser.crc_errors - crc_errors)
 
-                if data:
-                    return data
+        except Exception as e:
+            if self.stop_event.is_set():
+                return messages  # Port closed by stop()
+            self.logger.error(f"Serial data reading error: {e}")
+            # Let the connection manager reconnect instead of failing every read
+            if self.connected:
+                self._drop_connection()
+        return messages
 
+    def _handle_message(self, data):
+        if isinstance(data, tuple):
+            # Binary telemetry frame
+            if len(data) == self.total_no_of_switches_sliders:
+                self._publish_telemetry(data)
+            else:
+                PARSE_ERRORS.inc()
+            return
+
+        if data[0].startswith("ALIVE"):
+            self._update_frame_digest(data[0])
+        elif data[0].startswith("PROTO"):
+            # PROTO <version> [capabilities...]
+            parts = data[0].split()
+            if len(parts) < 2 or not parts[1].isdigit():
+                PARSE_ERRORS.inc()
+                return
+            self.protocol_version = int(parts[1])
+            self.firmware_caps = set(parts[2:])
+            self.logger.info(f"Using telemetry protocol version {self.protocol_version}, "
+                             f"firmware capabilities: {sorted(self.firmware_caps)}")
+        elif data[0].startswith(self.TRANSFER_REPLIES):
+            self.transfer_replies.put(data[0])
+        elif len(data) == self.total_no_of_switches_sliders:
+            self._publish_telemetry(data)
+            ### PROCESSING RECEIVED DATA FOR BUTTONS AND SWITCHES
+            ### IS DONE IN MAIN.PY FILE
+
+        else:
+            PARSE_ERRORS.inc()
+
+    def _publish_telemetry(self, values):
+        now = time.monotonic()
+        self.telemetry_seq += 1
+        TELEMETRY_FRAMES.inc()
+        frame = TelemetryFrame(self.telemetry_seq, values, now)
+
+        for callback in self.telemetry_callbacks:
+            try:
+                callback(frame)
+            except Exception as e:
+                self.logger.error(f"Telemetry callback error: {e}")
+
+    def add_telemetry_callback(self, callback):
+        """Call callback(frame) wherever messages are dispatched (the event
+        loop, with AsyncSerialTransport) for every telemetry frame."""
+        self.telemetry_callbacks.append(callback)
+
+    def _write(self, data):
+        with self.write_lock:
+            self.ser.write(data)
+
+    def _wait_transfer_reply(self, expected, timeout, errors=True):
+        """Wait for a transfer reply starting with expected. Returns it, or None
+        on timeout or, unless errors is False, if the firmware reported an
+        error first."""
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                reply = self.transfer_replies.get(timeout=remaining)
+            except queue.Empty:
                 return None
 
-        except Exception as e:
-            self.logger.error(f"Serial data reading error: {e}")
-        return None
+            if reply.startswith(expected):
+                wait_histogram = REPLY_WAIT_SECONDS.get(expected)
+                if wait_histogram is not None:
+                    wait_histogram.record(time.monotonic() - start)
+                return reply
+            if reply.startswith("Error") and errors:
+                self.logger.warning(f"ESP32 reported: {reply}")
+                return None
+
+    def _update_frame_digest(self, alive_reply):
+        """Take the displayed frame digest from an 'ALIVE <digest>' reply."""
+        parts = alive_reply.split()
+        if len(parts) > 1:
+            self.last_frame_digest = parts[1]
+
+    def _confirm_displayed(self, frame_digest):
+        """Every chunk was confirmed but DONE never came, which a byte lost
+        on the way back does: ask which frame the ESP32 shows instead."""
+        if frame_digest == "-":
+            return False  # Not reported until a later transfer completes it
+        self.last_frame_digest = None
+        self._write(b"PING\n")
+        deadline = time.monotonic() + self.XFER_ACK_TIMEOUT
+        while time.monotonic() < deadline:
+            # ALIVE replies are handled by the reader
+            if self.last_frame_digest == frame_digest:
+                return True
+            time.sleep(0.01)
+        return False
 
     @staticmethod
-    def _find_esp32_port():
-        """Find available ESP32 USB ports."""
-        ports = serial.tools.list_ports_windows.comports()
-        return [port.device for port in ports if "USB" in str(port.hwid)]
+    def frame_digest(image_data):
+        return hashlib.blake2b(image_data, digest_size=8).hexdigest()
 
     def stop(self):
         """Stop all threads and close connection."""
         self.stop_event.set()
-        self.connection_event.set()
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.logger.info(f"Frame prefetch: {self.prefetch_stats()}")
         # self.media_obj.stop()
         # self.keyboard_handler.key_listener.stop()
         if self.ser and self.ser.is_open:
             self.ser.close()
 
+    @property
+    def renderer(self):
+        if self._renderer is None:
+            with self._renderer_lock:
+                if self._renderer is None:
+                    from frame_renderer import FrameRenderer
+                    self._renderer = FrameRenderer()
+        return self._renderer
+
+    def warm_up(self):
+        """Import the imaging stack and build the renderer ahead of the first frame."""
+        # noinspection PyUnresolvedReferences
+        import frame_diff  # Pulls in NumPy as well
+        return self.renderer
+
     @staticmethod
     def create_jpeg_in_memory(image):
         image_buffer = io.BytesIO()
         image.save(image_buffer, format="JPEG", quality=85)
         image_data = image_buffer.getvalue()
-        print(f"Generated JPEG image size: {len(image_data)} bytes")
+        logging.getLogger(__name__).debug("jpeg encoded bytes=%d", len(image_data))
         return image_data
 
-    @staticmethod
-    def thumbnail_to_jpg(image: Image, text, subtext):
-        # BLUR
-        blur = image
-        blur = blur.filter(ImageFilter.GaussianBlur(radius=5))
-        blur = blur.resize((320, 240))
-        enhancer = ImageEnhance.Brightness(blur)
-        blur = enhancer.enhance(0.5)
-
-        # IMAGE
-        imge = image.resize((140, 140))
-
-        # Create a rounded mask
-        rad = 10  # radius for the rounded corners
-        circle = Image.new('L', (rad * 2, rad * 2), 0)
-        draw = ImageDraw.Draw(circle)
-        draw.ellipse((0, 0, rad * 2 - 1, rad * 2 - 1), fill=255)
-
-        # Create an alpha mask for the image with rounded corners
-        alpha = Image.new('L', imge.size, 255)  # Start with a fully transparent alpha channel
-        w, h = imge.size
-
-        # Paste the circular mask into the four corners
-        alpha.paste(circle.crop((0, 0, rad, rad)), (0, 0))  # Top-left corner
-        alpha.paste(circle.crop((0, rad, rad, rad * 2)), (0, h - rad))  # Bottom-left corner
-        alpha.paste(circle.crop((rad, 0, rad * 2, rad)), (w - rad, 0))  # Top-right corner
-        alpha.paste(circle.crop((rad, rad, rad * 2, rad * 2)), (w - rad, h - rad))  # Bottom-right corner
-
-        imge.putalpha(alpha)  # Apply the alpha mask to the image
-
-        # Position the image onto the blurred background
-        position = (90, 35)
-        blur.paste(imge, position, imge)  # Use the image's alpha channel as a mask
-
-        # FONTS
-        i1 = ImageDraw.Draw(blur)
-        font = ImageFont.truetype('liberation-serif/LiberationSerif-Regular.ttf', 24)
-
-        # Get the bounding box of the text to center it
-        text = text
-        bbox = i1.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-
-        # Calculate the position to center the text
-        x = (blur.width - text_width) // 2
-        y = 176  # Position for the text (can adjust as needed)
-        i1.text((x, y), text, font=font, fill=(255, 255, 255))
-
-        # AUTHOR, SUBTEXT
-        text = subtext
-        font = ImageFont.truetype('liberation-serif/LiberationSerif-Regular.ttf',
-                                  15)
-        bbox = i1.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        x = (blur.width - text_width) // 2
-        y = 205  # Position for the text (can adjust as needed)
-        i1.text((x, y), text, font=font, fill=(255, 255, 255))
-
-        # blur.show()
-
-        return blur
-
-    def send_image_to_esp32(self, image, text, subtext):
+    @classmethod
+    def thumbnail_to_jpg(cls, image, text, subtext):
+        """Compose the display frame with a FrameRenderer shared by all callers."""
+        if cls._shared_renderer is None:
+            from frame_renderer import FrameRenderer
+            cls._shared_renderer = FrameRenderer()
+        return cls._shared_renderer.render(image, text, subtext)
+
+    def _render_key(self, image, text, subtext):
+        return self.render_cache.make_key(thumbnail_digest(image), text, subtext,
+                                          self.RENDER_SETTINGS + (self.codec,))
+
+    def _render_payload(self, image, text, subtext):
+        """Render and encode a frame, returns (payload, render seconds)."""
+        start_time = time.perf_counter()
+        prepared_img = self.renderer.render(image, text, subtext)
+        if self.codec == frame_codec.CODEC_JPEG:
+            image_data = self.create_jpeg_in_memory(prepared_img)
+        else:
+            import numpy as np
+            image_data = frame_codec.encode(np.asarray(prepared_img), self.codec)
+        render_time = time.perf_counter() - start_time
+        RENDER_SECONDS.record(render_time)
+        ENCODED_BYTES.record(len(image_data))
+        return image_data, render_time
+
+    def render_frame(self, image, text, subtext):
+        """Return the encoded payload for a frame, rendering only on a cache miss."""
+        key = self._render_key(image, text, subtext)
+        image_data = self.render_cache.get(key)
+        if image_data is not None:
+            RENDER_CACHE_HITS.inc()
+            with self._prefetch_lock:
+                prefetched = self._prefetched.pop(key, None) is not None
+                if prefetched:
+                    self.prefetch_hits += 1
+            if prefetched:
+                PREFETCH_HITS.inc()
+            self.logger.debug("render cache hit bytes=%d prefetched=%s", len(image_data), prefetched)
+            return image_data
+
+        RENDER_CACHE_MISSES.inc()
+        if self.prefetcher is not None:
+            self.prefetch_misses += 1
+        image_data, render_time = self._render_payload(image, text, subtext)
+        self.render_cache.put(key, image_data, render_time)
+
+        self.logger.debug("render cache miss render_ms=%.1f bytes=%d codec=%s",
+                          render_time * 1000, len(image_data), self.codec)
+        return image_data
+
+    def prefetch_frames(self, requests):
+        """Render frames that are likely to be shown next (e.g. the next and
+        previous queue items) into the render cache in the background.
+        requests are (image, text, subtext) tuples as for submit_image(),
+        nearest first, and replace any earlier set still waiting."""
+        if self.prefetcher is None:
+            if not requests:
+                return
+            self.prefetcher = FramePrefetcher(render=self._prefetch_render,
+                                              discard=self._discard_prefetched)
+        self.prefetcher.prefetch(requests)
+
+    def _prefetch_render(self, request):
+        image, text, subtext = request
+        key = self._render_key(image, text, subtext)
+        if self.render_cache.contains(key):
+            return key
+
+        image_data, render_time = self._render_payload(image, text, subtext)
+        self.render_cache.put(key, image_data, render_time)
+        with self._prefetch_lock:
+            self._prefetched[key] = render_time
+            self.prefetch_renders += 1
+        PREFETCH_RENDERS.inc()
+        self.logger.debug("prefetched frame render_ms=%.1f bytes=%d", render_time * 1000, len(image_data))
+        return key
+
+    def _discard_prefetched(self, keys):
+        # The queue moved on and these frames were never shown
+        with self._prefetch_lock:
+            for key in keys:
+                render_time = self._prefetched.pop(key, None)
+                if render_time is None:
+                    continue
+                self.prefetch_wasted += 1
+                self.prefetch_wasted_time += render_time
+                PREFETCH_WASTED.inc()
+                PREFETCH_WASTED_SECONDS.inc(render_time)
+
+    def prefetch_stats(self):
+        """Prefetch effectiveness: hit_rate is the share of frames shown that
+        were ready ahead of time, waste_rate the share of prefetched frames
+        that were never shown."""
+        with self._prefetch_lock:
+            shown = self.prefetch_hits + self.prefetch_misses
+            return {
+                "rendered": self.prefetch_renders,
+                "hits": self.prefetch_hits,
+                "misses": self.prefetch_misses,
+                "wasted": self.prefetch_wasted,
+                "pending": len(self._prefetched),
+                "hit_rate": self.prefetch_hits / shown if shown else 0.0,
+                "waste_rate": self.prefetch_wasted / self.prefetch_renders if self.prefetch_renders else 0.0,
+                "wasted_ms": self.prefetch_wasted_time * 1000,
+            }
+
+    def submit_image(self, image, text, subtext):
+        """Hand a frame to the render/send pipeline without blocking the caller."""
+        self.frame_pipeline.submit((image, text, subtext))
+
+    def transmit_frame(self, image_data):
         """
-        Send image to ESP32 with more robust communication.
+        Send an encoded frame to ESP32 with more robust communication.
+        Returns True once the ESP32 shows the frame, None if the full quality
+        pass after a preview was abandoned for a newer frame.
         """
+        start_time = time.monotonic()
+        with self.link_lock:
+            self._sending_payload = image_data
+            self._transfer_start = start_time
+            try:
+                ok = self._transmit_frame(image_data)
+            finally:
+                self._sending_payload = None
+            if ok is None:
+                # Superseded, not a link problem
+                self.cancelled_transfers += 1
+            else:
+                # Repeated failures make the connection manager lower the link speed
+                self.link_errors = 0 if ok else self.link_errors + 1
+        if ok is None:
+            TRANSFER_CANCELLED.inc()
+            return None
+        if ok:
+            TRANSFER_SECONDS.record(time.monotonic() - start_time)
+        else:
+            TRANSFER_FAILURES.inc()
+        return ok
+
+    def _transmit_frame(self, image_data):
         if not self.connected or not self.ser or not self.ser.is_open:
             self.logger.warning("Serial connection not ready for image sending")
-            return
+            return False
 
         try:
-            # Prepare and send image
-            prepared_img = self.thumbnail_to_jpg(image, text, subtext)
-            image_data = self.create_jpeg_in_memory(prepared_img)
+            # Codecs the firmware cannot decode are sent as JPEG instead
+            codec = frame_codec.unpack(image_data)[0]
+            if codec != frame_codec.CODEC_JPEG and self.CODEC_CAPS[codec] not in self.firmware_caps:
+                image_data = frame_codec.encode(frame_codec.decode(image_data), frame_codec.CODEC_JPEG)
+
+            # Skip frames the ESP32 is already showing
+            digest = self.frame_digest(image_data)
+            if digest == self.last_frame_digest:
+                self.skipped_frames += 1
+                TRANSFER_SKIPPED.inc()
+                self.logger.debug("frame already on display digest=%s skipped=%d",
+                                  digest, self.skipped_frames)
+                return True
+
+            self._drain_transfer_replies()
 
-            # Send image size
+            if "RECT" in self.firmware_caps:
+                return self._transmit_partial(image_data, digest)
+            if "CHUNK" in self.firmware_caps:
+                return self._transmit_full(image_data, digest)
+
+            # Announce the frame digest, then send image size
             image_size = len(image_data)
-            self.ser.write(struct.pack("<I", image_size))
-            print(f"Sending image size: {image_size} bytes")
+            with self.write_lock:
+                self.ser.write(f"FRAME {digest}\n".encode())
+                self.ser.write(struct.pack("<I", image_size))
+            self.logger.debug("legacy transfer digest=%s bytes=%d", digest, image_size)
 
             # Wait for acknowledgment (with timeout)
-            start_time = time.time()
-            ack_received = False
-            while time.time() - start_time < 5:
-                if self.ser.in_waiting:
-                    ack = self.ser.readline().decode('utf-8', errors='ignore').strip()
-                    # print(f"Received acknowledgment: '{ack}'")
-                    if "ACK" in ack:
-                        ack_received = True
-                        break
-
-            if not ack_received:
-                print("No acknowledgment received")
-                return
+            if not self._wait_transfer_reply("ACK", timeout=5):
+                self.logger.warning("No acknowledgment received")
+                return False
 
             # Send image data
-            print("Sending image data...")
-            self.ser.write(image_data)
-
-            # Wait for done signal (with timeout)
-            done_start_time = time.time()
-            done_received = False
-            while time.time() - done_start_time < 4:
-                if self.ser.in_waiting:
-                    done = self.ser.readline().decode('utf-8', errors='ignore').strip()
-                    # print(f"Received done signal: '{done}'")
-                    if "DONE" in done:
-                        done_received = True
-                        print("Image sent successfully!")
-                        break
-
-            if not done_received:
-                print("No 'DONE' signal received")
+            self._write(image_data)
+
+            # Wait for done signal, allowing for the time left on the wire
+            wire_time = image_size * 10 / self.ser.baudrate
+            if not self._wait_transfer_reply("DONE", timeout=4 + wire_time):
+                self.logger.warning("No 'DONE' signal received")
+                return False
+
+            self.last_frame_digest = digest
+            self.logger.debug("frame shown digest=%s", digest)
+            return True
 
         except Exception as e:
             self.logger.error(f"Image sending error: {e}")
+            return False
+
+    def _transmit_partial(self, image_data, digest):
+        """
+        Send only the tiles that differ from what is on screen, each as its
+        own small JPEG drawn at its offset. Falls back to the full frame when
+        the screen contents are unknown or most of it changed.
+
+        Tiles below the diff threshold are not sent, so after a partial update
+        the screen is only close to the frame: it gets a digest of its own
+        (the frame digest with PARTIAL_SUFFIX) and only a full frame makes
+        the ESP32 report the frame digest itself.
+        """
+        import frame_diff
+
+        pixels = frame_diff.decode_frame(image_data)
+        rects = None
+        if self.last_frame_pixels is not None \
+                and self.last_frame_pixels_digest == self.last_frame_digest:
+            rects = frame_diff.diff_rects(self.last_frame_pixels, pixels)
+
+        if rects is None:
+            ok = self._transmit_full(image_data, digest, pixels)
+            if ok:
+                self.last_frame_pixels = pixels
+                self.last_frame_pixels_digest = digest
+            else:
+                self.last_frame_pixels = None
+            return ok
+
+        if not rects:
+            # Nothing on screen is far enough off to be worth sending
+            return True
+
+        screen = self.last_frame_pixels.copy()
+        screen_digest = digest + self.PARTIAL_SUFFIX
+        sent_bytes = 0
+        for i, rect in enumerate(rects):
+            rect_data = frame_diff.encode_rect(pixels, rect, frame_codec.unpack(image_data)[0])
+            sent_bytes += len(rect_data)
+            # Only the last rectangle completes the update on the ESP32
+            frame_digest = screen_digest if i == len(rects) - 1 else "-"
+            if not self._transmit_chunked(rect_data, self.frame_digest(rect_data),
+                                          x=rect[0], y=rect[1], frame_digest=frame_digest):
+                self.last_frame_pixels = None
+                return False
+            # What the ESP32 now shows there, encoding losses included
+            x, y, w, h = rect
+            screen[y:y + h, x:x + w] = frame_codec.decode(rect_data)
+
+        self.last_frame_pixels = screen
+        self.last_frame_pixels_digest = screen_digest
+        self.partial_updates += 1
+        self.logger.debug("partial update regions=%d bytes=%d full_bytes=%d",
+                          len(rects), sent_bytes, len(image_data))
+        return True
+
+    def _transfer_superseded(self):
+        pipeline = self.frame_pipeline
+        return pipeline is not None and pipeline.newer_pending(self._sending_payload)
+
+    def _render_preview(self, image_data, pixels=None):
+        """The frame at 1/PREVIEW_SCALE size as a low quality JPEG, or None
+        if the frame is small enough to go without a preview."""
+        import numpy as np
+        from PIL import Image
+
+        if pixels is None:
+            pixels = frame_codec.decode(image_data)
+        small = Image.fromarray(pixels).reduce(self.PREVIEW_SCALE)
+        preview = frame_codec.encode(np.asarray(small), frame_codec.CODEC_JPEG,
+                                     quality=self.PREVIEW_QUALITY)
+        if len(preview) * self.PREVIEW_MIN_RATIO > len(frame_codec.unpack(image_data)[3]):
+            return None
+        return preview
+
+    def _transmit_full(self, image_data, digest, pixels=None):
+        """
+        Send a whole frame. With progressive frames, a preview goes first so
+        the screen follows a track change within a fraction of the full
+        transfer time. The full quality pass is then abandoned (returning
+        None) as soon as the pipeline holds a newer frame, leaving the
+        preview on screen until that one arrives.
+        """
+        if not self.progressive or "SCALE" not in self.firmware_caps:
+            return self._transmit_chunked(image_data, digest)
+
+        preview = self._render_preview(image_data, pixels)
+        if preview is None:
+            return self._transmit_chunked(image_data, digest)
+
+        # The screen shows no complete frame until the full pass is done
+        if not self._transmit_chunked(preview, self.frame_digest(preview), frame_digest="-",
+                                      scale=self.PREVIEW_SCALE):
+            return False
+        self.previews_sent += 1
+        self.last_preview_digest = digest
+        PREVIEW_SECONDS.record(time.monotonic() - self._transfer_start)
+        self.logger.debug("preview shown digest=%s bytes=%d full_bytes=%d",
+                          digest, len(preview), len(image_data))
+        return self._transmit_chunked(image_data, digest, cancel=self._transfer_superseded)
+
+    def _transmit_chunked(self, image_data, digest, x=0, y=0, frame_digest=None, scale=1,
+                          cancel=None):
+        """
+        Send a frame as CRC checked chunks with a sliding window of unacknowledged
+        chunks. Bad or lost chunks are retransmitted individually, and a frame
+        that was cut off resumes from the first chunk the ESP32 is missing.
+
+        x, y place the image on screen. frame_digest is what the ESP32 reports as
+        its displayed frame afterwards (defaults to digest, "-" for a region
+        that does not complete a frame). scale enlarges a JPEG on screen.
+        cancel() is checked while chunks are left to send; once it returns
+        True the transfer stops and None is returned. (With every chunk in
+        flight the ESP32 completes the frame anyway, so it is let finish.)
+        """
+        if frame_digest is None:
+            frame_digest = digest
+        codec, width, height, payload = frame_codec.unpack(image_data)
+        chunk_size = serial_protocol.CHUNK_SIZE
+        image_size = len(payload)
+        total_chunks = (image_size + chunk_size - 1) // chunk_size
+        view = memoryview(payload)
+
+        scale_field = f" {scale}" if scale != 1 else ""
+        xfer = (f"XFER {digest} {image_size} {chunk_size} {x} {y} {frame_digest} "
+                f"{codec} {width} {height}{scale_field}\n").encode()
+        reply = None
+        for _ in range(self.XFER_ATTEMPTS):
+            self._write(xfer)
+            reply = self._wait_transfer_reply("ACK", timeout=self.XFER_ACK_TIMEOUT)
+            if reply:
+                break
+        if not reply:
+            self.logger.warning("No acknowledgment received")
+            return False
+
+        parts = reply.split()
+        resume_offset = int(parts[1]) if len(parts) > 1 else 0
+        if resume_offset:
+            self.logger.info(f"Resuming frame {digest} at offset {resume_offset}")
+
+        # Time for a full window to cross the wire, plus slack for the ESP32
+        chunk_wire_time = (chunk_size + serial_protocol.CHUNK_HEADER.size) * 10 / self.ser.baudrate
+        chunk_timeout = chunk_wire_time * serial_protocol.CHUNK_WINDOW + 0.5
+        max_retries = 5
+
+        pending = list(range(resume_offset // chunk_size, total_chunks))
+        pending.reverse()  # pop() from the end sends in order
+        in_flight = {}  # seq -> time sent
+        retries = {}
+        fast_retransmitted = set()
+
+        def send_chunk(chunk_seq):
+            start = chunk_seq * chunk_size
+            self._write(serial_protocol.encode_chunk(chunk_seq, view[start:start + chunk_size]))
+            in_flight[chunk_seq] = time.monotonic()
+
+        def retransmit(chunk_seq, counted=True):
+            if counted:
+                retries[chunk_seq] = retries.get(chunk_seq, 0) + 1
+                if retries[chunk_seq] > max_retries:
+                    return False
+                fast_retransmitted.discard(chunk_seq)
+            self.retransmitted_chunks += 1
+            RETRANSMITTED_CHUNKS.inc()
+            send_chunk(chunk_seq)
+            return True
+
+        self.logger.debug("chunked transfer digest=%s bytes=%d chunks=%d x=%d y=%d",
+                          digest, image_size, total_chunks, x, y)
+        while pending or in_flight:
+            if pending and cancel is not None and cancel():
+                self.logger.debug("chunked transfer abandoned digest=%s", digest)
+                return None
+            while pending and len(in_flight) < serial_protocol.CHUNK_WINDOW:
+                send_chunk(pending.pop())
+
+            try:
+                reply = self.transfer_replies.get(timeout=chunk_wire_time + 0.05)
+            except queue.Empty:
+                reply = None
+
+            if reply:
+                kind, _, arg = reply.partition(" ")
+                # DONE can only answer this transfer once every chunk is out.
+                # ACK and errors belong to other exchanges (a FRAME line the
+                # ESP32 found in noise), nothing here is answered with them.
+                if kind == "DONE" and not pending:
+                    break
+                if kind in ("CACK", "CNAK") and arg.isdigit():
+                    seq = int(arg)
+                    if seq not in in_flight:
+                        continue  # Late reply for a chunk already retransmitted
+                    sent_time = in_flight[seq]
+                    if kind == "CACK":
+                        del in_flight[seq]
+                    elif not retransmit(seq):
+                        self.logger.warning(f"Chunk {seq} failed too often, abandoning frame")
+                        return False
+
+                    # The ESP32 answers chunks in the order they arrive, so a
+                    # chunk sent earlier that is still unanswered was lost.
+                    # Only once per transmission, after that the timeout
+                    # decides. A short chunk swallows the start of the one
+                    # behind it, so these do not count against max_retries.
+                    for lost_seq, lost_time in list(in_flight.items()):
+                        if lost_time < sent_time and lost_seq not in fast_retransmitted:
+                            fast_retransmitted.add(lost_seq)
+                            retransmit(lost_seq, counted=False)
+                else:
+                    self.logger.debug("ignoring reply during chunked transfer: %s", reply)
+
+            # Retransmit chunks whose acknowledgment never came
+            now = time.monotonic()
+            for seq, sent_time in list(in_flight.items()):
+                if now - sent_time > chunk_timeout and not retransmit(seq):
+                    self.logger.warning(f"Chunk {seq} timed out too often, abandoning frame")
+                    return False
+        else:
+            # Every chunk confirmed, DONE follows once the frame is decoded
+            if not self._wait_transfer_reply("DONE", timeout=4, errors=False) \
+                    and not self._confirm_displayed(frame_digest):
+                self.logger.warning("No 'DONE' signal received")
+                self.last_frame_digest = None
+                return False
+
+        self.last_frame_digest = frame_digest if frame_digest != "-" else None
+        self.logger.debug("chunked transfer done digest=%s", digest)
+        return True
+
+
+class AsyncSerialTransport:
+    """Drives a SerialConnection from an asyncio event loop.
+
+    Blocking port calls run on two single-thread executors, one for reads
+    and one for connecting, link speed changes and pings, so the event loop
+    never blocks on the port. Those executors (and the frame sender) change
+    the connection state under serial_obj.link_lock. Messages are dispatched
+    on the loop thread, which only records what the firmware reported (ALIVE
+    and PROTO replies) and never waits for link_lock, since a transfer holds
+    it for seconds. Telemetry frames are delivered through an asyncio.Queue.
+    """
+
+    def __init__(self, serial_obj, telemetry_queue_size=256):
+        self.serial_obj = serial_obj
+        self.logger = serial_obj.logger
+
+        self.telemetry = asyncio.Queue(maxsize=telemetry_queue_size)
+        self.connected_event = asyncio.Event()
+
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="serial-read")
+        self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="serial-io")
+
+        serial_obj.add_telemetry_callback(self._on_telemetry)
+
+    def _on_telemetry(self, frame):
+        # Called from _handle_message, i.e. on the loop thread
+        while True:
+            try:
+                self.telemetry.put_nowait(frame)
+                return
+            except asyncio.QueueFull:
+                self.telemetry.get_nowait()
+                self.serial_obj.dropped_telemetry += 1
+                TELEMETRY_DROPPED.inc()
+
+    def _is_open(self):
+        ser = self.serial_obj.ser
+        return self.serial_obj.connected and ser is not None and ser.is_open
+
+    async def run_connection(self):
+        """Connect, then watch the heartbeat, reconnecting with backoff as needed."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.serial_obj.connected:
+                self.connected_event.clear()
+                if await loop.run_in_executor(self._io_executor, self.serial_obj._start_connection):
+                    # The reader has to run for the negotiation replies
+                    self.connected_event.set()
+                    await loop.run_in_executor(self._io_executor, self.serial_obj.negotiate_baud)
+            else:
+                await loop.run_in_executor(self._io_executor, self.serial_obj._check_connection)
+
+            if self._is_open():
+                self.connected_event.set()
+            await asyncio.sleep(self.serial_obj.connection_delay())
+
+    async def run_reader(self):
+        """Read and dispatch messages while connected."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.connected_event.wait()
+            if not self._is_open():
+                self.connected_event.clear()
+                continue
+
+            messages = await loop.run_in_executor(self._read_executor,
+                                                  self.serial_obj._read_serial_data)
+            for data in messages:
+                self.serial_obj._handle_message(data)
 
+    async def write(self, data):
+        await asyncio.get_running_loop().run_in_executor(
+            self._io_executor, self.serial_obj._write, data)
 
-# def main():
-#     serial_obj = SerialConnection()
-#     # Keep the main thread running
-#     try:
-#         while True:
-#             time.sleep(1)
-#     except KeyboardInterrupt:
-#         print("Stopping...")
-#     finally:
-#         serial_obj.stop()
-#
-#
-# if __name__ == "__main__":
-#     main()
\ No newline at end of file
+    def close(self):
+        self._read_executor.shutdown(wait=False, cancel_futures=True)
+        self._io_executor.shutdown(wait=False, cancel_futures=True)
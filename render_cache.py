@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def thumbnail_digest(image):
+    """Content hash of a PIL image, independent of where it was loaded from."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+class RenderCache:
+    """Bounded LRU cache of finished frame payloads with an optional on-disk tier.
+
+    Keys are built from the thumbnail content hash, the title/artist text and the
+    render settings, so a change to any of them produces a fresh render.
+    """
+
+    def __init__(self, max_entries=32, disk_dir=None, max_disk_entries=256):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.render_time_total = 0.0  # Seconds spent rendering on misses
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(digest, text, subtext, settings):
+        h = hashlib.blake2b(digest_size=16)
+        for part in (digest, text, subtext, repr(settings)):
+            h.update(str(part).encode("utf-8", errors="replace"))
+            h.update(b"\x00")
+        return h.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def get(self, key):
+        """Return the cached payload for key, or None on a miss."""
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    payload = f.read()
+            except OSError:
+                payload = None
+
+            if payload:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, payload)
+                return payload
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def contains(self, key):
+        """True if key is cached in memory or on disk. Counts as neither hit nor miss."""
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._disk_path(key))
+
+    def put(self, key, payload, render_time=0.0):
+        """Store a freshly rendered payload (and its render cost in seconds)."""
+        with self._lock:
+            self.render_time_total += render_time
+            self._store(key, payload)
+
+        if self.disk_dir:
+            try:
+                tmp_path = self._disk_path(key) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._disk_path(key))
+                self._prune_disk()
+            except OSError:
+                pass
+
+    def _store(self, key, payload):
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self):
+        files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir)
+                 if name.endswith(".bin")]
+        if len(files) <= self.max_disk_entries:
+            return
+
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """Hit/miss counters plus an estimate of the render time saved."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            avg_render = self.render_time_total / self.misses if self.misses else 0.0
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "avg_render_ms": avg_render * 1000,
+                "saved_ms": (self.hits + self.disk_hits) * avg_render * 1000,
+            }
@@ -0,0 +1,164 @@
+import binascii
+import struct
+
+# Binary frame layout (all multi-byte fields little-endian):
+#
+#   SYNC | VERSION | TYPE | LENGTH | PAYLOAD (LENGTH bytes) | CRC16
+#
+# CRC16 is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over VERSION..PAYLOAD.
+# Text lines (ACK, DONE, ALIVE, ...) are still sent as ASCII and may be
+# interleaved with binary frames; they can never contain the SYNC byte.
+SYNC = 0xA5
+PROTOCOL_VERSION = 1
+
+TYPE_TELEMETRY = 0x01  # NUM_SLIDERS x uint16 ADC readings
+
+# Chunked image transfer (host -> ESP32):
+#
+#   XFER <digest> <size> <chunk size>\n          -> ACK <resume offset>
+#   CHUNK_SYNC | SEQ | LENGTH | CRC16 | PAYLOAD   -> CACK <seq> or CNAK <seq>
+#
+# SEQ, LENGTH and CRC16 are uint16, CRC16 covers SEQ, LENGTH and PAYLOAD.
+# The firmware answers DONE once every chunk has arrived and is displayed.
+# The full XFER line is
+#
+#   XFER <digest> <size> <chunk size> <x> <y> <frame digest> <codec> <w> <h> [<scale>]
+#
+# and firmware with the SCALE capability draws a JPEG sent with scale 2, 4
+# or 8 that many times larger, for low resolution previews.
+CHUNK_SYNC = 0xC5
+CHUNK_SIZE = 512
+CHUNK_WINDOW = 4
+CHUNK_HEADER = struct.Struct("<BHHH")
+CHUNK_SEQ_LEN = struct.Struct("<HH")
+
+# Port probe: the host sends "PROBE" then "PING". Current firmware answers
+#
+#   HELLO <firmware name> <firmware version> <capabilities...>
+#
+# before the ALIVE reply, older firmware only answers ALIVE.
+PROBE_REQUEST = b"PROBE\nPING\n"
+FIRMWARE_NAME = "esp32-media-display"
+
+# Link speed negotiation (firmware capability BAUD), starting at BASE_BAUD_RATE:
+#
+#   BAUDS\n           -> BAUDS <supported rates>
+#   BAUD <rate>\n     -> BAUD <rate> OK (at the old rate), both ends switch
+#   LOOP <hex>\n      -> LOOP <hex> echoed at the new rate
+#   BAUD COMMIT\n     -> BAUD COMMIT OK
+#
+# The firmware returns to the old rate unless COMMIT arrives within
+# BAUD_COMMIT_TIMEOUT seconds of the switch.
+BASE_BAUD_RATE = 115200
+BAUD_COMMIT_TIMEOUT = 1.0
+LOOP_TEST_BYTES = 192
+
+HEADER = struct.Struct("<BBBB")
+CRC = struct.Struct("<H")
+MAX_TEXT_LINE = 256
+
+# Events returned by FrameParser.feed()
+EVENT_TEXT = "text"
+EVENT_FRAME = "frame"
+
+
+def crc16(data, crc=0xFFFF):
+    return binascii.crc_hqx(data, crc)
+
+
+def encode_frame(frame_type, payload, version=PROTOCOL_VERSION):
+    body = bytes((version, frame_type, len(payload))) + bytes(payload)
+    return bytes((SYNC,)) + body + CRC.pack(crc16(body))
+
+
+def encode_telemetry(values):
+    return encode_frame(TYPE_TELEMETRY, struct.pack(f"<{len(values)}H", *values))
+
+
+def encode_chunk(seq, payload):
+    crc = crc16(payload, crc16(CHUNK_SEQ_LEN.pack(seq, len(payload))))
+    return CHUNK_HEADER.pack(CHUNK_SYNC, seq, len(payload), crc) + bytes(payload)
+
+
+class FrameParser:
+    """Incremental parser for a byte stream mixing binary frames and text lines.
+
+    feed() returns a list of (EVENT_TEXT, str) and (EVENT_FRAME, type, payload)
+    tuples. Binary payloads are memoryview slices of an immutable copy, so
+    decoding them with struct allocates no intermediate strings.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.crc_errors = 0
+        self.frames = 0
+        self._telemetry_structs = {}
+
+    def feed(self, data):
+        self._buf += data
+        events = []
+        buf = self._buf
+        pos = 0
+        end = len(buf)
+
+        while pos < end:
+            if buf[pos] == SYNC:
+                if end - pos < HEADER.size:
+                    break
+                _, version, frame_type, length = HEADER.unpack_from(buf, pos)
+                if version != PROTOCOL_VERSION:
+                    # Not a frame header, resynchronise on the next byte
+                    self.crc_errors += 1
+                    pos += 1
+                    continue
+
+                frame_end = pos + HEADER.size + length + CRC.size
+                if frame_end > end:
+                    break
+
+                (received_crc,) = CRC.unpack_from(buf, frame_end - CRC.size)
+                body = bytes(buf[pos + 1:frame_end - CRC.size])
+                if crc16(body) != received_crc:
+                    # Corrupted frame, resynchronise on the next byte
+                    self.crc_errors += 1
+                    pos += 1
+                    continue
+
+                self.frames += 1
+                events.append((EVENT_FRAME, frame_type, memoryview(body)[3:]))
+                pos = frame_end
+            else:
+                newline = buf.find(b"\n", pos)
+                sync = buf.find(bytes((SYNC,)), pos)
+                if newline == -1 or (sync != -1 and sync < newline):
+                    if sync != -1:
+                        # Garbage before a frame: discard it
+                        pos = sync
+                        continue
+                    if end - pos > MAX_TEXT_LINE:
+                        pos = end
+                    break
+
+                line = buf[pos:newline].decode("utf-8", errors="ignore").strip()
+                if line:
+                    events.append((EVENT_TEXT, line))
+                pos = newline + 1
+
+        del buf[:pos]
+        return events
+
+    def decode_telemetry(self, payload):
+        """Unpack a telemetry payload into a tuple of ints."""
+        count = len(payload) // 2
+        unpacker = self._telemetry_structs.get(count)
+        if unpacker is None:
+            unpacker = self._telemetry_structs[count] = struct.Struct(f"<{count}H")
+        return unpacker.unpack_from(payload)
+
+
+def parse_hello(line):
+    """Split a HELLO reply into (firmware name, version, set of capabilities)."""
+    parts = line.split()
+    if len(parts) < 3 or parts[0] != "HELLO":
+        return None
+    return parts[1], parts[2], set(parts[3:])
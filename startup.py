@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+
+
+class StartupOrchestrator:
+    """Initialises subsystems concurrently instead of one after another.
+
+    Each step is a plain function (run on a worker thread, so blocking
+    imports and driver calls overlap) or a coroutine function (run on the
+    loop). A step starts as soon as the steps it depends on are ready, and
+    signals its own readiness through an asyncio.Event, so nothing waits
+    on fixed sleeps. Step results end up in results[name].
+
+    Times are measured from start_time (perf_counter, default: creation),
+    including the time to the first input sample handled and the first
+    frame shown.
+    """
+
+    def __init__(self, start_time=None):
+        self.logger = logging.getLogger(__name__)
+        self.start_time = time.perf_counter() if start_time is None else start_time
+
+        self._steps = {}  # name -> (init, dependencies)
+        self._ready = {}  # name -> asyncio.Event, created on the loop
+        self.results = {}
+        self.failed = set()
+        self.timings = {}  # name -> (started, finished) in ms since start_time
+
+        self.first_input_ms = None
+        self.first_frame_ms = None
+
+    def _elapsed_ms(self):
+        return (time.perf_counter() - self.start_time) * 1000
+
+    def add(self, name, init, after=()):
+        """Register init() as step name, to run once all steps in after are ready."""
+        self._steps[name] = (init, tuple(after))
+
+    def ready_event(self, name):
+        """asyncio.Event set once step name (or milestone name) is ready."""
+        event = self._ready.get(name)
+        if event is None:
+            event = self._ready[name] = asyncio.Event()
+        return event
+
+    async def run(self):
+        """Run every registered step, returns when all have finished or failed."""
+        for name in self._steps:
+            self.ready_event(name)
+        await asyncio.gather(*(self._run_step(name) for name in self._steps))
+
+    async def _run_step(self, name):
+        init, after = self._steps[name]
+        for dependency in after:
+            await self.ready_event(dependency).wait()
+            if dependency in self.failed:
+                self.logger.error(f"Startup step {name} skipped, {dependency} failed")
+                self.failed.add(name)
+                self.ready_event(name).set()
+                return
+
+        started = self._elapsed_ms()
+        try:
+            if asyncio.iscoroutinefunction(init):
+                self.results[name] = await init()
+            else:
+                self.results[name] = await asyncio.to_thread(init)
+        except Exception as e:
+            self.logger.error(f"Startup step {name} failed: {e}")
+            self.failed.add(name)
+
+        self.timings[name] = (started, self._elapsed_ms())
+        self.ready_event(name).set()
+
+    def mark_first_input(self):
+        if self.first_input_ms is None:
+            self.first_input_ms = self._elapsed_ms()
+            self.logger.info(f"First input handled after {self.first_input_ms:.0f} ms")
+
+    def mark_first_frame(self):
+        if self.first_frame_ms is None:
+            self.first_frame_ms = self._elapsed_ms()
+            self.logger.info(f"First frame shown after {self.first_frame_ms:.0f} ms")
+
+    def report(self):
+        return {
+            "steps_ms": {name: round(end - start, 1) for name, (start, end) in self.timings.items()},
+            "ready_ms": round(max((end for _, end in self.timings.values()), default=0.0), 1),
+            "first_input_ms": self.first_input_ms,
+            "first_frame_ms": self.first_frame_ms,
+            "failed": sorted(self.failed),
+        }
@@ -0,0 +1,141 @@
+import numpy as np
+
+import frame_codec
+import pyserial
+from serial_protocol import CHUNK_HEADER, CHUNK_SIZE
+
+
+class FakeFirmware:
+    """Port stand-in that answers XFER lines and chunks like the ESP32.
+
+    Replies go straight to the connection's transfer_replies, as the reader
+    would deliver them. on_chunk(seq, attempt) decides the answer to each
+    chunk: "CACK", "CNAK" or None for a chunk lost on the way.
+    """
+
+    baudrate = 921600
+
+    def __init__(self, conn, total_size, on_chunk=None, resume_offset=0, stray_replies=()):
+        self.conn = conn
+        self.received = bytearray(total_size)
+        self.have = set()
+        self.total_chunks = (total_size + CHUNK_SIZE - 1) // CHUNK_SIZE
+        self.on_chunk = on_chunk or (lambda seq, attempt: "CACK")
+        self.resume_offset = resume_offset
+        self.stray_replies = list(stray_replies)
+        self.attempts = {}
+        self.sent = []  # seq of every chunk written, in order
+
+    def reply(self, line):
+        self.conn.transfer_replies.put(line)
+
+    def write(self, data):
+        data = bytes(data)
+        if data.startswith(b"XFER"):
+            self.reply(f"ACK {self.resume_offset}")
+            for seq in range(self.resume_offset // CHUNK_SIZE):
+                self.have.add(seq)
+            return
+        _, seq, length, _ = CHUNK_HEADER.unpack_from(data)
+        self.sent.append(seq)
+        attempt = self.attempts.get(seq, 0)
+        self.attempts[seq] = attempt + 1
+        for line in self.stray_replies:
+            self.reply(line)
+        self.stray_replies = []
+
+        answer = self.on_chunk(seq, attempt)
+        if answer == "CACK":
+            offset = seq * CHUNK_SIZE
+            self.received[offset:offset + length] = data[CHUNK_HEADER.size:]
+            self.have.add(seq)
+        if answer is not None:
+            self.reply(f"{answer} {seq}")
+        if len(self.have) == self.total_chunks and answer == "CACK":
+            self.reply("DONE")
+
+
+def make_frame(chunks):
+    """An RGB565 frame whose payload fills chunks - 0.5 chunks."""
+    pixels = (chunks * CHUNK_SIZE - CHUNK_SIZE // 2) // 2
+    rgb565 = np.arange(pixels, dtype=np.uint16).reshape(1, pixels)
+    return frame_codec.encode(frame_codec.from_rgb565(rgb565), frame_codec.CODEC_RGB565)
+
+
+def transmit(frame, **firmware_options):
+    conn = pyserial.SerialConnection(3)
+    payload = bytes(frame_codec.unpack(frame)[3])
+    firmware = FakeFirmware(conn, len(payload), **firmware_options)
+    conn.ser = firmware
+    digest = conn.frame_digest(frame)
+    result = conn._transmit_chunked(frame, digest)
+    return conn, firmware, payload, digest, result
+
+
+def test_every_chunk_acknowledged():
+    conn, firmware, payload, digest, result = transmit(make_frame(6))
+
+    assert result is True
+    assert firmware.sent == list(range(6))
+    assert bytes(firmware.received) == payload
+    assert conn.last_frame_digest == digest
+    assert conn.retransmitted_chunks == 0
+
+
+def test_bad_chunk_is_retransmitted_on_cnak():
+    conn, firmware, payload, _, result = transmit(
+        make_frame(6), on_chunk=lambda seq, attempt: "CNAK" if seq == 2 and attempt == 0 else "CACK")
+
+    assert result is True
+    assert firmware.attempts[2] == 2
+    assert bytes(firmware.received) == payload
+    assert conn.retransmitted_chunks == 1
+
+
+def test_lost_chunk_is_retransmitted_when_a_later_one_is_answered():
+    conn, firmware, payload, _, result = transmit(
+        make_frame(6), on_chunk=lambda seq, attempt: None if seq == 1 and attempt == 0 else "CACK")
+
+    assert result is True
+    # Sent again as soon as CACK 2 shows it was lost, not after the timeout
+    assert firmware.sent.index(1, 2) < firmware.sent.index(5)
+    assert bytes(firmware.received) == payload
+
+
+def test_fast_retransmits_do_not_use_up_retries():
+    # Lost once, then rejected max_retries times
+    def on_chunk(seq, attempt):
+        if seq != 1:
+            return "CACK"
+        return None if attempt == 0 else "CNAK" if attempt <= 5 else "CACK"
+
+    conn, firmware, payload, _, result = transmit(make_frame(6), on_chunk=on_chunk)
+
+    assert result is True
+    assert firmware.attempts[1] == 7
+    assert bytes(firmware.received) == payload
+
+
+def test_chunk_failing_too_often_abandons_the_frame():
+    conn, firmware, _, _, result = transmit(
+        make_frame(4), on_chunk=lambda seq, attempt: "CNAK" if seq == 3 else "CACK")
+
+    assert result is False
+    assert firmware.attempts[3] == 6  # The first send and max_retries resends
+
+
+def test_transfer_resumes_at_the_acknowledged_offset():
+    conn, firmware, payload, _, result = transmit(make_frame(6), resume_offset=4 * CHUNK_SIZE)
+
+    assert result is True
+    assert firmware.sent == [4, 5]
+    assert firmware.received[4 * CHUNK_SIZE:] == payload[4 * CHUNK_SIZE:]
+
+
+def test_stray_replies_are_ignored():
+    conn, firmware, payload, _, result = transmit(
+        make_frame(4), stray_replies=("Error: Invalid image size", "ACK", "DONE", "CACK x"))
+
+    assert result is True
+    assert bytes(firmware.received) == payload
+
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import frame_codec
+
+
+def rgb565_pixels(values):
+    return np.array(values, dtype=np.uint16)
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [7],
+    [1, 2, 3, 4, 5],
+    [9] * 5,
+    [9] * 129,  # One full repeat packet
+    [9] * 130,  # A full repeat packet and a single pixel
+    [9] * 300 + [1, 2, 3] + [4] * 2,
+    list(range(128)),  # One full literal packet
+    list(range(300)),  # Literals over several packets
+])
+def test_rle_round_trip(values):
+    pixels = rgb565_pixels(values)
+    encoded = frame_codec.rle_encode(pixels)
+
+    assert np.array_equal(frame_codec.rle_decode(encoded, len(values)), pixels)
+
+
+def test_rle_round_trip_random_image():
+    rng = np.random.default_rng(1)
+    # Short runs of random colours, like flat artwork with noise
+    pixels = np.repeat(rng.integers(0, 65536, 2000, dtype=np.uint16), rng.integers(1, 6, 2000))
+    encoded = frame_codec.rle_encode(pixels)
+
+    assert np.array_equal(frame_codec.rle_decode(encoded, pixels.size), pixels)
+
+
+def test_rle_compresses_runs():
+    encoded = frame_codec.rle_encode(rgb565_pixels([0x1234] * 1000))
+
+    # 8 packets of 129 repeats, 3 bytes each
+    assert len(encoded) == 8 * 3
+
+
+@pytest.mark.parametrize("codec", [frame_codec.CODEC_RGB565, frame_codec.CODEC_RLE565])
+def test_container_round_trip(codec):
+    rng = np.random.default_rng(2)
+    pixels = frame_codec.from_rgb565(rng.integers(0, 65536, (12, 20), dtype=np.uint16))
+
+    container = frame_codec.encode(pixels, codec)
+
+    assert frame_codec.unpack(container)[:3] == (codec, 20, 12)
+    assert np.array_equal(frame_codec.decode(container), pixels)
+
+
+def test_jpeg_container_has_no_header():
+    pixels = np.zeros((16, 16, 3), dtype=np.uint8)
+    container = frame_codec.encode(pixels, frame_codec.CODEC_JPEG)
+
+    codec, width, height, payload = frame_codec.unpack(container)
+    assert (codec, width, height) == (frame_codec.CODEC_JPEG, 0, 0)
+    assert payload == container
+    assert frame_codec.decode(container).shape == (16, 16, 3)
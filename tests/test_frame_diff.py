@@ -0,0 +1,68 @@
+import numpy as np
+
+import frame_diff
+
+TILE = frame_diff.TILE_SIZE
+
+
+def grid(rows):
+    return np.array([[cell == "#" for cell in row] for row in rows])
+
+
+def test_merge_single_tile():
+    assert frame_diff.merge_tiles(grid(["....",
+                                        ".#..",
+                                        "...."])) == [(TILE, TILE, TILE, TILE)]
+
+
+def test_merge_horizontal_run():
+    assert frame_diff.merge_tiles(grid([".###"])) == [(TILE, 0, 3 * TILE, TILE)]
+
+
+def test_merge_rows_with_the_same_columns():
+    assert frame_diff.merge_tiles(grid(["##..",
+                                        "##..",
+                                        "##.."])) == [(0, 0, 2 * TILE, 3 * TILE)]
+
+
+def test_rows_with_different_columns_stay_apart():
+    assert frame_diff.merge_tiles(grid(["##..",
+                                        "###."])) == [(0, 0, 2 * TILE, TILE),
+                                                      (0, TILE, 3 * TILE, TILE)]
+
+
+def test_separate_runs_in_one_row():
+    assert frame_diff.merge_tiles(grid(["#..#",
+                                        "#..#"])) == [(0, 0, TILE, 2 * TILE),
+                                                      (3 * TILE, 0, TILE, 2 * TILE)]
+
+
+def test_a_gap_ends_the_rectangle():
+    assert frame_diff.merge_tiles(grid(["#",
+                                        ".",
+                                        "#"])) == [(0, 0, TILE, TILE), (0, 2 * TILE, TILE, TILE)]
+
+
+def test_diff_rects():
+    old = np.zeros((4 * TILE, 4 * TILE, 3), dtype=np.uint8)
+    new = old.copy()
+    assert frame_diff.diff_rects(old, new) == []
+
+    new[TILE + 3, 2 * TILE + 5] = 255
+    assert frame_diff.diff_rects(old, new) == [(2 * TILE, TILE, TILE, TILE)]
+
+
+def test_small_differences_are_ignored():
+    old = np.full((2 * TILE, 2 * TILE, 3), 100, dtype=np.uint8)
+    new = old + frame_diff.DIFF_THRESHOLD
+
+    assert frame_diff.diff_rects(old, new) == []
+
+
+def test_full_repaint_when_mostly_dirty_or_unknown():
+    old = np.zeros((2 * TILE, 2 * TILE, 3), dtype=np.uint8)
+    new = np.full_like(old, 255)
+
+    assert frame_diff.diff_rects(old, new) is None
+    assert frame_diff.diff_rects(None, new) is None
+    assert frame_diff.diff_rects(old[:TILE], new) is None
@@ -0,0 +1,116 @@
+import threading
+
+from input_events import (ActionExecutor, ButtonEventEngine, EVENT_LONG_PRESS, EVENT_PRESS,
+                          EVENT_RELEASE, EVENT_REPEAT)
+
+DOWN, UP = 0, 4095
+
+
+def kinds(events):
+    return [event.kind for event in events]
+
+
+def test_press_is_reported_at_the_first_edge_and_bounce_ignored():
+    engine = ButtonEventEngine(1, debounce=0.03)
+
+    assert kinds(engine.update(0, DOWN, now=1.0)) == [EVENT_PRESS]
+    # Contact bounce inside the debounce time
+    assert engine.update(0, UP, now=1.01) == []
+    assert engine.update(0, DOWN, now=1.02) == []
+    assert kinds(engine.update(0, UP, now=1.1)) == [EVENT_RELEASE]
+
+
+def test_hysteresis_between_thresholds():
+    engine = ButtonEventEngine(1, press_threshold=100, release_threshold=4000)
+
+    assert engine.update(0, 2000, now=1.0) == []
+    assert kinds(engine.update(0, 50, now=1.1)) == [EVENT_PRESS]
+    # Between the thresholds: still pressed
+    assert engine.update(0, 2000, now=1.2) == []
+    assert kinds(engine.update(0, 4095, now=1.3)) == [EVENT_RELEASE]
+
+
+def test_long_press_fires_once():
+    engine = ButtonEventEngine(1, long_press=0.6)
+
+    engine.update(0, DOWN, now=1.0)
+    assert engine.update(0, DOWN, now=1.5) == []
+    assert kinds(engine.update(0, DOWN, now=1.6)) == [EVENT_LONG_PRESS]
+    assert engine.update(0, DOWN, now=2.5) == []
+    assert kinds(engine.update(0, UP, now=3.0)) == [EVENT_RELEASE]
+
+
+def test_long_press_button_reports_a_short_press_on_release():
+    engine = ButtonEventEngine(1, long_press=0.6, long_press_buttons=(0,))
+
+    assert engine.update(0, DOWN, now=1.0) == []
+    assert kinds(engine.update(0, UP, now=1.2)) == [EVENT_PRESS, EVENT_RELEASE]
+
+
+def test_long_press_button_held_never_reports_press():
+    engine = ButtonEventEngine(1, long_press=0.6, long_press_buttons=(0,))
+
+    assert engine.update(0, DOWN, now=1.0) == []
+    assert kinds(engine.update(0, DOWN, now=1.7)) == [EVENT_LONG_PRESS]
+    assert kinds(engine.update(0, UP, now=2.0)) == [EVENT_RELEASE]
+
+
+def test_repeat_timing():
+    engine = ButtonEventEngine(1, long_press=10, repeat_delay=0.5, repeat_interval=0.15,
+                               repeat_buttons=(0,))
+
+    engine.update(0, DOWN, now=1.0)
+    assert engine.update(0, DOWN, now=1.4) == []
+    assert kinds(engine.update(0, DOWN, now=1.5)) == [EVENT_REPEAT]
+    assert engine.update(0, DOWN, now=1.6) == []
+    assert kinds(engine.update(0, DOWN, now=1.65)) == [EVENT_REPEAT]
+    engine.update(0, UP, now=1.7)
+    assert engine.update(0, UP, now=2.0) == []
+
+
+def test_buttons_without_repeat_do_not_repeat():
+    engine = ButtonEventEngine(2, long_press=10, repeat_buttons=(1,))
+
+    engine.update(0, DOWN, now=1.0)
+    assert engine.update(0, DOWN, now=5.0) == []
+
+
+def test_executor_runs_actions_in_order():
+    executor = ActionExecutor()
+    done = threading.Event()
+    order = []
+    for i in range(5):
+        executor.submit(lambda i=i: order.append(i))
+    executor.submit(done.set)
+
+    assert done.wait(2)
+    executor.stop()
+    assert order == [0, 1, 2, 3, 4]
+    assert executor.stats()["executed"] == 6
+
+
+def test_executor_drops_actions_over_max_pending():
+    executor = ActionExecutor(max_pending=2)
+    release = threading.Event()
+
+    assert executor.submit(lambda: release.wait(2))
+    assert executor.submit(lambda: None)
+    assert not executor.submit(lambda: None)
+    release.set()
+    executor.stop()
+    assert executor.stats()["dropped"] == 1
+
+
+def test_executor_counts_failed_actions():
+    executor = ActionExecutor()
+
+    def fail():
+        raise RuntimeError("shortcut failed")
+
+    done = threading.Event()
+    executor.submit(fail)
+    executor.submit(done.set)
+
+    assert done.wait(2)
+    executor.stop()
+    assert executor.stats()["failed"] == 1
@@ -0,0 +1,66 @@
+import numpy as np
+
+from input_filter import ChannelFilter, InputFilterBank, build_level_lut
+
+
+def test_level_lut_matches_interp():
+    lut = build_level_lut()
+
+    for value in range(0, 4096, 7):
+        assert lut[value] == int(np.interp(value, [5, 4090], [0, 100]))
+
+
+def test_noise_inside_the_deadband_is_suppressed():
+    bank = InputFilterBank(1, deadband=24)
+
+    assert bank.update(0, 2000) == 48
+    for raw in (2010, 1990, 2024, 1976, 2000):
+        assert bank.update(0, raw) is None
+
+    assert bank.stats()["emitted"] == 1
+    assert bank.stats()["suppressed"] == 5
+
+
+def test_movement_past_the_deadband_is_reported():
+    channel = ChannelFilter(deadband=24)
+
+    assert channel.update(2000) == 48
+    assert channel.update(2100) == 51
+    # Measured from where the level last settled, not from the last sample
+    assert channel.update(2080) is None
+    assert channel.update(2070) == 50
+
+
+def test_end_stops_are_reached_inside_the_deadband():
+    channel = ChannelFilter(deadband=24)
+
+    channel.update(4080)
+    assert channel.level == 99
+    assert channel.update(4095) == 100
+
+    channel.update(60)
+    assert channel.level == 1
+    assert channel.update(40) == 0
+
+
+def test_out_of_range_samples_are_clamped():
+    channel = ChannelFilter()
+
+    assert channel.update(5000) == 100
+    assert channel.update(-10) == 0
+
+
+def test_median_smoothing_drops_spikes():
+    channel = ChannelFilter(deadband=0, smoothing="median", window=3)
+
+    channel.update(2000)
+    channel.update(2000)
+    assert channel.update(4095) is None
+
+
+def test_channels_are_independent():
+    bank = InputFilterBank(2)
+
+    assert bank.update(0, 2000) == 48
+    assert bank.update(1, 2000) == 48
+    assert bank.update(1, 2000) is None
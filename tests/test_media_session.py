@@ -0,0 +1,121 @@
+import asyncio
+
+from media_provider import FakeMediaProvider, NowPlaying
+from media_session import Media
+
+
+class RecordingSerial:
+    """The parts of SerialConnection Media calls."""
+
+    def __init__(self):
+        self.frames = []
+        self.prefetched = []
+        self.changed = asyncio.Event()
+
+    def submit_image(self, image, text, subtext):
+        self.frames.append((image, text, subtext))
+        self.changed.set()
+
+    def prefetch_frames(self, requests):
+        self.prefetched.append(requests)
+        self.changed.set()
+
+
+def run_media(provider, scenario, prefetch_depth=1):
+    """Run a Media session on a fresh loop while scenario(media, serial) runs."""
+    async def main():
+        serial_obj = RecordingSerial()
+        media = Media(serial_obj=serial_obj, provider=provider, prefetch_depth=prefetch_depth)
+        # Only change events may wake the session within the test
+        media.fallback_poll_interval = 60
+        runner = asyncio.create_task(media.run())
+        try:
+            await asyncio.wait_for(scenario(media, serial_obj), 5)
+        finally:
+            media.stop()
+            await asyncio.wait_for(runner, 2)
+        return serial_obj
+
+    return asyncio.run(main())
+
+
+async def wait_for(serial_obj, condition):
+    while not condition():
+        serial_obj.changed.clear()
+        await serial_obj.changed.wait()
+
+
+def test_fake_provider_notifies_changes():
+    provider = FakeMediaProvider()
+    changes = []
+    asyncio.run(provider.start(lambda: changes.append(True)))
+
+    provider.set_now_playing("Title", "Artist", "Album", "art")
+    provider.set_queue(upcoming=[NowPlaying("Next", "Artist", "Album", None)])
+    provider.skip_next()
+    provider.clear()
+
+    assert len(changes) == 4
+    assert asyncio.run(provider.get_now_playing()) is None
+
+
+def test_fake_provider_queue_moves_with_skips():
+    provider = FakeMediaProvider()
+    first = NowPlaying("First", "A", "", None)
+    second = NowPlaying("Second", "A", "", None)
+    provider.set_now_playing(*first)
+    provider.set_queue(upcoming=[second])
+
+    provider.skip_next()
+    assert asyncio.run(provider.get_now_playing()) == second
+    assert asyncio.run(provider.get_queue()).previous == [first]
+
+    provider.skip_previous()
+    assert asyncio.run(provider.get_now_playing()) == first
+    assert asyncio.run(provider.get_queue()).upcoming == [second]
+
+
+def test_change_notification_sends_a_frame():
+    provider = FakeMediaProvider()
+
+    async def scenario(media, serial_obj):
+        # Let the session settle on "nothing playing" first
+        while not provider.fetch_count:
+            await asyncio.sleep(0.01)
+        provider.set_now_playing("A very long title that gets cut", "Artist", "Album", "art")
+        await wait_for(serial_obj, lambda: serial_obj.frames)
+
+    serial_obj = run_media(provider, scenario, prefetch_depth=0)
+
+    assert serial_obj.frames == [("art", "A very long title that ge", "Artist")]
+    assert provider.thumbnail_loads == 1
+
+
+def test_session_without_thumbnail_sends_nothing():
+    provider = FakeMediaProvider()
+
+    async def scenario(media, serial_obj):
+        provider.set_now_playing("Title", "Artist")
+        while media.title != "Title":
+            await asyncio.sleep(0.01)
+
+    serial_obj = run_media(provider, scenario, prefetch_depth=0)
+
+    assert serial_obj.frames == []
+
+
+def test_queue_neighbours_are_prefetched_after_the_current_frame():
+    provider = FakeMediaProvider()
+    provider.set_queue(previous=[NowPlaying("Prev", "Artist", "", "prev art")],
+                       upcoming=[NowPlaying("Next", "Artist", "", "next art"),
+                                 NowPlaying("Later", "Artist", "", "later art")])
+
+    async def scenario(media, serial_obj):
+        provider.set_now_playing("Title", "Artist", "", "art")
+        await wait_for(serial_obj, lambda: serial_obj.prefetched)
+
+    serial_obj = run_media(provider, scenario, prefetch_depth=1)
+
+    assert serial_obj.frames[0][0] == "art"
+    assert serial_obj.prefetched[0] == [("next art", "Next", "Artist"),
+                                        ("prev art", "Prev", "Artist")]
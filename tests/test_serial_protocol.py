@@ -0,0 +1,86 @@
+import struct
+
+import serial_protocol
+from serial_protocol import EVENT_FRAME, EVENT_TEXT, FrameParser
+
+
+def telemetry_values(events, parser):
+    return [parser.decode_telemetry(event[2]) for event in events if event[0] == EVENT_FRAME]
+
+
+def test_frames_and_text_lines_interleaved():
+    parser = FrameParser()
+    data = (b"ALIVE abc\n" + serial_protocol.encode_telemetry((1, 2, 3))
+            + b"DONE\n" + serial_protocol.encode_telemetry((4, 5, 6)))
+
+    events = parser.feed(data)
+
+    assert [event[0] for event in events] == [EVENT_TEXT, EVENT_FRAME, EVENT_TEXT, EVENT_FRAME]
+    assert events[0][1] == "ALIVE abc"
+    assert events[2][1] == "DONE"
+    assert telemetry_values(events, parser) == [(1, 2, 3), (4, 5, 6)]
+    assert parser.frames == 2
+    assert parser.crc_errors == 0
+
+
+def test_frame_split_across_reads():
+    parser = FrameParser()
+    data = serial_protocol.encode_telemetry((100, 4095, 0)) + b"ACK 0\n"
+
+    events = []
+    for i in range(len(data)):
+        events += parser.feed(data[i:i + 1])
+
+    assert telemetry_values(events, parser) == [(100, 4095, 0)]
+    assert events[-1] == (EVENT_TEXT, "ACK 0")
+
+
+def test_garbage_before_frame_is_discarded():
+    parser = FrameParser()
+    events = parser.feed(b"\x00\xff\x13" + serial_protocol.encode_telemetry((7, 8)))
+
+    assert telemetry_values(events, parser) == [(7, 8)]
+
+
+def test_corrupted_frame_resyncs_on_the_next_frame():
+    parser = FrameParser()
+    bad = bytearray(serial_protocol.encode_telemetry((1, 2)))
+    bad[-3] ^= 0x01  # Payload byte, so the CRC no longer matches
+    events = parser.feed(bytes(bad) + serial_protocol.encode_telemetry((3, 4)))
+
+    assert telemetry_values(events, parser) == [(3, 4)]
+    assert parser.crc_errors >= 1
+
+
+def test_wrong_version_is_not_a_frame():
+    parser = FrameParser()
+    frame = serial_protocol.encode_frame(serial_protocol.TYPE_TELEMETRY, b"\x01\x00", version=9)
+    events = parser.feed(frame + serial_protocol.encode_telemetry((5,)))
+
+    assert telemetry_values(events, parser) == [(5,)]
+    assert parser.crc_errors >= 1
+
+
+def test_overlong_text_without_newline_is_dropped():
+    parser = FrameParser()
+    assert parser.feed(b"x" * (serial_protocol.MAX_TEXT_LINE + 1)) == []
+
+    events = parser.feed(b"PONG\n")
+    assert events == [(EVENT_TEXT, "PONG")]
+
+
+def test_encode_chunk_layout():
+    payload = bytes(range(10))
+    chunk = serial_protocol.encode_chunk(3, payload)
+
+    sync, seq, length, crc = serial_protocol.CHUNK_HEADER.unpack_from(chunk)
+    assert (sync, seq, length) == (serial_protocol.CHUNK_SYNC, 3, len(payload))
+    assert chunk[serial_protocol.CHUNK_HEADER.size:] == payload
+    assert crc == serial_protocol.crc16(struct.pack("<HH", seq, length) + payload)
+
+
+def test_parse_hello():
+    assert serial_protocol.parse_hello("HELLO esp32-media-display 3 CHUNK BAUD") == \
+        ("esp32-media-display", "3", {"CHUNK", "BAUD"})
+    assert serial_protocol.parse_hello("ALIVE abc") is None
+    assert serial_protocol.parse_hello("HELLO x") is None
@@ -0,0 +1,38 @@
+import asyncio
+import io
+
+from PIL import Image
+
+from thumbnail_loader import BufferPool, ByteBuffer, FakeThumbnailStream, ThumbnailLoader
+
+
+def jpeg_bytes(size=(600, 600), color=(200, 40, 40)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_pool_reuses_buffers_by_capacity():
+    pool = BufferPool(ByteBuffer)
+
+    buffer = pool.acquire(1000)
+    assert buffer.capacity >= 1000
+    pool.release(buffer)
+
+    assert pool.acquire(900) is buffer
+    assert pool.acquire(900) is not buffer
+
+
+def test_loader_decodes_at_reduced_scale_and_reuses_the_buffer():
+    pool = BufferPool(ByteBuffer)
+    loader = ThumbnailLoader(pool, target_size=(320, 240))
+    data = jpeg_bytes(size=(1400, 1400))
+
+    first = asyncio.run(loader.load(FakeThumbnailStream(data)))
+    second = asyncio.run(loader.load(FakeThumbnailStream(data)))
+
+    assert first.mode == "RGB"
+    # Draft mode picks the smallest JPEG scale that still covers the target
+    assert first.size == (350, 350)
+    assert first.getpixel((10, 10)) == second.getpixel((10, 10))
+    assert (pool.allocations, pool.reuses) == (1, 1)
@@ -0,0 +1,121 @@
+import threading
+import time
+
+from audio_sessions import AudioSessionIndex, FakeAudioBackend
+from volume_potentiometer import VolumeActuator, VolumeControl, decibels
+
+
+class RecordingVolume:
+    """Stands in for VolumeControl, optionally blocking inside set_volume."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+        self.applied = threading.Condition()
+
+    def set_volume(self, name, value):
+        self.entered.set()
+        self.gate.wait(2)
+        with self.applied:
+            self.calls.append((name, time.monotonic(), value))
+            self.applied.notify_all()
+
+    def wait_for(self, count, timeout=2):
+        with self.applied:
+            return self.applied.wait_for(lambda: len(self.calls) >= count, timeout)
+
+
+def test_actuator_applies_only_the_latest_target():
+    volume = RecordingVolume()
+    volume.gate.clear()
+    actuator = VolumeActuator(volume)
+    try:
+        actuator.set_volume("MASTER_VOLUME", 10)
+        assert volume.entered.wait(2)
+        # The worker is busy with 10, these replace each other
+        for value in (20, 30, 40):
+            actuator.set_volume("MASTER_VOLUME", value)
+        volume.gate.set()
+
+        assert volume.wait_for(2)
+        time.sleep(0.05)
+    finally:
+        actuator.stop()
+
+    assert [value for _, _, value in volume.calls] == [10, 40]
+    stats = actuator.stats()
+    assert (stats["submitted"], stats["applied"], stats["coalesced"]) == (4, 2, 2)
+
+
+def test_actuator_rate_limits_each_channel():
+    volume = RecordingVolume()
+    actuator = VolumeActuator(volume, max_rate=20)
+    try:
+        actuator.set_volume("MASTER_VOLUME", 1)
+        assert volume.wait_for(1)
+        actuator.set_volume("MASTER_VOLUME", 2)
+        actuator.set_volume("app", 3)  # Another channel is not held back
+        assert volume.wait_for(3)
+    finally:
+        actuator.stop()
+
+    times = {value: when for _, when, value in volume.calls}
+    assert times[2] - times[1] >= 0.05 * 0.9
+    assert times[3] < times[2]
+
+
+def test_volume_control_sets_master_and_app_volume():
+    backend = FakeAudioBackend()
+    player = backend.add_session("player.exe")
+    control = VolumeControl(backend=backend)
+    try:
+        control.set_volume("MASTER_VOLUME", 50)
+        control.set_volume("player.exe", 25)
+        control.set_volume("missing.exe", 25)
+    finally:
+        control.stop()
+
+    assert backend.master.level_db == decibels[50]
+    assert player.volume == 0.25
+
+
+def test_session_index_resolves_names_once():
+    backend = FakeAudioBackend()
+    session = backend.add_session("player.exe")
+    index = AudioSessionIndex(backend)
+
+    index.refresh()
+    index.refresh()
+
+    assert [volume for _, volume in index.get("player.exe")] == [session]
+    assert session.name_lookups == 1
+    assert index.sessions_added == 1
+
+
+def test_session_index_drops_expired_and_vanished_sessions():
+    backend = FakeAudioBackend()
+    first = backend.add_session("player.exe")
+    backend.add_session("other.exe")
+    index = AudioSessionIndex(backend)
+    index.refresh()
+
+    backend.expire_session(first)
+    backend.sessions = {key: s for key, s in backend.sessions.items() if s.name != "other.exe"}
+    index.refresh()
+
+    assert index.names() == []
+    assert index.sessions_removed == 2
+
+
+def test_failed_session_is_invalidated():
+    backend = FakeAudioBackend()
+    session = backend.add_session("player.exe")
+    control = VolumeControl(backend=backend)
+    try:
+        backend.expire_session(session)
+        control.set_volume("player.exe", 10)
+        assert control.session_index.names() == []
+    finally:
+        control.stop()
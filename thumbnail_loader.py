@@ -0,0 +1,146 @@
+import io
+import threading
+from PIL import Image
+
+
+class BufferPool:
+    """Reusable read buffers bucketed by power-of-two capacity.
+
+    factory(capacity) creates a buffer (a WinRT Buffer in production, a
+    bytearray based ByteBuffer in tests). Buffers go back to the pool after
+    the image has been decoded, so steady-state track changes allocate nothing.
+    """
+
+    MIN_CAPACITY = 64 * 1024
+
+    def __init__(self, factory, max_per_size=2):
+        self.factory = factory
+        self.max_per_size = max_per_size
+        self._free = {}
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def _capacity_for(self, size):
+        capacity = self.MIN_CAPACITY
+        while capacity < size:
+            capacity *= 2
+        return capacity
+
+    def acquire(self, size):
+        capacity = self._capacity_for(size)
+        with self._lock:
+            free = self._free.get(capacity)
+            if free:
+                self.reuses += 1
+                return free.pop()
+            self.allocations += 1
+        return self.factory(capacity)
+
+    def release(self, buffer):
+        capacity = self._capacity_for(buffer.capacity)
+        with self._lock:
+            free = self._free.setdefault(capacity, [])
+            if len(free) < self.max_per_size:
+                free.append(buffer)
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Seekable read-only file object over a memoryview, without copying it up front."""
+
+    def __init__(self, view):
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = len(self._view) + offset
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class ThumbnailLoader:
+    """Reads a media thumbnail stream into a pooled buffer and decodes it.
+
+    The read is sized from the stream length, PIL reads straight from a
+    memoryview of the buffer, and JPEG art is decoded with draft mode at the
+    smallest scale that still covers target_size.
+    """
+
+    def __init__(self, pool, target_size=(320, 240), read_options=0):
+        self.pool = pool
+        self.target_size = target_size
+        self.read_options = read_options
+
+    async def load(self, thumb_stream_ref):
+        readable_stream = await thumb_stream_ref.open_read_async()
+        buffer = None
+        try:
+            size = readable_stream.size
+            buffer = self.pool.acquire(size)
+            result = await readable_stream.read_async(buffer, size, self.read_options)
+
+            view = memoryview(result)[:result.length]
+            try:
+                img = Image.open(MemoryViewReader(view))
+                img.draft("RGB", self.target_size)
+                # convert() also forces the decode while the buffer is still ours
+                img = img.convert("RGB")
+            finally:
+                view.release()
+            return img
+        finally:
+            if buffer is not None:
+                self.pool.release(buffer)
+            readable_stream.close()
+
+
+class ByteBuffer(bytearray):
+    """bytearray with the capacity/length attributes of a WinRT Buffer."""
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.capacity = capacity
+        self.length = 0
+
+
+class FakeThumbnailStream:
+    """Stand-in for a WinRT thumbnail stream reference, backed by encoded bytes."""
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+
+    async def open_read_async(self):
+        return self
+
+    async def read_async(self, buffer, count, options):
+        count = min(count, self.size, len(buffer))
+        buffer[:count] = self.data[:count]
+        buffer.length = count
+        return buffer
+
+    def close(self):
+        pass
@@ -12,17 +12,92 @@
 #define TFT_WIDTH  240
 #define TFT_HEIGHT 320
 
-// Max image size
+// Max image size (JPEG and RLE payloads are buffered)
 #define MAX_IMAGE_SIZE 90000
 
+// Max raw RGB565 payload, drawn as chunks arrive instead of buffered
+#define MAX_STREAM_SIZE (TFT_WIDTH * TFT_HEIGHT * 2)
+
+// Receive timeout: abandon an image if no byte arrives for this long
+#define IMAGE_RECEIVE_TIMEOUT_MS 2000
+
+// Chunked transfer, see serial_protocol.py on the host:
+//   XFER <digest> <size> <chunk size> [<x> <y> <frame digest> [<codec> <w> <h> [<scale>]]]\n
+//     ->  ACK <resume offset>
+//   CHUNK_SYNC | seq u16 | len u16 | crc16 u16 | payload  ->  CACK <seq> / CNAK <seq>
+// CRC16 covers seq, len and payload. DONE follows once every chunk arrived.
+// x/y place a partial (dirty region) image; frame digest is the digest of the
+// whole screen once it is drawn, "-" while more regions are still to come.
+// codec is jpeg, rgb565 (raw little-endian, drawn per chunk) or rle565
+// (PackBits RLE of RGB565, see frame_codec.py), w/h size the raw codecs.
+// scale (1, 2, 4 or 8, JPEG only) draws the image that many times larger,
+// for the low resolution preview the host sends ahead of a full frame.
+#define CHUNK_SYNC 0xC5
+#define CHUNK_HEADER_SIZE 7
+#define MAX_CHUNK_SIZE 1024
+#define MAX_CHUNKS ((MAX_STREAM_SIZE + 63) / 64)
+#define SERIAL_RX_BUFFER_SIZE 8192
+
+// Longest command line, and how long a started line may pause
+#define MAX_COMMAND_LENGTH 512  // LOOP lines are the longest
+#define COMMAND_TIMEOUT_MS 1000
+
+// Link speed negotiation, see serial_protocol.py on the host:
+//   BAUDS -> BAUDS <supported rates>
+//   BAUD <rate> -> BAUD <rate> OK, sent at the old rate, then switch
+//   LOOP <hex> -> echoed back at the new rate (integrity test)
+//   BAUD COMMIT -> BAUD COMMIT OK, keep the new rate
+// Without a COMMIT within BAUD_COMMIT_TIMEOUT_MS the old rate is restored.
+#define DEFAULT_BAUD 115200
+#define SUPPORTED_BAUDS "115200 230400 460800 921600 1500000 2000000"
+#define BAUD_COMMIT_TIMEOUT_MS 1000
+
+enum PayloadCodec { CODEC_JPEG, CODEC_RGB565, CODEC_RLE565 };
+
 TaskHandle_t send_slider_values_task;
 
+// Telemetry (core 0) and replies (loop, core 1) share the serial port.
+// Every write goes through serialSend/serialReply so that a reply line can
+// never land in the middle of a telemetry frame.
+SemaphoreHandle_t serialWriteMutex;
+
 // Create TFT display object
 Adafruit_ST7789 tft = Adafruit_ST7789(TFT_CS, TFT_DC, TFT_RST);
 
 // Image receive buffer
 uint8_t imageBuffer[MAX_IMAGE_SIZE];
 
+// Digest of the frame currently on screen, as declared by the host.
+// Reported back in the PING reply so the host can skip re-sending it.
+String currentFrameDigest = "";
+
+// State of the current chunked transfer. Kept after a failed transfer so a
+// retry of the same frame can resume from the first missing chunk.
+String rxDigest = "";
+uint32_t rxSize = 0;
+uint16_t rxChunkSize = 0;
+uint16_t rxTotalChunks = 0;
+uint16_t rxReceivedChunks = 0;
+bool rxActive = false;
+int16_t rxX = 0;
+int16_t rxY = 0;
+uint16_t rxWidth = 0;
+uint16_t rxHeight = 0;
+PayloadCodec rxCodec = CODEC_JPEG;
+uint8_t rxScale = 1;
+String rxFrameDigest = "";
+uint8_t rxChunkMap[(MAX_CHUNKS + 7) / 8];
+uint8_t chunkBuffer[MAX_CHUNK_SIZE] __attribute__((aligned(4)));
+
+// One row of pixels for RLE decoding (TFT_HEIGHT is the long side, which is
+// the row length in landscape rotation)
+uint16_t lineBuffer[TFT_HEIGHT];
+
+// Placement of the JPEG being drawn by tft_output_scaled()
+int16_t drawX = 0;
+int16_t drawY = 0;
+uint8_t drawScale = 1;
+
 const int NUM_SLIDERS = 11;
 const int analog_inputs[] = { 13, 27, 26, 25, 33, 32, 35, 34, 39, 36, 4 };
 volatile int analog_slider_values[NUM_SLIDERS];
@@ -33,7 +108,87 @@ void updateSliderValues() {
   }
 }
 
+void serialSend(const uint8_t* data, size_t length) {
+  xSemaphoreTake(serialWriteMutex, portMAX_DELAY);
+  Serial.write(data, length);
+  xSemaphoreGive(serialWriteMutex);
+}
+
+void serialReply(const String& line) {
+  xSemaphoreTake(serialWriteMutex, portMAX_DELAY);
+  Serial.println(line);
+  xSemaphoreGive(serialWriteMutex);
+}
+
+bool isSupportedBaud(uint32_t rate) {
+  String rates = " " SUPPORTED_BAUDS " ";
+  return rate > 0 && rates.indexOf(" " + String(rate) + " ") >= 0;
+}
+
+// Change the link speed between two writes, never inside a telemetry frame
+void setBaud(uint32_t rate) {
+  xSemaphoreTake(serialWriteMutex, portMAX_DELAY);
+  Serial.flush();
+  Serial.updateBaudRate(rate);
+  xSemaphoreGive(serialWriteMutex);
+}
+
+// Binary telemetry frame, see serial_protocol.py on the host:
+// SYNC | VERSION | TYPE | LENGTH | NUM_SLIDERS x uint16 LE | CRC16 LE
+#define FRAME_SYNC 0xA5
+#define PROTOCOL_VERSION 1
+#define FRAME_TYPE_TELEMETRY 0x01
+#define TELEMETRY_FRAME_SIZE (4 + NUM_SLIDERS * 2 + 2)
+
+// Text telemetry until the host negotiates the binary format with "PROTO 1"
+volatile bool binaryTelemetry = false;
+
+// Identification for the host's port probe: "PROBE" -> "HELLO <name> <version> <caps>"
+#define FIRMWARE_NAME "esp32-media-display"
+#define FIRMWARE_VERSION "8"
+#define FIRMWARE_CAPS "CHUNK RECT RGB565 RLE565 BAUD SCALE"
+
+// Pending link speed change, see the negotiation commands above
+uint32_t previousBaud = 0;  // Rate to go back to, 0 when nothing is pending
+unsigned long baudSwitchTime = 0;
+
+// CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)
+uint16_t crc16(const uint8_t* data, size_t length, uint16_t crc = 0xFFFF) {
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendSliderValuesBinary() {
+  uint8_t frame[TELEMETRY_FRAME_SIZE];
+  frame[0] = FRAME_SYNC;
+  frame[1] = PROTOCOL_VERSION;
+  frame[2] = FRAME_TYPE_TELEMETRY;
+  frame[3] = NUM_SLIDERS * 2;
+
+  for (int i = 0; i < NUM_SLIDERS; i++) {
+    uint16_t value = (uint16_t)analog_slider_values[i];
+    frame[4 + i * 2] = value & 0xFF;
+    frame[5 + i * 2] = value >> 8;
+  }
+
+  uint16_t crc = crc16(&frame[1], TELEMETRY_FRAME_SIZE - 3);
+  frame[TELEMETRY_FRAME_SIZE - 2] = crc & 0xFF;
+  frame[TELEMETRY_FRAME_SIZE - 1] = crc >> 8;
+
+  serialSend(frame, TELEMETRY_FRAME_SIZE);
+}
+
 void sendSliderValues() {
+  if (binaryTelemetry) {
+    sendSliderValuesBinary();
+    return;
+  }
+
   String builtString = String("");
 
   for (int i = 0; i < NUM_SLIDERS; i++) {
@@ -44,7 +199,7 @@ void sendSliderValues() {
     }
   }
 
-  Serial.println(builtString);
+  serialReply(builtString);
 }
 
 //////////////////////////////////////////////////////////////////////////
@@ -52,7 +207,9 @@ void sendSliderValues() {
 ////////////////////////////////////////////////////////////////////////// 
 
 void setup() {
-  Serial.begin(115200);
+  Serial.setRxBufferSize(SERIAL_RX_BUFFER_SIZE);  // Room for a window of chunks
+  Serial.begin(DEFAULT_BAUD);
+  serialWriteMutex = xSemaphoreCreateMutex();
 
   // Initialize TFT display
   tft.init(TFT_WIDTH, TFT_HEIGHT);
@@ -73,7 +230,7 @@ void setup() {
       &send_slider_values_task,  /* Task handle. */
       0); /* Core where the task should run */
 
-  Serial.println("ESP32 Ready");
+  serialReply("ESP32 Ready");
 }
 
 //////////////////////////////////////////////////////////////////////////
@@ -82,56 +239,378 @@ void setup() {
 
 void loop() {
   processIncomingSerial();
-  delay(10);
+
+  // The host never confirmed the new link speed, go back to the old one
+  if (previousBaud != 0 && millis() - baudSwitchTime > BAUD_COMMIT_TIMEOUT_MS) {
+    setBaud(previousBaud);
+    previousBaud = 0;
+  }
+
+  // Keep draining back-to-back chunks, only idle when nothing is waiting
+  if (!Serial.available()) {
+    delay(1);
+  }
+}
+
+// First byte of a chunk or of a command line from the host
+bool isMessageStart(int c) {
+  return c == CHUNK_SYNC || c == 'P' || c == 'B' || c == 'L' || c == 'X' || c == 'F';
+}
+
+// Read a command line without its newline. Commands are short printable
+// ASCII, so any other byte ends the read without being taken: a capital
+// letter in the payload of a chunk whose start was lost then costs a few
+// bytes, not the chunk header after it. Returns "" for anything that is
+// not a complete line.
+String readCommand() {
+  String command;
+  unsigned long lastByteTime = millis();
+  while (command.length() < MAX_COMMAND_LENGTH) {
+    if (!Serial.available()) {
+      if (millis() - lastByteTime > COMMAND_TIMEOUT_MS) {
+        return "";
+      }
+      delay(1);
+      continue;
+    }
+    int c = Serial.peek();
+    if (c == '\n') {
+      Serial.read();
+      return command;
+    }
+    if (c < 0x20 || c > 0x7E) {
+      return "";
+    }
+    command += (char)Serial.read();
+    lastByteTime = millis();
+  }
+  return "";
 }
 
 // Function to process serial communication
 void processIncomingSerial() {
-  if (Serial.available()) {
-    // Check for "PING" command
-    if (Serial.peek() == 'P') {
-      String command = Serial.readStringUntil('\n');
-      if (command == "PING") {
-        Serial.println("ALIVE");
-        return;
-      }
+  if (!Serial.available()) {
+    return;
+  }
+
+  // Anything else is the rest of a chunk whose start was lost on the wire,
+  // or line noise: skip to the next chunk header or command
+  if (!isMessageStart(Serial.peek())) {
+    while (Serial.available() && !isMessageStart(Serial.peek())) {
+      Serial.read();
     }
+    return;
+  }
 
-    // If data length >= 4, assume it's the image size
-    if (Serial.available() >= 4) {
-      uint32_t imageSize = 0;
-      Serial.readBytes((char*)&imageSize, 4);
+  // Chunk of a chunked transfer
+  if (Serial.peek() == CHUNK_SYNC) {
+    receiveChunk();
+    return;
+  }
 
-      // Validate the image size
-      if (imageSize > MAX_IMAGE_SIZE) {
-        Serial.println("Error: Image too large!");
-        return;
-      }
+  String command = readCommand();
+  if (command == "PING") {
+    serialReply("ALIVE " + currentFrameDigest);
+  } else if (command.startsWith("PROTO ")) {
+    // "PROTO <version>" selects the telemetry format, 0 = text
+    int version = command.substring(6).toInt();
+    binaryTelemetry = (version == PROTOCOL_VERSION);
+    serialReply(String(binaryTelemetry ? "PROTO 1 " : "PROTO 0 ") + FIRMWARE_CAPS);
+  } else if (command == "PROBE") {
+    // Port probe, older firmware ignores it and only answers the PING after it
+    serialReply("HELLO " FIRMWARE_NAME " " FIRMWARE_VERSION " " FIRMWARE_CAPS);
+  } else if (command == "BAUDS") {
+    // Link speed negotiation
+    serialReply("BAUDS " SUPPORTED_BAUDS);
+  } else if (command == "BAUD COMMIT") {
+    previousBaud = 0;
+    serialReply("BAUD COMMIT OK");
+  } else if (command.startsWith("BAUD ")) {
+    uint32_t rate = command.substring(5).toInt();
+    if (!isSupportedBaud(rate)) {
+      serialReply("Error: Unsupported baud rate");
+      return;
+    }
+    serialReply("BAUD " + String(rate) + " OK");
+    previousBaud = Serial.baudRate();
+    setBaud(rate);
+    baudSwitchTime = millis();
+  } else if (command.startsWith("LOOP ")) {
+    // Loopback test line, echoed as is
+    serialReply(command);
+  } else if (command.startsWith("XFER ")) {
+    // "XFER <digest> <size> <chunk size>" starts a chunked transfer
+    startChunkedTransfer(command);
+  } else if (command.startsWith("FRAME ")) {
+    // "FRAME <digest>" announces the digest and size of the image that follows
+    handleImageTransfer(command.substring(6));
+  }
+}
 
-      // Acknowledge the size
-      Serial.println("ACK");
+// Legacy exchange after a FRAME line: read the 4 byte image size, then receive and display the image
+void handleImageTransfer(String digest) {
+  uint32_t imageSize = 0;
+  if (Serial.readBytes((char*)&imageSize, 4) != 4) {
+    return;
+  }
 
-      // Receive image data
-      if (receiveImageData(imageSize)) {
-        // Display the image on the TFT
-        displayImage(imageSize);
+  // Validate the image size
+  if (imageSize > MAX_IMAGE_SIZE) {
+    serialReply("Error: Image too large!");
+    return;
+  }
+
+  // The buffer is about to be overwritten, a chunked transfer cannot resume
+  rxActive = false;
+
+  // Acknowledge the size
+  serialReply("ACK");
 
-        // Send "D" to indicate image received and displayed
-        Serial.println("DONE");
+  // Receive image data
+  if (receiveImageData(imageSize)) {
+    // Display the image on the TFT
+    displayImage(imageSize, 0, 0, 1);
+    currentFrameDigest = digest;
+
+    // Send "D" to indicate image received and displayed
+    serialReply("DONE");
+  }
+}
+
+void startChunkedTransfer(String command) {
+  // XFER <digest> <size> <chunk size> [<x> <y> <frame digest> [<codec> <w> <h> [<scale>]]]
+  String fields[11];
+  int count = 0;
+  int start = 0;
+  while (count < 11) {
+    int space = command.indexOf(' ', start);
+    fields[count++] = command.substring(start, space < 0 ? command.length() : space);
+    if (space < 0) break;
+    start = space + 1;
+  }
+  if (count < 4) {
+    serialReply("Error: Bad XFER");
+    return;
+  }
+
+  String digest = fields[1];
+  uint32_t size = fields[2].toInt();
+  uint16_t chunkSize = fields[3].toInt();
+  int16_t x = count > 4 ? fields[4].toInt() : 0;
+  int16_t y = count > 5 ? fields[5].toInt() : 0;
+  String frameDigest = count > 6 ? fields[6] : digest;
+  PayloadCodec codec = CODEC_JPEG;
+  if (count > 7 && fields[7] == "rgb565") codec = CODEC_RGB565;
+  if (count > 7 && fields[7] == "rle565") codec = CODEC_RLE565;
+  uint16_t width = count > 8 ? fields[8].toInt() : 0;
+  uint16_t height = count > 9 ? fields[9].toInt() : 0;
+  uint8_t scale = count > 10 ? fields[10].toInt() : 1;
+
+  uint32_t maxSize = codec == CODEC_RGB565 ? MAX_STREAM_SIZE : MAX_IMAGE_SIZE;
+  if (size == 0 || size > maxSize) {
+    serialReply("Error: Image too large!");
+    return;
+  }
+  if (codec != CODEC_JPEG && (width == 0 || width > TFT_HEIGHT || height == 0 || height > TFT_HEIGHT)) {
+    serialReply("Error: Bad image dimensions");
+    return;
+  }
+  if (codec == CODEC_RGB565 && (size != (uint32_t)width * height * 2 || chunkSize % 2)) {
+    serialReply("Error: Bad raw image size");
+    return;
+  }
+  if ((scale != 1 && scale != 2 && scale != 4 && scale != 8) || (scale != 1 && codec != CODEC_JPEG)) {
+    serialReply("Error: Bad scale");
+    return;
+  }
+  if (chunkSize < 64 || chunkSize > MAX_CHUNK_SIZE) {
+    serialReply("Error: Bad chunk size");
+    return;
+  }
+
+  bool resume = rxActive && digest == rxDigest && size == rxSize && chunkSize == rxChunkSize;
+  if (!resume) {
+    rxDigest = digest;
+    rxSize = size;
+    rxChunkSize = chunkSize;
+    rxTotalChunks = (size + chunkSize - 1) / chunkSize;
+    rxReceivedChunks = 0;
+    memset(rxChunkMap, 0, sizeof(rxChunkMap));
+    rxActive = true;
+  }
+  rxX = x;
+  rxY = y;
+  rxWidth = width;
+  rxHeight = height;
+  rxCodec = codec;
+  rxScale = scale;
+  rxFrameDigest = frameDigest == "-" ? "" : frameDigest;
+
+  // Resume from the first chunk we do not have yet
+  uint16_t firstMissing = 0;
+  while (firstMissing < rxTotalChunks && (rxChunkMap[firstMissing / 8] & (1 << (firstMissing % 8)))) {
+    firstMissing++;
+  }
+  serialReply("ACK " + String((uint32_t)firstMissing * rxChunkSize));
+}
+
+// Raw RGB565: draw the pixels of one chunk straight to the panel, split at
+// row boundaries of the target rectangle
+void drawRawChunk(uint32_t offset, uint16_t length) {
+  uint32_t pixel = offset / 2;
+  uint32_t remaining = length / 2;
+  uint16_t* pixels = (uint16_t*)chunkBuffer;
+
+  while (remaining > 0) {
+    uint16_t row = pixel / rxWidth;
+    uint16_t col = pixel % rxWidth;
+    uint16_t span = min(remaining, (uint32_t)(rxWidth - col));
+    tft.drawRGBBitmap(rxX + col, rxY + row, pixels, span, 1);
+    pixels += span;
+    pixel += span;
+    remaining -= span;
+  }
+}
+
+// PackBits RLE of RGB565: header < 128 -> header + 1 literal pixels follow,
+// header >= 128 -> the next pixel repeats header - 126 times
+void displayRleImage(uint32_t size) {
+  uint32_t pos = 0;
+  uint16_t row = 0;
+  uint16_t col = 0;
+
+  // XFER already checked the width, but a bad one would write past lineBuffer
+  if (rxWidth == 0 || rxWidth > TFT_HEIGHT) {
+    return;
+  }
+
+  // A pixel is read only while both of its bytes are in the buffer, so a
+  // short or corrupt stream stops the drawing instead of reading past it
+  while (pos < size && row < rxHeight) {
+    uint8_t header = imageBuffer[pos++];
+    bool literal = header < 128;
+    uint16_t count = literal ? header + 1 : header - 126;
+    uint16_t value = 0;
+    if (!literal) {
+      if (pos + 1 >= size) return;
+      value = imageBuffer[pos] | (imageBuffer[pos + 1] << 8);
+      pos += 2;
+    }
+
+    for (uint16_t i = 0; i < count; i++) {
+      if (literal) {
+        if (pos + 1 >= size) return;
+        value = imageBuffer[pos] | (imageBuffer[pos + 1] << 8);
+        pos += 2;
+      }
+      lineBuffer[col++] = value;
+      if (col == rxWidth) {
+        tft.drawRGBBitmap(rxX, rxY + row, lineBuffer, rxWidth, 1);
+        col = 0;
+        if (++row == rxHeight) break;
       }
     }
   }
 }
 
-// Function to receive the image data
+// Whether a chunk header fits the transfer: seq is one of its chunks and
+// length is that chunk's length
+bool plausibleChunkHeader(const uint8_t* header) {
+  uint16_t seq = header[1] | (header[2] << 8);
+  uint16_t length = header[3] | (header[4] << 8);
+  if (seq >= rxTotalChunks) {
+    return false;
+  }
+  uint32_t offset = (uint32_t)seq * rxChunkSize;
+  return length == (seq == rxTotalChunks - 1 ? rxSize - offset : rxChunkSize);
+}
+
+void receiveChunk() {
+  uint8_t header[CHUNK_HEADER_SIZE];
+  if (Serial.readBytes(header, CHUNK_HEADER_SIZE) != CHUNK_HEADER_SIZE) {
+    return;
+  }
+
+  // A sync byte in the payload of a chunk whose start was lost carries a
+  // random seq and length. Reading that many bytes would swallow the real
+  // chunks after it, so such a header is dropped without a reply and the
+  // search goes on from the next sync byte inside it.
+  while (!plausibleChunkHeader(header)) {
+    int next = 1;
+    while (next < CHUNK_HEADER_SIZE && header[next] != CHUNK_SYNC) {
+      next++;
+    }
+    if (next == CHUNK_HEADER_SIZE) {
+      return;
+    }
+    memmove(header, &header[next], CHUNK_HEADER_SIZE - next);
+    if (Serial.readBytes(&header[CHUNK_HEADER_SIZE - next], next) != next) {
+      return;
+    }
+  }
+
+  uint16_t seq = header[1] | (header[2] << 8);
+  uint16_t length = header[3] | (header[4] << 8);
+  uint16_t expectedCrc = header[5] | (header[6] << 8);
+
+  // A short chunk (bytes lost) takes the first bytes of the next one, the
+  // CRC catches it and the rest of the next one is skipped as noise
+  if (Serial.readBytes(chunkBuffer, length) != length) {
+    serialReply("CNAK " + String(seq));
+    return;
+  }
+
+  uint16_t crc = crc16(&header[1], 4);
+  crc = crc16(chunkBuffer, length, crc);
+  if (crc != expectedCrc) {
+    serialReply("CNAK " + String(seq));
+    return;
+  }
+
+  uint32_t offset = (uint32_t)seq * rxChunkSize;
+
+  // Duplicate of a chunk we already have (lost CACK): just confirm again
+  bool haveChunk = rxChunkMap[seq / 8] & (1 << (seq % 8));
+  if (rxActive && !haveChunk) {
+    if (rxCodec == CODEC_RGB565) {
+      drawRawChunk(offset, length);
+    } else {
+      memcpy(&imageBuffer[offset], chunkBuffer, length);
+    }
+    rxChunkMap[seq / 8] |= 1 << (seq % 8);
+    rxReceivedChunks++;
+  }
+  serialReply("CACK " + String(seq));
+
+  if (rxActive && rxReceivedChunks == rxTotalChunks) {
+    rxActive = false;
+    if (rxCodec == CODEC_JPEG) {
+      displayImage(rxSize, rxX, rxY, rxScale);
+    } else if (rxCodec == CODEC_RLE565) {
+      displayRleImage(rxSize);
+    }
+    currentFrameDigest = rxFrameDigest;
+    serialReply("DONE");
+  }
+}
+
+// Function to receive the image data. Gives up if the host stops sending,
+// so a lost byte no longer hangs the loop forever.
 bool receiveImageData(uint32_t imageSize) {
   uint32_t receivedBytes = 0;
+  unsigned long lastByteTime = millis();
 
   while (receivedBytes < imageSize) {
     if (Serial.available()) {
       int bytesToRead = min(Serial.available(), (int)(imageSize - receivedBytes));
       Serial.readBytes(&imageBuffer[receivedBytes], bytesToRead);
       receivedBytes += bytesToRead;
+      lastByteTime = millis();
+    } else if (millis() - lastByteTime > IMAGE_RECEIVE_TIMEOUT_MS) {
+      serialReply("Error: Image receive timeout");
+      return false;
+    } else {
+      delay(1);  // Let the telemetry task run while waiting for data
     }
   }
 
@@ -148,14 +627,44 @@ bool tft_output(int16_t x, int16_t y, uint16_t w, uint16_t h, uint16_t* bitmap)
   return 1; // Continue decoding
 }
 
-void displayImage(uint32_t imageSize) {
-  tft.fillScreen(ST77XX_BLACK);  // Clear screen
+// TJpgDec can only scale down, so previews are enlarged here: every decoded
+// pixel is repeated drawScale times across, and each row drawScale times down
+bool tft_output_scaled(int16_t x, int16_t y, uint16_t w, uint16_t h, uint16_t* bitmap)
+{
+  int16_t left = drawX + x * drawScale;
+  int16_t top = drawY + y * drawScale;
+  if (top >= tft.height()) return 0;
+
+  for (uint16_t row = 0; row < h; row++) {
+    uint16_t* pixels = bitmap + row * w;
+    for (uint16_t col = 0; col < w; col++) {
+      for (uint8_t i = 0; i < drawScale; i++) {
+        lineBuffer[col * drawScale + i] = pixels[col];
+      }
+    }
+    for (uint8_t i = 0; i < drawScale; i++) {
+      tft.drawRGBBitmap(left, top + row * drawScale + i, lineBuffer, w * drawScale, 1);
+    }
+  }
+  return 1;
+}
 
+// Draw a JPEG at (x, y), enlarged scale times. Full frames cover the whole
+// screen and partial frames only their region, so the screen is never
+// cleared in between; a full frame simply paints over its preview.
+void displayImage(uint32_t imageSize, int16_t x, int16_t y, uint8_t scale) {
   // Configure the decoder
   TJpgDec.setJpgScale(1);
-  TJpgDec.setCallback(tft_output);
+  if (scale == 1) {
+    TJpgDec.setCallback(tft_output);
+    TJpgDec.drawJpg(x, y, imageBuffer, imageSize);
+    return;
+  }
 
-  // Decode the image from the buffer
+  drawX = x;
+  drawY = y;
+  drawScale = scale;
+  TJpgDec.setCallback(tft_output_scaled);
   TJpgDec.drawJpg(0, 0, imageBuffer, imageSize);
 }
 
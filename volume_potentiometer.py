@@ -1,4 +1,13 @@
+import logging
 import threading
+import time
+import metrics
+from audio_sessions import AudioSessionIndex, PycawBackend
+
+VOLUME_SET_LATENCY = metrics.histogram("volume_set_latency_seconds",
+                                       "Slider sample to volume applied")
+VOLUME_COALESCED = metrics.counter("volume_coalesced_total",
+                                   "Volume targets replaced before they were applied")
 
 # made this running on a separate thread
 decibels = [-65.25, -59.0, -54.0, -49.0, -46.0, -43.0, -40.0, -38.0, -37.0, -35.0, -33.0, -32.0,
@@ -12,59 +21,138 @@ decibels = [-65.25, -59.0, -54.0, -49.0, -46.0, -43.0, -40.0, -38.0, -37.0, -35.
 
 
 class VolumeControl:
-    def __init__(self):
+    def __init__(self, backend=None):
         self.volume = None
         self.initialized = threading.Event()
-        self.audio_utilities = None
+        self.backend = backend if backend is not None else PycawBackend()
+
+        # Process name -> per-app volume interfaces, kept fresh in the background
+        self.session_index = AudioSessionIndex(self.backend)
 
         # Start the initialization thread
         threading.Thread(target=self._initialisation_thread, daemon=True).start()
         self.initialized.wait()  # Wait until the thread signals completion
 
     def _initialisation_thread(self):
-        # Import inside the thread to avoid global conflicts
-        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-        from comtypes import CLSCTX_ALL
-
         try:
-            self.audio_utilities = AudioUtilities
-            self.devices = AudioUtilities.GetSpeakers()
-            self.interface = self.devices.Activate(
-                IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            self.volume = self.interface.QueryInterface(IAudioEndpointVolume)
+            self.backend.init_thread()
+            self.volume = self.backend.master_volume()
+            self.session_index.start()
+        except Exception as e:
+            print(f"Volume initialisation error: {e}")
         finally:
             self.initialized.set()  # Signal that initialization is complete
 
+    def stop(self):
+        self.session_index.stop()
+
     def set_volume(self, name: str, value: int):
         if name == "MASTER_VOLUME":
             if not self.volume:
-                print("Volume interface not initialized.")
+                logging.getLogger(__name__).warning("Volume interface not initialized")
                 return
 
             self.volume.SetMasterVolumeLevel(decibels[value], None)
 
-
         else:
-
-            from pycaw.pycaw import AudioUtilities
-
-            sessions = AudioUtilities.GetAllSessions()
-
-            for session in sessions:
-
+            for key, interface in self.session_index.get(name):
                 # noinspection PyBroadException
                 try:
-
-                    if session.Process and session.Process.name() == name:
-                        interface = session.SimpleAudioVolume
-
-                        # Uncomment and modify the volume setting
-
-                        interface.SetMasterVolume(value / 100.0, None)
-
-                        # print(f"Set volume for {name} to {value}")
-
-                        # break  # Exit after setting volume for the first matching process
-
-                except:
-                    pass
+                    interface.SetMasterVolume(value / 100.0, None)
+                except Exception:
+                    # The session died, forget it until the next refresh
+                    self.session_index.invalidate(key)
+
+
+class VolumeActuator:
+    """Applies volume changes on a worker thread instead of the caller's.
+
+    Only the latest target per channel is kept, and each channel is written
+    at most max_rate times per second. A target is never dropped once it is
+    the newest, so the final resting value of a knob is always applied.
+    set_volume() has the same signature as VolumeControl's and never blocks
+    on COM calls.
+    """
+
+    def __init__(self, volume_obj, max_rate=60):
+        self.volume_obj = volume_obj
+        self.min_interval = 1.0 / max_rate
+
+        self._pending = {}  # name -> (value, sample time)
+        self._next_allowed = {}  # name -> earliest monotonic time of the next write
+        self._cond = threading.Condition()
+        self._stop = False
+
+        # Statistics
+        self.submitted = 0
+        self.applied = 0
+        self.coalesced = 0
+
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def set_volume(self, name: str, value: int, sample_time=None):
+        """Queue a volume target. sample_time is the monotonic time the ADC sample arrived."""
+        if sample_time is None:
+            sample_time = time.monotonic()
+        with self._cond:
+            self.submitted += 1
+            if name in self._pending:
+                self.coalesced += 1
+                VOLUME_COALESCED.inc()
+            self._pending[name] = (value, sample_time)
+            self._cond.notify()
+
+    def _worker(self):
+        backend = getattr(self.volume_obj, "backend", None)
+        if backend is not None:
+            backend.init_thread()
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._stop:
+                        return
+                    now = time.monotonic()
+                    ready = [name for name in self._pending
+                             if self._next_allowed.get(name, 0) <= now]
+                    if ready:
+                        break
+                    if self._pending:
+                        # Wake when the earliest rate-limited channel may write again
+                        wait = min(self._next_allowed[name] for name in self._pending) - now
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+
+                batch = [(name, self._pending.pop(name)) for name in ready]
+                for name in ready:
+                    self._next_allowed[name] = now + self.min_interval
+
+            for name, (value, sample_time) in batch:
+                try:
+                    self.volume_obj.set_volume(name=name, value=value)
+                except Exception as e:
+                    logging.getLogger(__name__).error(f"Cannot set volume: {e}")
+                    continue
+                VOLUME_SET_LATENCY.record(time.monotonic() - sample_time)
+                with self._cond:
+                    self.applied += 1
+
+    def stats(self):
+        with self._cond:
+            submitted, applied, coalesced = self.submitted, self.applied, self.coalesced
+        # Latency is process-wide, there is one actuator per host
+        return {
+            "submitted": submitted,
+            "applied": applied,
+            "coalesced": coalesced,
+            "latency_p50_ms": VOLUME_SET_LATENCY.percentile(0.5) * 1000,
+            "latency_p99_ms": VOLUME_SET_LATENCY.percentile(0.99) * 1000,
+        }
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(timeout=2)